@@ -0,0 +1,61 @@
+"""
+Local stand-in for a batch email HTTP API, for testing the http transport.
+
+Accepts the request format of HttpBatchTransport and answers per message,
+optionally bouncing or failing a share of them and rejecting whole batches
+with 503 to exercise retries and the circuit breaker.
+
+Run from the project root, then point the app at it:
+    python -m benchmarks.email_api_stub --port 8025 --bounce-rate 0.01
+    EMAIL_TRANSPORT=http EMAIL_API_URL=http://127.0.0.1:8025/v1/batch
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import argparse
+import base64
+import random
+import time
+import uvicorn
+
+app = FastAPI(title="Email API stub")
+config = {"bounce_rate": 0.0, "failure_rate": 0.0, "outage_rate": 0.0, "latency": 0.0}
+totals = {"requests": 0, "messages": 0, "bytes": 0}
+
+@app.post("/v1/batch")
+async def send_batch(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    totals["requests"] += 1
+    if config["latency"]:
+        time.sleep(config["latency"])
+    if random.random() < config["outage_rate"]:
+        return JSONResponse({"error": "service unavailable"}, status_code=503)
+
+    results = []
+    for message in messages:
+        totals["messages"] += 1
+        totals["bytes"] += len(base64.b64decode(message["raw"]))
+        roll = random.random()
+        if roll < config["bounce_rate"]:
+            results.append({"status": "bounced", "error": f"unknown recipient {message['to']}"})
+        elif roll < config["bounce_rate"] + config["failure_rate"]:
+            results.append({"status": "retry", "error": "temporarily deferred"})
+        else:
+            results.append({"status": "sent"})
+    return {"results": results}
+
+@app.get("/stats")
+async def stats():
+    return totals
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--bounce-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--outage-rate", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each request")
+    args = parser.parse_args()
+    config.update(bounce_rate=args.bounce_rate, failure_rate=args.failure_rate,
+                  outage_rate=args.outage_rate, latency=args.latency)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
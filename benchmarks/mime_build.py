@@ -0,0 +1,59 @@
+"""
+Per-message CPU cost of building campaign emails.
+
+Compares the previous approach (a fresh MIMEMultipart + MIMEText per recipient,
+re-encoding the whole HTML body) with rendering from a prebuilt MessageSkeleton.
+
+Run from the project root:
+    python -m benchmarks.mime_build
+"""
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+import timeit
+
+from services.mime_skeleton import MessageSkeleton
+
+SUBJECT = "Quick question for {{company_name}}"
+PARAGRAPH = (
+    "<p style=\"font-family: Arial, sans-serif; font-size: 14px;\">"
+    "Teams like yours use our platform to cut onboarding time in half while keeping every "
+    "workflow auditable and easy to change as the business grows.</p>"
+)
+HTML = "\n".join(
+    ["<html><body>", "<p>Hi {{prospect_name}},</p>", "<p>I noticed {{company_name}} is growing fast.</p>"]
+    + [PARAGRAPH] * 40
+    + ["<p>Best,<br>The Team</p>", "</body></html>"]
+)
+VALUES = {"prospect_name": "Ada Lovelace", "company_name": "Analytical Engines", "prospect_email": "ada@example.com"}
+
+def build_with_mime() -> bytes:
+    subject = SUBJECT
+    content = HTML
+    for placeholder, value in VALUES.items():
+        subject = subject.replace(f"{{{{{placeholder}}}}}", value)
+        content = content.replace(f"{{{{{placeholder}}}}}", value)
+    message = MIMEMultipart()
+    message["From"] = "Sender <sender@example.com>"
+    message["To"] = "ada@example.com"
+    message["Subject"] = subject
+    message.attach(MIMEText(content, "html"))
+    return message.as_bytes()
+
+SKELETON = MessageSkeleton(SUBJECT, HTML, "example.com")
+
+FROM_HEADER = b"From: Sender <sender@example.com>\r\n"
+
+def build_with_skeleton() -> bytes:
+    return FROM_HEADER + SKELETON.render("ada@example.com", VALUES)
+
+def main(number: int = 2000):
+    for name, func in (("MIMEMultipart per message", build_with_mime), ("MessageSkeleton.render", build_with_skeleton)):
+        seconds = min(timeit.repeat(func, number=number, repeat=5))
+        print(f"{name:28s} {seconds / number * 1e6:8.1f} us/message")
+    build_seconds = min(timeit.repeat(
+        lambda: MessageSkeleton(SUBJECT, HTML, "example.com"), number=200, repeat=5
+    ))
+    print(f"{'skeleton build (once)':28s} {build_seconds / 200 * 1e6:8.1f} us")
+
+if __name__ == "__main__":
+    main()
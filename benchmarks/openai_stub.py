@@ -0,0 +1,74 @@
+"""
+Local fake of the OpenAI chat completions API, for exercising the OpenAI gateway.
+
+Answers with a canned SUBJECT/CONTENT email and realistic usage numbers, and
+enforces its own requests-per-minute limit with 429s and Retry-After, so the
+gateway's budgeting, queueing and retries can be tested without an account.
+
+Run from the project root, then point the app at it:
+    python -m benchmarks.openai_stub --port 8026 --rpm 20 --latency 0.5
+    OPENAI_API_BASE=http://127.0.0.1:8026/v1
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import argparse
+import asyncio
+import time
+import uuid
+import uvicorn
+
+app = FastAPI(title="OpenAI stub")
+config = {"rpm": 0, "latency": 0.0}
+recent = []
+totals = {"requests": 0, "rate_limited": 0}
+
+REPLY = (
+    "SUBJECT: A quick idea for {{company_name}}\n"
+    "CONTENT: <html><body><p>Hi {{prospect_name}},</p><p>Short pitch.</p></body></html>"
+)
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    totals["requests"] += 1
+    now = time.monotonic()
+    recent[:] = [sent for sent in recent if now - sent < 60]
+    if config["rpm"] and len(recent) >= config["rpm"]:
+        totals["rate_limited"] += 1
+        retry_after = 60 - (now - recent[0])
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"Retry-After": f"{retry_after:.1f}"}
+        )
+    recent.append(now)
+    if config["latency"]:
+        await asyncio.sleep(config["latency"])
+
+    prompt_tokens = sum(len(message.get("content", "")) for message in body.get("messages", [])) // 4
+    completion_tokens = len(REPLY) // 4
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": REPLY}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+@app.get("/stats")
+async def stats():
+    return totals
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8026)
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute before answering 429")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each request")
+    args = parser.parse_args()
+    config.update(rpm=args.rpm, latency=args.latency)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
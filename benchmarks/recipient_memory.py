@@ -0,0 +1,71 @@
+"""
+Per-recipient memory held by the campaign pipeline.
+
+Compares keeping the Supabase rows plus a recipient dict per prospect (the
+previous approach) with compact Recipient records built from the rows, which
+are then dropped. Measured with tracemalloc over a synthetic audience.
+
+Run from the project root:
+    python -m benchmarks.recipient_memory [recipients]
+"""
+import gc
+import random
+import sys
+import tracemalloc
+import uuid
+
+from services.recipients import Recipient
+
+COMPANIES = [f"Company {index}" for index in range(2000)]
+TIMEZONES = ["America/New_York", "Europe/London", "Europe/Berlin", "Asia/Tokyo", None]
+
+def make_rows(count: int) -> list:
+    """Rows as they arrive from the API: every string is a fresh object, as after JSON decoding."""
+    rng = random.Random(0)
+    rows = []
+    for index in range(count):
+        timezone = rng.choice(TIMEZONES)
+        rows.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "email": f"person{index}@example{index % 500}.com",
+            "full_name": f"Person {index}",
+            "company": "".join(rng.choice(COMPANIES)),
+            "custom_fields": {"timezone": "".join(timezone), "source": "".join("import")} if timezone else {}
+        })
+    return rows
+
+def rows_and_dicts(rows: list) -> list:
+    return [(row, {
+        "email": row["email"],
+        "prospect_name": row["full_name"],
+        "company_name": row.get("company") or "",
+        "product_name": "".join("Product"),
+    }) for row in rows]
+
+def compact(rows: list) -> list:
+    return [Recipient(
+        row["id"], row["email"], row["full_name"], row.get("company"), (row.get("custom_fields") or {}).get("timezone")
+    ) for row in rows]
+
+def measure(count: int, build) -> float:
+    gc.collect()
+    tracemalloc.start()
+    rows = make_rows(count)
+    held = build(rows)
+    del rows
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return current / count
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    before = measure(count, rows_and_dicts)
+    after = measure(count, compact)
+    print(f"{count} recipients")
+    print(f"rows + recipient dicts: {before:8.0f} bytes per recipient")
+    print(f"Recipient records:      {after:8.0f} bytes per recipient ({before / after:.1f}x smaller)")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import List
 
 class AuthSettings(BaseSettings):
     jwt_secret: str
     jwt_algorithm: str = "HS256"
+    # Users allowed to see operator endpoints such as /email-accounts; JSON list in the environment
+    admin_user_ids: List[str] = []
 
     model_config = SettingsConfigDict(
         env_file=".env",
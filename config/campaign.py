@@ -0,0 +1,47 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+class CampaignSettings(BaseSettings):
+    # Number of prospects fetched from the database per page
+    campaign_page_size: int = 100
+    # Maximum number of items buffered between pipeline stages
+    campaign_queue_size: int = 200
+    # Minimum number of concurrent send workers per campaign; raised to the
+    # total max_connections of the configured SMTP accounts
+    campaign_send_concurrency: int = 1
+    # Delay between sends of a single worker, to avoid provider rate limiting
+    campaign_send_delay: float = 0.5
+    # Worker processes rendering messages, one pool per process shared by all campaigns;
+    # 0 renders on the event loop
+    campaign_render_processes: int = 0
+    # Recipients per batch sent to a render process
+    campaign_render_batch_size: int = 200
+    # Delivered messages buffered before the send ledger is written
+    ledger_flush_size: int = 200
+    # Maximum seconds a delivery waits in the send ledger buffer
+    ledger_flush_interval: float = 0.5
+    # Recipients per shard; shards are claimed independently by worker processes
+    campaign_shard_size: int = 1000
+    # Seconds a worker's claim on a shard lasts without being renewed
+    campaign_lease_seconds: int = 120
+    # Claim attempts before a shard (and its campaign) is marked failed
+    campaign_shard_max_attempts: int = 3
+    # Seconds a shard with a send window may keep its worker slot. When it would have to
+    # wait longer for its window to open or for its next paced send, it is handed back
+    # and claimed again once it can send
+    campaign_shard_time_slice: float = 60.0
+    # Run a shard worker inside the API process; disable when running worker.py separately
+    campaign_worker_enabled: bool = True
+    # Shards processed concurrently by one worker process
+    campaign_worker_concurrency: int = 1
+    # Seconds an idle worker waits before polling for shards again
+    campaign_worker_poll_interval: float = 2.0
+    # Seconds between checks for campaigns scheduled (or rescheduled) by other replicas
+    campaign_schedule_poll_interval: float = 60.0
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=False,
+        extra="allow"
+    )
+
+campaign_settings = CampaignSettings()
@@ -1,12 +1,63 @@
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import List, Optional
+
+class SmtpAccount(BaseModel):
+    name: str
+    username: str
+    password: str
+    from_email: str
+    from_name: str
+    host: str = "smtp.gmail.com"
+    port: int = 587
+    # Relative share of traffic this account receives
+    weight: float = 1.0
+    # Maximum messages per day, None for unlimited
+    daily_quota: Optional[int] = None
+    # Maximum concurrent connections to this account
+    max_connections: int = 1
 
 class EmailSettings(BaseSettings):
-    smtp_username: str
-    smtp_password: str
+    smtp_username: Optional[str] = None
+    smtp_password: Optional[str] = None
     smtp_from_email: str
     smtp_from_name: str
     smtp_host: str = "smtp.gmail.com"
     smtp_port: int = 587
+    # Additional sender accounts as a JSON list, e.g.
+    # SMTP_ACCOUNTS='[{"name": "sales2", "username": "...", "password": "...", "from_email": "...", "from_name": "...", "daily_quota": 500}]'
+    smtp_accounts: List[SmtpAccount] = []
+    # Daily quota of the account configured through the smtp_* settings
+    smtp_daily_quota: Optional[int] = None
+    # Units of an account's daily quota a process reserves at a time from the counter shared
+    # by all processes (migration 017); 0 counts daily quotas in each process separately
+    smtp_quota_reservation: int = 20
+    # Seconds an account is taken out of rotation after an error
+    smtp_account_cooldown: int = 300
+    # Delivery attempts per message before it counts as failed
+    smtp_max_attempts: int = 5
+    # Exponential backoff between attempts: base * 2^attempt seconds, capped, with jitter
+    smtp_retry_base_delay: float = 2.0
+    smtp_retry_max_delay: float = 300.0
+    # Consecutive connection failures that open a host's circuit breaker
+    smtp_breaker_threshold: int = 5
+    # Seconds an open breaker waits before a trial connection, doubling up to the max
+    smtp_breaker_reset_timeout: float = 30.0
+    smtp_breaker_max_reset_timeout: float = 600.0
+    # Default transport for campaigns that don't choose one: smtp, http or sink
+    email_transport: str = "smtp"
+    # Batch HTTP API transport
+    email_api_url: Optional[str] = None
+    email_api_key: Optional[str] = None
+    email_api_batch_size: int = 100
+    email_api_concurrency: int = 4
+    email_api_timeout: float = 30.0
+    # Sink transport: write messages here as .eml files instead of discarding them
+    email_sink_dir: Optional[str] = None
+    # Seconds between loads of suppressions added by other processes
+    suppression_refresh_interval: float = 60.0
+    # Seconds between full reloads of the suppression list, which also pick up removals
+    suppression_reload_interval: float = 3600.0
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -14,4 +65,20 @@ class EmailSettings(BaseSettings):
         extra="allow"
     )
 
-email_settings = EmailSettings() 
\ No newline at end of file
+    def all_accounts(self) -> List[SmtpAccount]:
+        """The primary smtp_* account (when configured) followed by smtp_accounts."""
+        accounts = []
+        if self.smtp_username and self.smtp_password:
+            accounts.append(SmtpAccount(
+                name="default",
+                username=self.smtp_username,
+                password=self.smtp_password,
+                from_email=self.smtp_from_email,
+                from_name=self.smtp_from_name,
+                host=self.smtp_host,
+                port=self.smtp_port,
+                daily_quota=self.smtp_daily_quota
+            ))
+        return accounts + list(self.smtp_accounts)
+
+email_settings = EmailSettings()
@@ -0,0 +1,168 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import sys
+from typing import Dict, Optional
+
+class LoggingSettings(BaseSettings):
+    log_level: str = "INFO"
+    # json for log collectors, text for reading in a terminal
+    log_format: str = "json"
+    # Records buffered for the writer thread; while it is full further records are dropped and counted
+    log_queue_size: int = 10000
+    # Fraction of records below ERROR kept, per logger and its children. Per-recipient
+    # delivery records go to the *.recipients loggers; JSON in the environment
+    log_sample_rates: Dict[str, float] = {
+        "services.transports.recipients": 0.01,
+        "services.email_service.recipients": 0.01,
+        "services.campaign_pipeline.recipients": 0.01
+    }
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=False,
+        extra="allow"
+    )
+
+log_settings = LoggingSettings()
+
+# Secrets that could end up in a message or traceback: key=value and "key": "value"
+# pairs with sensitive names, bearer tokens and JWTs
+REDACTIONS = [
+    (re.compile(r"(?i)\b([\w-]*(?:password|passwd|secret|api_key|apikey|access_token|refresh_token|authorization))"
+                r"(['\"]?\s*[:=]\s*['\"]?)(?:bearer\s+)?[^'\",\s})]+"), r"\1\2[REDACTED]"),
+    (re.compile(r"(?i)\bbearer\s+[\w\-.~+/]+=*"), "Bearer [REDACTED]"),
+    (re.compile(r"\beyJ[\w-]+\.[\w-]+\.[\w-]+"), "[REDACTED]")
+]
+
+def redact(text: str) -> str:
+    for pattern, replacement in REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+class RedactingFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return redact(super().format(record))
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; fields passed with extra= are included."""
+
+    # Attributes every record has, and uvicorn's terminal-colored copy of the message
+    RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "color_message"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in self.RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return redact(json.dumps(entry, default=str))
+
+class SamplingFilter(logging.Filter):
+    """Keeps a configured fraction of a logger's records below ERROR; errors are always kept."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        # Rate per logger name, resolved once from the nearest configured ancestor
+        self.resolved: Dict[str, float] = {}
+
+    def rate(self, name: str) -> float:
+        rate = self.resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self.resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        rate = self.rate(record.name)
+        return rate >= 1 or random.random() < rate
+
+class BufferedQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without formatting them or blocking.
+
+    The standard QueueHandler formats the message in the logging thread; here
+    that is left to the writer too, so a record costs the caller little more
+    than its creation. If the writer falls behind, records are dropped rather
+    than stalling request handling, and the number dropped is logged.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            if self.dropped:
+                dropped = logging.LogRecord(
+                    __name__, logging.WARNING, __file__, 0, "Log queue full, dropped %s records", (self.dropped,), None
+                )
+                self.queue.put_nowait(dropped)
+                self.dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener: Optional[QueueListener] = None
+
+def configure_logging():
+    """
+    Send all logging, including uvicorn's, through one queue to a writer thread.
+
+    Call once at process start, before modules that log while importing.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    if log_settings.log_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(RedactingFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    handler = BufferedQueueHandler(queue.Queue(max(1, log_settings.log_queue_size)))
+    handler.addFilter(SamplingFilter(log_settings.log_sample_rates))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(log_settings.log_level.upper())
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+
+    _listener = QueueListener(handler.queue, output)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging():
+    """Write out queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
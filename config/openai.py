@@ -1,11 +1,25 @@
 from pydantic_settings import BaseSettings
+from typing import Optional
 
 class OpenAISettings(BaseSettings):
     api_key: str
+    # Override to point at a proxy or a local fake server, e.g. http://127.0.0.1:8026/v1
+    api_base: Optional[str] = None
+    model: str = "gpt-4"
+    # Budgets of the account's rate limits, shared by all users of this process
+    requests_per_minute: int = 60
+    tokens_per_minute: int = 40000
+    max_concurrency: int = 8
+    # Retries of rate limit and transient errors, with exponential backoff
+    max_retries: int = 5
+    retry_base_delay: float = 1.0
+    retry_max_delay: float = 30.0
+    # Seconds a request may wait in the queue before the API answers 503
+    queue_timeout: float = 60.0
 
     model_config = {
         'env_file': '.env',
         'env_prefix': 'OPENAI_'
     }
 
-openai_settings = OpenAISettings() 
\ No newline at end of file
+openai_settings = OpenAISettings()
@@ -0,0 +1,15 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+class ProspectSettings(BaseSettings):
+    # Maximum number of prospects in one bulk upsert or delete request
+    prospect_bulk_max_items: int = 1000
+    # Largest page returned by prospect search
+    prospect_search_max_limit: int = 200
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=False,
+        extra="allow"
+    )
+
+prospect_settings = ProspectSettings()
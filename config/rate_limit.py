@@ -0,0 +1,27 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Optional
+
+class RateLimitSettings(BaseSettings):
+    rate_limit_enabled: bool = True
+    # Shared store for the buckets when running several API replicas, e.g.
+    # redis://localhost:6379/0 (requires the redis package); in memory otherwise
+    rate_limit_redis_url: Optional[str] = None
+    # Requests per minute and burst size per user for each route class
+    rate_limit_ai_per_minute: int = 10
+    rate_limit_ai_burst: int = 5
+    rate_limit_import_per_minute: int = 6
+    rate_limit_import_burst: int = 3
+    rate_limit_send_per_minute: int = 10
+    rate_limit_send_burst: int = 5
+    rate_limit_default_per_minute: int = 300
+    rate_limit_default_burst: int = 60
+    # Clients tracked by the in-memory store; the least recently seen are dropped beyond this
+    rate_limit_max_clients: int = 100000
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=False,
+        extra="allow"
+    )
+
+rate_limit_settings = RateLimitSettings()
@@ -3,7 +3,6 @@ from supabase import create_client, Client
 import logging
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 class SupabaseSettings(BaseSettings):
     supabase_url: str
@@ -18,10 +17,10 @@ class SupabaseSettings(BaseSettings):
 
 settings = SupabaseSettings()
 
-logger.debug(f"Initializing Supabase client with URL: {settings.supabase_url}")
+logger.debug("Initializing Supabase client with URL: %s", settings.supabase_url)
 try:
     supabase: Client = create_client(settings.supabase_url, settings.supabase_service_key)
     logger.info("Supabase client initialized successfully")
 except Exception as e:
-    logger.error(f"Failed to initialize Supabase client: {str(e)}")
+    logger.error("Failed to initialize Supabase client: %s", e)
     raise 
\ No newline at end of file
@@ -0,0 +1,20 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Optional
+
+class TrackingSettings(BaseSettings):
+    # Public base URL of this API, e.g. https://api.example.com; tracking is off when unset
+    tracking_base_url: Optional[str] = None
+    # Seconds between flushes of buffered open/click events
+    tracking_flush_interval: float = 2.0
+    # Buffered recipients that trigger an early flush
+    tracking_flush_size: int = 5000
+    # Recently flushed events remembered to drop repeat opens/clicks without a write
+    tracking_dedupe_size: int = 200000
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=False,
+        extra="allow"
+    )
+
+tracking_settings = TrackingSettings()
@@ -0,0 +1,16 @@
+import os
+
+# Settings are read when modules are imported; the tests replace the clients that
+# would use them, so placeholders are enough when no .env is present
+for name, value in {
+    "SUPABASE_URL": "http://localhost:54321",
+    "SUPABASE_KEY": "test",
+    "SUPABASE_SERVICE_KEY": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.test",
+    "JWT_SECRET": "test",
+    "SMTP_USERNAME": "test",
+    "SMTP_PASSWORD": "test",
+    "SMTP_FROM_EMAIL": "campaigns@example.com",
+    "SMTP_FROM_NAME": "Campaigns",
+    "OPENAI_API_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
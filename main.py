@@ -1,10 +1,29 @@
-from fastapi import FastAPI, HTTPException
+from config.logging import configure_logging
+
+# Before the other imports, some of which log while initializing
+configure_logging()
+
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from routers import auth, campaigns, prospects, products, openai
+from routers.auth import get_admin_user
+from routers import auth, campaigns, prospects, products, openai, segments, suppressions, templates, tracking
 from services.email_service import email_service
+from services.scheduler import campaign_scheduler
+from services.shard_worker import shard_worker
+from services.tracking import tracking_buffer
+from services.analytics import campaign_stats
+from services.send_ledger import send_ledger
+from services.suppressions import suppression_list
+from services.openai_gateway import openai_gateway
+from services.rate_limit import RateLimitMiddleware
+from services.render_pool import close_render_pool
+from config.campaign import campaign_settings
 
 app = FastAPI(title="Email Campaign API")
 
+# Added before CORS so that 429 responses still carry CORS headers
+app.add_middleware(RateLimitMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -18,8 +37,34 @@ app.add_middleware(
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(campaigns.router, prefix="/api/campaigns", tags=["Campaigns"])
 app.include_router(prospects.router, prefix="/api/prospects", tags=["Prospects"])
+app.include_router(segments.router, prefix="/api/segments", tags=["Segments"])
+app.include_router(suppressions.router, prefix="/api/suppressions", tags=["Suppressions"])
+app.include_router(templates.router, prefix="/api/templates", tags=["Templates"])
 app.include_router(products.router, prefix="/api/products", tags=["Products"])
 app.include_router(openai.router, prefix="/api/openai", tags=["OpenAI"])
+app.include_router(tracking.router, prefix="/t", tags=["Tracking"])
+
+@app.on_event("startup")
+async def start_background_services():
+    await suppression_list.start()
+    openai_gateway.start()
+    tracking_buffer.start()
+    campaign_stats.start()
+    send_ledger.start()
+    await campaign_scheduler.start(campaigns.send_campaign_emails)
+    if campaign_settings.campaign_worker_enabled:
+        shard_worker.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    await shard_worker.stop()
+    await campaign_scheduler.stop()
+    close_render_pool()
+    await tracking_buffer.stop()
+    await send_ledger.stop()
+    await campaign_stats.stop()
+    await suppression_list.stop()
+    await openai_gateway.stop()
 
 @app.get("/")
 async def root():
@@ -34,11 +79,21 @@ async def test_email():
     else:
         return {"status": "error", "message": "Failed to connect to email server"}
 
+@app.get("/email-accounts")
+async def email_accounts(current_user: str = Depends(get_admin_user)):
+    """
+    Report usage and availability of each SMTP sender account.
+
+    Counters, in_flight and availability are this process's own; with several
+    replicas each reports its share. Daily quotas are enforced across processes.
+    """
+    return {"scope": "process", "accounts": email_service.account_usage()}
+
 @app.get("/send-test-email/{to_email}")
 async def send_test_email(to_email: str):
     """Send a test email to verify the email sending functionality."""
     try:
-        success = email_service.send_email(
+        success = await email_service.send_email_async(
             to_email=to_email,
             subject="Test Email from Campaign System",
             content="""
@@ -0,0 +1,25 @@
+-- Query-defined prospect segments.
+-- Campaigns reference a saved filter instead of carrying an inline prospect_ids array.
+
+create table if not exists segments (
+    id uuid primary key default gen_random_uuid(),
+    name text not null,
+    description text,
+    company text,
+    custom_fields jsonb,
+    import_batch_id uuid,
+    created_by uuid not null,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists segments_created_by_idx on segments (created_by);
+
+-- Every CSV upload is tagged with an import batch so it can be targeted later
+alter table prospects add column if not exists import_batch_id uuid;
+create index if not exists prospects_import_batch_id_idx on prospects (import_batch_id, id);
+create index if not exists prospects_company_idx on prospects (company, id);
+create index if not exists prospects_custom_fields_idx on prospects using gin (custom_fields jsonb_path_ops);
+
+alter table campaigns add column if not exists segment_id uuid references segments (id);
+alter table campaigns alter column prospect_ids drop not null;
@@ -0,0 +1,9 @@
+-- Scheduled campaigns and recipient-local send windows.
+
+alter table campaigns add column if not exists scheduled_at timestamptz;
+alter table campaigns add column if not exists send_window_start smallint check (send_window_start between 0 and 23);
+alter table campaigns add column if not exists send_window_end smallint check (send_window_end between 1 and 24);
+alter table campaigns add column if not exists timezone text;
+
+-- The scheduler loads due campaigns on startup
+create index if not exists campaigns_scheduled_idx on campaigns (scheduled_at) where status = 'scheduled';
@@ -0,0 +1,119 @@
+-- Horizontally sharded campaign sending.
+-- A started campaign is split into shards that any worker process can claim
+-- through an expiring lease. Claims use FOR UPDATE SKIP LOCKED so concurrent
+-- workers never block on, or double-claim, the same shard.
+
+create table if not exists campaign_shards (
+    id uuid primary key default gen_random_uuid(),
+    campaign_id uuid not null references campaigns (id) on delete cascade,
+    shard_index integer not null,
+    -- Inline prospect_ids campaigns: positions [range_start, range_end) of the array
+    range_start integer,
+    range_end integer,
+    -- Segment campaigns: prospect ids in (after_id, upto_id]; null bounds are open
+    after_id uuid,
+    upto_id uuid,
+    status text not null default 'pending' check (status in ('pending', 'running', 'completed', 'failed')),
+    lease_owner text,
+    lease_expires_at timestamptz,
+    attempts integer not null default 0,
+    sent_count integer not null default 0,
+    failed_count integer not null default 0,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now(),
+    unique (campaign_id, shard_index)
+);
+
+create index if not exists campaign_shards_claimable_idx
+    on campaign_shards (created_at, shard_index) where status in ('pending', 'running');
+
+create or replace function claim_campaign_shard(p_worker text, p_lease_seconds integer)
+returns setof campaign_shards
+language sql
+as $$
+    update campaign_shards s
+    set status = 'running',
+        lease_owner = p_worker,
+        lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+        attempts = s.attempts + 1,
+        updated_at = now()
+    where s.id = (
+        select id from campaign_shards
+        where status = 'pending' or (status = 'running' and lease_expires_at < now())
+        order by created_at, shard_index
+        for update skip locked
+        limit 1
+    )
+    returning s.*;
+$$;
+
+-- Returns false when the lease was lost, in which case the worker must stop sending
+create or replace function renew_campaign_shard(p_shard uuid, p_worker text, p_lease_seconds integer)
+returns boolean
+language sql
+as $$
+    with renewed as (
+        update campaign_shards
+        set lease_expires_at = now() + make_interval(secs => p_lease_seconds), updated_at = now()
+        where id = p_shard and lease_owner = p_worker and status = 'running'
+        returning 1
+    )
+    select exists (select 1 from renewed);
+$$;
+
+-- Marks a shard done and, once every shard of the campaign is done, finalizes the campaign
+create or replace function complete_campaign_shard(p_shard uuid, p_worker text, p_sent integer, p_failed integer)
+returns boolean
+language plpgsql
+as $$
+declare
+    v_campaign uuid;
+begin
+    update campaign_shards
+    set status = 'completed', sent_count = p_sent, failed_count = p_failed,
+        lease_owner = null, lease_expires_at = null, updated_at = now()
+    where id = p_shard and lease_owner = p_worker and status = 'running'
+    returning campaign_id into v_campaign;
+
+    if v_campaign is null then
+        return false;
+    end if;
+
+    update campaigns c
+    set status = case when totals.failed = 0 then 'completed' else 'failed' end,
+        sent_count = totals.sent,
+        failed_count = totals.failed,
+        completed_at = now()
+    from (
+        select coalesce(sum(sent_count), 0) as sent, coalesce(sum(failed_count), 0) as failed
+        from campaign_shards where campaign_id = v_campaign
+    ) totals
+    where c.id = v_campaign
+      and not exists (
+          select 1 from campaign_shards where campaign_id = v_campaign and status <> 'completed'
+      );
+
+    return true;
+end;
+$$;
+
+-- Gives a shard back after a worker error; after p_max_attempts the shard and campaign fail
+create or replace function release_campaign_shard(p_shard uuid, p_worker text, p_max_attempts integer)
+returns void
+language plpgsql
+as $$
+declare
+    v_campaign uuid;
+    v_attempts integer;
+begin
+    update campaign_shards
+    set status = case when attempts >= p_max_attempts then 'failed' else 'pending' end,
+        lease_owner = null, lease_expires_at = null, updated_at = now()
+    where id = p_shard and lease_owner = p_worker
+    returning campaign_id, attempts into v_campaign, v_attempts;
+
+    if v_campaign is not null and v_attempts >= p_max_attempts then
+        update campaigns set status = 'failed', completed_at = now() where id = v_campaign;
+    end if;
+end;
+$$;
@@ -0,0 +1,36 @@
+-- Open and click tracking.
+-- Buffered tracking events are written in bulk through record_tracking_events;
+-- the first open/click per recipient wins and repeats are no-ops.
+
+create unique index if not exists campaign_prospects_recipient_idx
+    on campaign_prospects (campaign_id, prospect_id);
+
+create or replace function record_tracking_events(events jsonb)
+returns void
+language sql
+as $$
+    insert into campaign_prospects (
+        campaign_id, prospect_id, status, email_status, email_content,
+        opened_at, clicked_at, created_at, updated_at
+    )
+    select
+        e.campaign_id,
+        e.prospect_id,
+        case when e.clicked_at is not null then 'clicked' else 'opened' end,
+        'sent',
+        '',
+        -- A click implies the message was opened
+        coalesce(e.opened_at, e.clicked_at),
+        e.clicked_at,
+        now(),
+        now()
+    from jsonb_to_recordset(events) as e(campaign_id uuid, prospect_id uuid, opened_at timestamptz, clicked_at timestamptz)
+    on conflict (campaign_id, prospect_id) do update set
+        opened_at = coalesce(campaign_prospects.opened_at, excluded.opened_at),
+        clicked_at = coalesce(campaign_prospects.clicked_at, excluded.clicked_at),
+        status = case
+            when coalesce(campaign_prospects.clicked_at, excluded.clicked_at) is not null then 'clicked'
+            else 'opened'
+        end,
+        updated_at = now();
+$$;
@@ -0,0 +1,123 @@
+-- Pre-aggregated campaign analytics.
+-- Counters are maintained incrementally as delivery and tracking events are
+-- written, so reading a campaign's stats never scans campaign_prospects.
+
+create table if not exists campaign_stats (
+    campaign_id uuid primary key references campaigns (id) on delete cascade,
+    sent integer not null default 0,
+    failed integer not null default 0,
+    bounced integer not null default 0,
+    opened integer not null default 0,
+    clicked integer not null default 0,
+    updated_at timestamptz not null default now()
+);
+
+create table if not exists campaign_stats_hourly (
+    campaign_id uuid not null references campaigns (id) on delete cascade,
+    hour timestamptz not null,
+    sent integer not null default 0,
+    failed integer not null default 0,
+    bounced integer not null default 0,
+    opened integer not null default 0,
+    clicked integer not null default 0,
+    primary key (campaign_id, hour)
+);
+
+-- Adds a batch of counter deltas: [{campaign_id, hour, sent, failed, bounced, opened, clicked}]
+create or replace function increment_campaign_stats(deltas jsonb)
+returns void
+language sql
+as $$
+    with d as (
+        select campaign_id, date_trunc('hour', hour) as hour,
+               coalesce(sent, 0) as sent, coalesce(failed, 0) as failed, coalesce(bounced, 0) as bounced,
+               coalesce(opened, 0) as opened, coalesce(clicked, 0) as clicked
+        from jsonb_to_recordset(coalesce(deltas, '[]'::jsonb)) as x(
+            campaign_id uuid, hour timestamptz, sent integer, failed integer,
+            bounced integer, opened integer, clicked integer
+        )
+    ),
+    totals as (
+        insert into campaign_stats as s (campaign_id, sent, failed, bounced, opened, clicked, updated_at)
+        select campaign_id, sum(sent), sum(failed), sum(bounced), sum(opened), sum(clicked), now()
+        from d group by campaign_id
+        on conflict (campaign_id) do update set
+            sent = s.sent + excluded.sent,
+            failed = s.failed + excluded.failed,
+            bounced = s.bounced + excluded.bounced,
+            opened = s.opened + excluded.opened,
+            clicked = s.clicked + excluded.clicked,
+            updated_at = now()
+    )
+    insert into campaign_stats_hourly as h (campaign_id, hour, sent, failed, bounced, opened, clicked)
+    select campaign_id, hour, sum(sent), sum(failed), sum(bounced), sum(opened), sum(clicked)
+    from d group by campaign_id, hour
+    on conflict (campaign_id, hour) do update set
+        sent = h.sent + excluded.sent,
+        failed = h.failed + excluded.failed,
+        bounced = h.bounced + excluded.bounced,
+        opened = h.opened + excluded.opened,
+        clicked = h.clicked + excluded.clicked;
+$$;
+
+-- Tracking writes now also bump the rollups, counting only first opens/clicks per recipient
+create or replace function record_tracking_events(events jsonb)
+returns void
+language plpgsql
+as $$
+declare
+    v_deltas jsonb;
+begin
+    with incoming as (
+        select * from jsonb_to_recordset(events)
+            as e(campaign_id uuid, prospect_id uuid, opened_at timestamptz, clicked_at timestamptz)
+    ),
+    previous as (
+        select cp.campaign_id, cp.prospect_id, cp.opened_at, cp.clicked_at
+        from campaign_prospects cp
+        join incoming i on i.campaign_id = cp.campaign_id and i.prospect_id = cp.prospect_id
+    ),
+    upserted as (
+        insert into campaign_prospects (
+            campaign_id, prospect_id, status, email_status, email_content,
+            opened_at, clicked_at, created_at, updated_at
+        )
+        select
+            i.campaign_id,
+            i.prospect_id,
+            case when i.clicked_at is not null then 'clicked' else 'opened' end,
+            'sent',
+            '',
+            coalesce(i.opened_at, i.clicked_at),
+            i.clicked_at,
+            now(),
+            now()
+        from incoming i
+        on conflict (campaign_id, prospect_id) do update set
+            opened_at = coalesce(campaign_prospects.opened_at, excluded.opened_at),
+            clicked_at = coalesce(campaign_prospects.clicked_at, excluded.clicked_at),
+            status = case
+                when coalesce(campaign_prospects.clicked_at, excluded.clicked_at) is not null then 'clicked'
+                else 'opened'
+            end,
+            updated_at = now()
+        returning campaign_id, prospect_id, opened_at, clicked_at
+    ),
+    first_events as (
+        select u.campaign_id, u.opened_at as hour, 1 as opened, 0 as clicked
+        from upserted u left join previous p using (campaign_id, prospect_id)
+        where u.opened_at is not null and p.opened_at is null
+        union all
+        select u.campaign_id, u.clicked_at as hour, 0 as opened, 1 as clicked
+        from upserted u left join previous p using (campaign_id, prospect_id)
+        where u.clicked_at is not null and p.clicked_at is null
+    )
+    select jsonb_agg(jsonb_build_object(
+        'campaign_id', campaign_id, 'hour', hour, 'opened', opened, 'clicked', clicked
+    ))
+    into v_deltas
+    from first_events;
+
+    perform increment_campaign_stats(v_deltas);
+end;
+$$;
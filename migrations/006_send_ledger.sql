@@ -0,0 +1,11 @@
+-- Append-only ledger of delivered campaign messages.
+-- One row per (campaign, prospect) that was accepted by the mail server; used to
+-- skip already-delivered recipients when a campaign or shard is re-run.
+
+create table if not exists send_ledger (
+    campaign_id uuid not null references campaigns (id) on delete cascade,
+    prospect_id uuid not null,
+    message_id text not null,
+    sent_at timestamptz not null default now(),
+    primary key (campaign_id, prospect_id)
+);
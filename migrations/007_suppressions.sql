@@ -0,0 +1,13 @@
+-- Addresses that must never be emailed again: hard bounces, unsubscribes and manual blocks.
+-- Shared by all users, since a dead or unsubscribed address stays that way whoever sends to it.
+-- Emails are stored lowercased.
+
+create table if not exists suppressions (
+    email text primary key,
+    reason text not null check (reason in ('bounce', 'unsubscribe', 'manual')),
+    created_by uuid,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists suppressions_created_at_idx on suppressions (created_at);
+create index if not exists suppressions_created_by_idx on suppressions (created_by) where created_by is not null;
@@ -0,0 +1,4 @@
+-- Per-campaign choice of email transport; null uses the EMAIL_TRANSPORT setting.
+
+alter table campaigns add column if not exists transport text
+    check (transport in ('smtp', 'http', 'sink'));
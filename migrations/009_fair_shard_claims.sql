@@ -0,0 +1,40 @@
+-- Fair shard claiming across users.
+-- Shards used to be claimed in creation order, so every worker would work through
+-- a large campaign's shards before reaching a campaign started after it. Workers
+-- now claim a shard of the user with the fewest shards currently being sent,
+-- oldest campaign first among equals.
+
+create index if not exists campaign_shards_running_idx
+    on campaign_shards (campaign_id) where status = 'running';
+
+create or replace function claim_campaign_shard(p_worker text, p_lease_seconds integer)
+returns setof campaign_shards
+language sql
+as $$
+    with running as (
+        select c.created_by, count(*) as shards
+        from campaign_shards r
+        join campaigns c on c.id = r.campaign_id
+        where r.status = 'running' and r.lease_expires_at >= now()
+        group by c.created_by
+    ),
+    next_shard as (
+        select s.id
+        from campaign_shards s
+        join campaigns c on c.id = s.campaign_id
+        left join running on running.created_by = c.created_by
+        where s.status = 'pending' or (s.status = 'running' and s.lease_expires_at < now())
+        order by coalesce(running.shards, 0), s.created_at, s.shard_index
+        for update of s skip locked
+        limit 1
+    )
+    update campaign_shards s
+    set status = 'running',
+        lease_owner = p_worker,
+        lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+        attempts = s.attempts + 1,
+        updated_at = now()
+    from next_shard
+    where s.id = next_shard.id
+    returning s.*;
+$$;
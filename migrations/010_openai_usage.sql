@@ -0,0 +1,22 @@
+-- OpenAI token usage per user and day, maintained by the OpenAI gateway.
+
+create table if not exists openai_usage_daily (
+    user_id uuid not null,
+    day date not null,
+    requests integer not null default 0,
+    prompt_tokens bigint not null default 0,
+    completion_tokens bigint not null default 0,
+    primary key (user_id, day)
+);
+
+create or replace function record_openai_usage(p_user uuid, p_day date, p_prompt_tokens integer, p_completion_tokens integer)
+returns void
+language sql
+as $$
+    insert into openai_usage_daily as u (user_id, day, requests, prompt_tokens, completion_tokens)
+    values (p_user, p_day, 1, p_prompt_tokens, p_completion_tokens)
+    on conflict (user_id, day) do update set
+        requests = u.requests + 1,
+        prompt_tokens = u.prompt_tokens + excluded.prompt_tokens,
+        completion_tokens = u.completion_tokens + excluded.completion_tokens;
+$$;
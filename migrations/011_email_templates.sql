@@ -0,0 +1,112 @@
+-- Content-addressed email templates.
+-- Campaigns reference their subject/body through template_id instead of storing
+-- the body inline, so identical content is stored once per user. Editing a
+-- campaign's content creates the next version of its template.
+-- content_hash = sha256 of length(subject) || ':' || subject || content.
+
+create table if not exists email_templates (
+    id uuid primary key default gen_random_uuid(),
+    created_by uuid not null,
+    content_hash text not null,
+    subject text not null,
+    content text not null,
+    version integer not null default 1,
+    parent_id uuid references email_templates (id) on delete set null,
+    created_at timestamptz not null default now(),
+    unique (created_by, content_hash)
+);
+
+alter table campaigns add column if not exists template_id uuid references email_templates (id);
+alter table campaigns alter column content drop not null;
+
+-- Per-recipient rows reference the template; email_content is only kept when it differs
+alter table campaign_prospects add column if not exists template_id uuid references email_templates (id);
+alter table campaign_prospects alter column email_content drop not null;
+
+-- Move existing campaign bodies into templates
+insert into email_templates (created_by, content_hash, subject, content)
+select distinct on (created_by, hash) created_by, hash, subject, content
+from (
+    select created_by, subject, content,
+           encode(sha256(convert_to(length(subject)::text || ':' || subject || content, 'UTF8')), 'hex') as hash
+    from campaigns
+    where template_id is null and content is not null
+) existing
+on conflict (created_by, content_hash) do nothing;
+
+update campaigns c
+set template_id = t.id, content = null
+from email_templates t
+where c.template_id is null
+  and c.content is not null
+  and t.created_by = c.created_by
+  and t.content_hash = encode(sha256(convert_to(length(c.subject)::text || ':' || c.subject || c.content, 'UTF8')), 'hex');
+
+update campaign_prospects cp
+set template_id = c.template_id, email_content = null
+from campaigns c
+where cp.campaign_id = c.id and (cp.email_content is null or cp.email_content = '');
+
+-- Recipient rows created by tracking reference the campaign's template instead of an empty body
+create or replace function record_tracking_events(events jsonb)
+returns void
+language plpgsql
+as $$
+declare
+    v_deltas jsonb;
+begin
+    with incoming as (
+        select * from jsonb_to_recordset(events)
+            as e(campaign_id uuid, prospect_id uuid, opened_at timestamptz, clicked_at timestamptz)
+    ),
+    previous as (
+        select cp.campaign_id, cp.prospect_id, cp.opened_at, cp.clicked_at
+        from campaign_prospects cp
+        join incoming i on i.campaign_id = cp.campaign_id and i.prospect_id = cp.prospect_id
+    ),
+    upserted as (
+        insert into campaign_prospects (
+            campaign_id, prospect_id, status, email_status, template_id, email_content,
+            opened_at, clicked_at, created_at, updated_at
+        )
+        select
+            i.campaign_id,
+            i.prospect_id,
+            case when i.clicked_at is not null then 'clicked' else 'opened' end,
+            'sent',
+            c.template_id,
+            null,
+            coalesce(i.opened_at, i.clicked_at),
+            i.clicked_at,
+            now(),
+            now()
+        from incoming i
+        join campaigns c on c.id = i.campaign_id
+        on conflict (campaign_id, prospect_id) do update set
+            opened_at = coalesce(campaign_prospects.opened_at, excluded.opened_at),
+            clicked_at = coalesce(campaign_prospects.clicked_at, excluded.clicked_at),
+            status = case
+                when coalesce(campaign_prospects.clicked_at, excluded.clicked_at) is not null then 'clicked'
+                else 'opened'
+            end,
+            updated_at = now()
+        returning campaign_id, prospect_id, opened_at, clicked_at
+    ),
+    first_events as (
+        select u.campaign_id, u.opened_at as hour, 1 as opened, 0 as clicked
+        from upserted u left join previous p using (campaign_id, prospect_id)
+        where u.opened_at is not null and p.opened_at is null
+        union all
+        select u.campaign_id, u.clicked_at as hour, 0 as opened, 1 as clicked
+        from upserted u left join previous p using (campaign_id, prospect_id)
+        where u.clicked_at is not null and p.clicked_at is null
+    )
+    select jsonb_agg(jsonb_build_object(
+        'campaign_id', campaign_id, 'hour', hour, 'opened', opened, 'clicked', clicked
+    ))
+    into v_deltas
+    from first_events;
+
+    perform increment_campaign_stats(v_deltas);
+end;
+$$;
@@ -0,0 +1,16 @@
+-- Substring search over prospects' email, full name and company (GET /api/prospects/search).
+-- search_text is a PostgREST computed field, so the API can filter on it with ilike
+-- without adding a column (and rewriting the table). The function is plain SQL and
+-- gets inlined, so the trigram index on the same expression serves '%term%' patterns
+-- of three or more characters. custom_fields filters use prospects_custom_fields_idx (001).
+-- On a large, busy table run the create index by itself with "concurrently".
+
+create extension if not exists pg_trgm;
+
+create or replace function search_text(prospects) returns text
+language sql immutable as $$
+    select $1.email || ' ' || coalesce($1.full_name, '') || ' ' || coalesce($1.company, '')
+$$;
+
+create index if not exists prospects_search_text_idx on prospects
+    using gin ((email || ' ' || coalesce(full_name, '') || ' ' || coalesce(company, '')) gin_trgm_ops);
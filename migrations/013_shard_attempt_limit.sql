@@ -0,0 +1,56 @@
+-- Attempt limit on shard claims.
+-- A shard whose lease expired was re-claimed with another attempt counted, but
+-- only release_campaign_shard checked the limit, so a shard that kept killing its
+-- worker was re-claimed forever. Claims now take the limit: expired shards out of
+-- attempts are failed, with their campaign, instead of being claimed again.
+
+drop function if exists claim_campaign_shard(text, integer);
+
+create or replace function claim_campaign_shard(p_worker text, p_lease_seconds integer, p_max_attempts integer)
+returns setof campaign_shards
+language plpgsql
+as $$
+begin
+    with exhausted as (
+        update campaign_shards
+        set status = 'failed', lease_owner = null, lease_expires_at = null, updated_at = now()
+        where id in (
+            select id from campaign_shards
+            where status = 'running' and lease_expires_at < now() and attempts >= p_max_attempts
+            for update skip locked
+        )
+        returning campaign_id
+    )
+    update campaigns set status = 'failed', completed_at = now()
+    where id in (select campaign_id from exhausted);
+
+    return query
+    with running as (
+        select c.created_by, count(*) as shards
+        from campaign_shards r
+        join campaigns c on c.id = r.campaign_id
+        where r.status = 'running' and r.lease_expires_at >= now()
+        group by c.created_by
+    ),
+    next_shard as (
+        select s.id
+        from campaign_shards s
+        join campaigns c on c.id = s.campaign_id
+        left join running on running.created_by = c.created_by
+        where s.status = 'pending'
+           or (s.status = 'running' and s.lease_expires_at < now() and s.attempts < p_max_attempts)
+        order by coalesce(running.shards, 0), s.created_at, s.shard_index
+        for update of s skip locked
+        limit 1
+    )
+    update campaign_shards s
+    set status = 'running',
+        lease_owner = p_worker,
+        lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+        attempts = s.attempts + 1,
+        updated_at = now()
+    from next_shard
+    where s.id = next_shard.id
+    returning s.*;
+end;
+$$;
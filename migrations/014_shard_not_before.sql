@@ -0,0 +1,72 @@
+-- Handing shards back until they can send.
+-- A shard with a send window used to keep its lease, and its worker's slot, while
+-- sleeping until the window opened or until its next paced send. It is now handed
+-- back with defer_campaign_shard and not claimed again before not_before. A
+-- deferral doesn't count as a failed attempt.
+
+alter table campaign_shards add column if not exists not_before timestamptz;
+
+-- Returns false when the lease was lost
+create or replace function defer_campaign_shard(p_shard uuid, p_worker text, p_not_before timestamptz)
+returns boolean
+language sql
+as $$
+    with deferred as (
+        update campaign_shards
+        set status = 'pending', not_before = p_not_before, attempts = greatest(attempts - 1, 0),
+            lease_owner = null, lease_expires_at = null, updated_at = now()
+        where id = p_shard and lease_owner = p_worker and status = 'running'
+        returning 1
+    )
+    select exists (select 1 from deferred);
+$$;
+
+create or replace function claim_campaign_shard(p_worker text, p_lease_seconds integer, p_max_attempts integer)
+returns setof campaign_shards
+language plpgsql
+as $$
+begin
+    with exhausted as (
+        update campaign_shards
+        set status = 'failed', lease_owner = null, lease_expires_at = null, updated_at = now()
+        where id in (
+            select id from campaign_shards
+            where status = 'running' and lease_expires_at < now() and attempts >= p_max_attempts
+            for update skip locked
+        )
+        returning campaign_id
+    )
+    update campaigns set status = 'failed', completed_at = now()
+    where id in (select campaign_id from exhausted);
+
+    return query
+    with running as (
+        select c.created_by, count(*) as shards
+        from campaign_shards r
+        join campaigns c on c.id = r.campaign_id
+        where r.status = 'running' and r.lease_expires_at >= now()
+        group by c.created_by
+    ),
+    next_shard as (
+        select s.id
+        from campaign_shards s
+        join campaigns c on c.id = s.campaign_id
+        left join running on running.created_by = c.created_by
+        where (s.status = 'pending' and (s.not_before is null or s.not_before <= now()))
+           or (s.status = 'running' and s.lease_expires_at < now() and s.attempts < p_max_attempts)
+        order by coalesce(running.shards, 0), s.created_at, s.shard_index
+        for update of s skip locked
+        limit 1
+    )
+    update campaign_shards s
+    set status = 'running',
+        lease_owner = p_worker,
+        lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+        attempts = s.attempts + 1,
+        not_before = null,
+        updated_at = now()
+    from next_shard
+    where s.id = next_shard.id
+    returning s.*;
+end;
+$$;
@@ -0,0 +1,6 @@
+-- Each shard of an inline prospect_ids campaign carries its own slice of the ids.
+-- Workers used to read the campaign's whole prospect_ids array for every shard,
+-- so a campaign's ids were transferred once per shard. range_start and range_end
+-- are still filled in, and shards created before this migration keep using them.
+
+alter table campaign_shards add column if not exists prospect_ids uuid[];
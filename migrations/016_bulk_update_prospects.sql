@@ -0,0 +1,23 @@
+-- Update-only bulk writes for POST /api/prospects/bulk.
+-- The endpoint used to look the ids up and then upsert the ones it found, so a
+-- prospect deleted in between was inserted again by the upsert. One update ...
+-- from the batch's rows now only touches rows that exist when it runs, and the
+-- ids it returns are the ones updated; the caller reports the rest as not found.
+
+-- Updates a batch of prospects: [{id, email, full_name, company, custom_fields}]
+create or replace function update_prospects(p_rows jsonb)
+returns table (id uuid)
+language sql
+as $$
+    update prospects p
+    set email = r.email,
+        full_name = r.full_name,
+        company = r.company,
+        custom_fields = r.custom_fields,
+        updated_at = now()
+    from jsonb_to_recordset(coalesce(p_rows, '[]'::jsonb)) as r(
+        id uuid, email text, full_name text, company text, custom_fields jsonb
+    )
+    where p.id = r.id
+    returning p.id;
+$$;
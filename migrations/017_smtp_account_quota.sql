@@ -0,0 +1,35 @@
+-- Daily SMTP account quotas shared by every process sending through the account.
+-- Each process used to count sends against daily_quota by itself, so N replicas
+-- could send N times an account's quota. Processes now reserve quota in blocks
+-- from one counter row per account and day; reserved counts units handed out,
+-- whether or not they have been used yet.
+
+create table if not exists smtp_account_usage (
+    account text not null,
+    day date not null,
+    reserved integer not null default 0,
+    primary key (account, day)
+);
+
+-- Reserves up to p_count units of an account's quota for the day; returns the units granted, 0 once it is used up
+create or replace function reserve_smtp_quota(p_account text, p_day date, p_quota integer, p_count integer)
+returns integer
+language plpgsql
+as $$
+declare
+    v_granted integer;
+begin
+    insert into smtp_account_usage (account, day) values (p_account, p_day)
+    on conflict (account, day) do nothing;
+
+    select greatest(least(p_count, p_quota - reserved), 0) into v_granted
+    from smtp_account_usage
+    where account = p_account and day = p_day
+    for update;
+
+    update smtp_account_usage set reserved = reserved + v_granted
+    where account = p_account and day = p_day;
+
+    return v_granted;
+end;
+$$;
@@ -1,8 +1,22 @@
 from .base import TimestampedModel, UserOwnedModel
 from .user import UserBase, UserCreate, UserDB, UserResponse
-from .campaign import CampaignBase, CampaignCreate, CampaignDB, CampaignResponse, CampaignStatus
+from .campaign import CampaignBase, CampaignCreate, CampaignDB, CampaignResponse, CampaignSchedule, CampaignStatus
+from .campaign_stats import CampaignStats, CampaignStatsBucket
 from .product import ProductBase, ProductCreate, ProductDB, ProductResponse
-from .prospect import ProspectBase, ProspectCreate, ProspectDB, ProspectResponse
+from .prospect import (
+    ProspectBase,
+    ProspectBulkDelete,
+    ProspectBulkItem,
+    ProspectBulkResult,
+    ProspectBulkStatus,
+    ProspectBulkUpsert,
+    ProspectCreate,
+    ProspectDB,
+    ProspectResponse
+)
+from .segment import SegmentBase, SegmentCreate, SegmentDB, SegmentResponse
+from .suppression import SuppressionCreate, SuppressionReason, SuppressionResponse
+from .template import EmailTemplateCreate, EmailTemplateResponse, EmailTemplateSummary
 from .campaign_prospect import (
     CampaignProspectBase,
     CampaignProspectCreate,
@@ -23,15 +37,33 @@ __all__ = [
     "CampaignCreate",
     "CampaignDB",
     "CampaignResponse",
+    "CampaignSchedule",
     "CampaignStatus",
+    "CampaignStats",
+    "CampaignStatsBucket",
     "ProductBase",
     "ProductCreate",
     "ProductDB",
     "ProductResponse",
     "ProspectBase",
+    "ProspectBulkDelete",
+    "ProspectBulkItem",
+    "ProspectBulkResult",
+    "ProspectBulkStatus",
+    "ProspectBulkUpsert",
     "ProspectCreate",
     "ProspectDB",
     "ProspectResponse",
+    "SegmentBase",
+    "SegmentCreate",
+    "SegmentDB",
+    "SegmentResponse",
+    "SuppressionCreate",
+    "SuppressionReason",
+    "SuppressionResponse",
+    "EmailTemplateCreate",
+    "EmailTemplateResponse",
+    "EmailTemplateSummary",
     "CampaignProspectBase",
     "CampaignProspectCreate",
     "CampaignProspectDB",
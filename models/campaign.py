@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, EmailStr, Field, model_validator
+from typing import List, Literal, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -15,17 +15,39 @@ class CampaignBase(BaseModel):
     subject: str
     content: str
     product_id: str
-    prospect_ids: List[str]
+    # Targets are either an inline list of prospects or a saved segment
+    prospect_ids: Optional[List[str]] = None
+    segment_id: Optional[str] = None
+    # Optional daily send window in recipient-local hours, e.g. 9 to 17
+    send_window_start: Optional[int] = Field(None, ge=0, le=23)
+    send_window_end: Optional[int] = Field(None, ge=1, le=24)
+    # Fallback timezone for prospects without a "timezone" custom field
+    timezone: Optional[str] = None
+    # Email transport to send through; the EMAIL_TRANSPORT setting when unset
+    transport: Optional[Literal['smtp', 'http', 'sink']] = None
 
 class CampaignCreate(CampaignBase):
-    pass
+    @model_validator(mode='after')
+    def require_single_target(self):
+        if bool(self.prospect_ids) == bool(self.segment_id):
+            raise ValueError('Provide either prospect_ids or segment_id')
+        if (self.send_window_start is None) != (self.send_window_end is None):
+            raise ValueError('Provide both send_window_start and send_window_end')
+        return self
+
+class CampaignSchedule(BaseModel):
+    scheduled_at: datetime
 
 class CampaignDB(CampaignBase):
     id: str
+    # The body lives in the referenced email template; filled in when read with it
+    content: Optional[str] = None
+    template_id: Optional[str] = None
     status: CampaignStatus
     created_by: str
     created_at: datetime
     updated_at: datetime
+    scheduled_at: Optional[datetime] = None
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     total_prospects: int
@@ -7,7 +7,9 @@ class CampaignProspectBase(BaseModel):
     campaign_id: UUID4
     prospect_id: UUID4
     status: str
-    email_content: str
+    template_id: Optional[UUID4] = None
+    # Only set when the recipient's content differs from the template
+    email_content: Optional[str] = None
     email_status: str
     sent_at: Optional[datetime] = None
     opened_at: Optional[datetime] = None
@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List
+
+class CampaignStatsBucket(BaseModel):
+    hour: datetime
+    sent: int = 0
+    failed: int = 0
+    bounced: int = 0
+    opened: int = 0
+    clicked: int = 0
+
+class CampaignStats(BaseModel):
+    campaign_id: str
+    total_prospects: int
+    sent: int = 0
+    failed: int = 0
+    bounced: int = 0
+    opened: int = 0
+    clicked: int = 0
+    open_rate: float = 0.0
+    click_rate: float = 0.0
+    bounce_rate: float = 0.0
+    hourly: List[CampaignStatsBucket] = []
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, UUID4
-from typing import Optional, Dict, Any
+from typing import Any, Dict, List, Literal, Optional
 from .base import UserOwnedModel
 
 class ProspectBase(BaseModel):
@@ -7,6 +7,7 @@ class ProspectBase(BaseModel):
     full_name: str
     company: Optional[str] = None
     custom_fields: Optional[Dict[str, Any]] = None
+    import_batch_id: Optional[str] = None
 
 class ProspectCreate(ProspectBase):
     pass
@@ -15,4 +16,27 @@ class ProspectDB(ProspectBase, UserOwnedModel):
     id: UUID4
 
 class ProspectResponse(ProspectDB):
-    pass 
\ No newline at end of file
+    pass
+
+ProspectBulkStatus = Literal['created', 'updated', 'deleted', 'not_found', 'invalid', 'error']
+
+class ProspectBulkItem(BaseModel):
+    id: Optional[UUID4] = None
+    email: EmailStr
+    full_name: str
+    company: Optional[str] = None
+    custom_fields: Optional[Dict[str, Any]] = None
+
+class ProspectBulkUpsert(BaseModel):
+    # Items with an id update that prospect, items without one create a prospect.
+    # Each item is validated separately so one bad row doesn't reject the batch.
+    prospects: List[Dict[str, Any]]
+
+class ProspectBulkDelete(BaseModel):
+    ids: List[UUID4]
+
+class ProspectBulkResult(BaseModel):
+    index: int
+    id: Optional[str] = None
+    status: ProspectBulkStatus
+    error: Optional[str] = None
@@ -0,0 +1,25 @@
+from pydantic import BaseModel, model_validator
+from typing import Optional, Dict, Any
+from .base import UserOwnedModel
+
+class SegmentBase(BaseModel):
+    name: str
+    description: Optional[str] = None
+    company: Optional[str] = None
+    custom_fields: Optional[Dict[str, Any]] = None
+    import_batch_id: Optional[str] = None
+
+    @model_validator(mode='after')
+    def require_filter(self):
+        if not (self.company or self.custom_fields or self.import_batch_id):
+            raise ValueError('A segment needs at least one of company, custom_fields or import_batch_id')
+        return self
+
+class SegmentCreate(SegmentBase):
+    pass
+
+class SegmentDB(SegmentBase, UserOwnedModel):
+    id: str
+
+class SegmentResponse(SegmentDB):
+    pass
@@ -0,0 +1,14 @@
+from pydantic import BaseModel, EmailStr
+from typing import Literal, Optional
+from datetime import datetime
+
+SuppressionReason = Literal['bounce', 'unsubscribe', 'manual']
+
+class SuppressionCreate(BaseModel):
+    email: EmailStr
+
+class SuppressionResponse(BaseModel):
+    email: str
+    reason: SuppressionReason
+    created_by: Optional[str] = None
+    created_at: datetime
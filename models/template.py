@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class EmailTemplateCreate(BaseModel):
+    subject: str
+    content: str
+    # Template this one is a new version of
+    parent_id: Optional[str] = None
+
+class EmailTemplateSummary(BaseModel):
+    id: str
+    content_hash: str
+    subject: str
+    version: int
+    parent_id: Optional[str] = None
+    created_by: str
+    created_at: datetime
+
+class EmailTemplateResponse(EmailTemplateSummary):
+    content: str
@@ -9,17 +9,10 @@ import uuid
 from datetime import datetime
 import re
 import json
-import traceback
 
 router = APIRouter()
 security = HTTPBearer()
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-
-# Configure logging format
-handler = logging.StreamHandler()
-handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-logger.addHandler(handler)
 
 # Email validation regex
 EMAIL_REGEX = re.compile(r"[^@]+@[^@]+\.[^@]+")
@@ -36,6 +29,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+async def get_admin_user(current_user: str = Depends(get_current_user)) -> str:
+    """Like get_current_user, but only for users listed in ADMIN_USER_IDS."""
+    if current_user not in auth_settings.admin_user_ids:
+        raise HTTPException(status_code=403, detail="Not allowed")
+    return current_user
+
 class UserCreate(BaseModel):
     email: str
     password: str
@@ -84,7 +83,7 @@ async def test_connection():
         result = supabase.table('users').select("*", count='exact').execute()
         return {"status": "success", "user_count": len(result.data)}
     except Exception as e:
-        logger.error(f"Database connection error: {str(e)}")
+        logger.error("Database connection error: %s", e)
         raise HTTPException(status_code=500, detail=f"Database connection error: {str(e)}")
 
 @router.post("/test-create-user")
@@ -99,14 +98,13 @@ async def test_create_user():
         
         return {"status": "success", "user": user_data.data[0]}
     except Exception as e:
-        logger.error(f"Error creating test user: {str(e)}")
+        logger.error("Error creating test user: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/signup", response_model=UserResponse)
 async def signup(user: UserCreate):
     try:
-        logger.info(f"Starting signup process for email: {user.email}")
-        logger.debug(f"Full signup request data: {user.dict()}")
+        logger.info("Starting signup process for email: %s", user.email)
         
         # Try to create the auth user
         try:
@@ -121,13 +119,12 @@ async def signup(user: UserCreate):
                     "full_name": user.full_name
                 }
             })
-            logger.debug(f"Raw Supabase response: {auth_response}")
             
             if not auth_response.user:
                 logger.error("Auth response did not contain user data")
                 raise HTTPException(status_code=400, detail="Failed to create user account")
             
-            logger.info(f"Successfully created auth user with ID: {auth_response.user.id}")
+            logger.info("Successfully created auth user with ID: %s", auth_response.user.id)
             
             try:
                 # Create user profile in users table
@@ -140,14 +137,14 @@ async def signup(user: UserCreate):
                     "password_hash": "MANAGED_BY_SUPABASE_AUTH"  # Placeholder value
                 }).execute()
                 
-                logger.debug(f"User profile created: {user_data}")
+                logger.debug("User profile created: %s", user_data)
             except Exception as profile_error:
-                logger.error(f"Failed to create user profile: {str(profile_error)}")
+                logger.error("Failed to create user profile: %s", profile_error)
                 # If profile creation fails, we should delete the auth user
                 try:
                     supabase.auth.admin.delete_user(auth_response.user.id)
                 except Exception as cleanup_error:
-                    logger.error(f"Failed to cleanup auth user: {str(cleanup_error)}")
+                    logger.error("Failed to cleanup auth user: %s", cleanup_error)
                 raise profile_error
             
             # Return user data
@@ -158,18 +155,16 @@ async def signup(user: UserCreate):
             }
             
         except Exception as auth_error:
-            logger.error(f"Supabase auth error: {str(auth_error)}")
-            logger.error(f"Error traceback: {traceback.format_exc()}")
+            logger.exception("Supabase auth error: %s", auth_error)
             if hasattr(auth_error, 'message'):
                 raise HTTPException(status_code=400, detail=auth_error.message)
             raise HTTPException(status_code=400, detail=str(auth_error))
         
     except ValueError as e:
-        logger.error(f"Validation error: {str(e)}")
+        logger.error("Validation error: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Unexpected error during signup: {str(e)}")
-        logger.error(f"Error traceback: {traceback.format_exc()}")
+        logger.exception("Unexpected error during signup: %s", e)
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
@@ -177,7 +172,7 @@ async def signup(user: UserCreate):
 @router.post("/login")
 async def login(user: UserLogin):
     try:
-        logger.info(f"Attempting login for email: {user.email}")
+        logger.info("Attempting login for email: %s", user.email)
         auth_response = supabase.auth.sign_in_with_password({
             "email": user.email,
             "password": user.password
@@ -188,8 +183,7 @@ async def login(user: UserLogin):
             "token_type": "bearer"
         }
     except Exception as e:
-        logger.error(f"Login error: {str(e)}")
-        logger.error(f"Error traceback: {traceback.format_exc()}")
+        logger.exception("Login error: %s", e)
         raise HTTPException(status_code=401, detail="Invalid credentials") 
 
 @router.get("/test-supabase")
@@ -199,11 +193,11 @@ async def test_supabase():
         
         # Test database connection
         db_result = supabase.table('users').select("*", count='exact').execute()
-        logger.debug(f"Database test result: {db_result}")
+        logger.debug("Database test result: %s", db_result)
         
         # Test auth functionality
         auth_result = supabase.auth.get_session()
-        logger.debug(f"Auth test result: {auth_result}")
+        logger.debug("Auth test result: %s", auth_result)
         
         return {
             "status": "success",
@@ -211,6 +205,5 @@ async def test_supabase():
             "auth_test": "passed" if auth_result else "failed"
         }
     except Exception as e:
-        logger.error(f"Supabase test error: {str(e)}")
-        logger.error(f"Error traceback: {traceback.format_exc()}")
+        logger.exception("Supabase test error: %s", e)
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -1,234 +1,358 @@
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 from config.supabase import supabase
-from models.campaign import CampaignDB, CampaignCreate, CampaignStatus
+from models.campaign import CampaignDB, CampaignCreate, CampaignSchedule, CampaignStatus
+from models.campaign_stats import CampaignStats
+from services.shard_worker import create_campaign_shards
+from services.scheduler import campaign_scheduler
+from services.segments import count_segment_prospects
 from services.email_service import email_service
+from services.templates import store_template, template_hash
 from .auth import get_current_user
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Campaign columns returned by list endpoints; leaves out the inline prospect_ids array
+CAMPAIGN_SUMMARY_COLUMNS = (
+    "id, name, subject, content, product_id, segment_id, send_window_start, send_window_end, timezone, transport, "
+    "status, created_by, created_at, updated_at, scheduled_at, started_at, completed_at, "
+    "total_prospects, sent_count, failed_count, template_id, email_templates(content)"
+)
+
+def with_template(campaign: dict) -> dict:
+    """Fill a campaign row's content from its embedded email template."""
+    template = campaign.pop('email_templates', None)
+    if template and not campaign.get('content'):
+        campaign['content'] = template['content']
+    return campaign
+
+def count_campaign_targets(campaign: CampaignCreate, current_user: str) -> int:
+    """Validate the campaign's targets and return how many prospects they cover."""
+    if campaign.segment_id:
+        segment = supabase.table('segments').select("*").eq('id', campaign.segment_id).eq('created_by', current_user).execute()
+        if not segment.data:
+            raise HTTPException(status_code=404, detail="Segment not found")
+        return count_segment_prospects(segment.data[0])
+
+    # Validate prospects exist
+    prospects = supabase.table('prospects').select("id").in_('id', campaign.prospect_ids).execute()
+    if len(prospects.data) != len(campaign.prospect_ids):
+        raise HTTPException(status_code=404, detail="Some prospects not found")
+    return len(campaign.prospect_ids)
+
 @router.post("/", response_model=CampaignDB)
 async def create_campaign(campaign: CampaignCreate, current_user: str = Depends(get_current_user)):
     try:
         # Validate product exists
-        product = supabase.table('products').select("*").eq('id', campaign.product_id).execute()
+        product = supabase.table('products').select("id").eq('id', campaign.product_id).execute()
         if not product.data:
             raise HTTPException(status_code=404, detail="Product not found")
 
-        # Validate prospects exist
-        prospects = supabase.table('prospects').select("*").in_('id', campaign.prospect_ids).execute()
-        if len(prospects.data) != len(campaign.prospect_ids):
-            raise HTTPException(status_code=404, detail="Some prospects not found")
+        total_prospects = count_campaign_targets(campaign, current_user)
+        if campaign.transport:
+            # Fails when the transport isn't configured
+            email_service.transport(campaign.transport)
+        template = store_template(current_user, campaign.subject, campaign.content)
 
         now = datetime.utcnow().isoformat()
         result = supabase.table('campaigns').insert({
             "name": campaign.name,
             "subject": campaign.subject,
-            "content": campaign.content,
+            "content": None,
             "product_id": campaign.product_id,
+            "template_id": template['id'],
             "prospect_ids": campaign.prospect_ids,
+            "segment_id": campaign.segment_id,
+            "send_window_start": campaign.send_window_start,
+            "send_window_end": campaign.send_window_end,
+            "timezone": campaign.timezone,
+            "transport": campaign.transport,
             "status": CampaignStatus.DRAFT,
             "created_by": current_user,
             "created_at": now,
             "updated_at": now,
-            "total_prospects": len(campaign.prospect_ids),
+            "total_prospects": total_prospects,
             "sent_count": 0,
             "failed_count": 0
         }).execute()
 
-        return result.data[0]
+        return {**result.data[0], "content": campaign.content}
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error creating campaign: {str(e)}")
+        logger.error("Error creating campaign: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/{campaign_id}", response_model=CampaignDB)
 async def update_campaign(campaign_id: str, campaign: CampaignCreate, current_user: str = Depends(get_current_user)):
+    """
+    Update a draft campaign.
+
+    Round trips: one read of the campaign with its template's hash embedded,
+    one or two to count the targets and one conditional update. The product
+    is only checked when it changes and the template only stored when the
+    subject or content changes (one to three more).
+    """
     try:
-        # Check if campaign exists and belongs to user
-        existing = supabase.table('campaigns').select("*").eq('id', campaign_id).eq('created_by', current_user).single().execute()
+        existing = supabase.table('campaigns').select("status, product_id, template_id, email_templates(content_hash)")\
+            .eq('id', campaign_id).eq('created_by', current_user).execute()
         if not existing.data:
             raise HTTPException(status_code=404, detail="Campaign not found")
+        current = existing.data[0]
 
         # Check if campaign can be updated (must be in draft status)
-        if existing.data['status'] != CampaignStatus.DRAFT:
+        if current['status'] != CampaignStatus.DRAFT:
             raise HTTPException(status_code=400, detail="Only draft campaigns can be updated")
 
-        # Validate product exists
-        product = supabase.table('products').select("*").eq('id', campaign.product_id).execute()
-        if not product.data:
-            raise HTTPException(status_code=404, detail="Product not found")
-
-        # Validate prospects exist
-        prospects = supabase.table('prospects').select("*").in_('id', campaign.prospect_ids).execute()
-        if len(prospects.data) != len(campaign.prospect_ids):
-            raise HTTPException(status_code=404, detail="Some prospects not found")
-
-        # Update campaign
+        if campaign.product_id != current['product_id']:
+            product = supabase.table('products').select("id").eq('id', campaign.product_id).execute()
+            if not product.data:
+                raise HTTPException(status_code=404, detail="Product not found")
+
+        total_prospects = count_campaign_targets(campaign, current_user)
+        if campaign.transport:
+            # Fails when the transport isn't configured
+            email_service.transport(campaign.transport)
+        template_id = current.get('template_id')
+        stored = current.get('email_templates') or {}
+        if not template_id or stored.get('content_hash') != template_hash(campaign.subject, campaign.content):
+            # Changed content becomes the next version of the current template
+            template_id = store_template(current_user, campaign.subject, campaign.content, template_id)['id']
+
+        # The status filter keeps a campaign started meanwhile from being edited
         result = supabase.table('campaigns').update({
             "name": campaign.name,
             "subject": campaign.subject,
-            "content": campaign.content,
+            "content": None,
             "product_id": campaign.product_id,
+            "template_id": template_id,
             "prospect_ids": campaign.prospect_ids,
+            "segment_id": campaign.segment_id,
+            "send_window_start": campaign.send_window_start,
+            "send_window_end": campaign.send_window_end,
+            "timezone": campaign.timezone,
+            "transport": campaign.transport,
             "updated_at": datetime.utcnow().isoformat(),
-            "total_prospects": len(campaign.prospect_ids)
-        }).eq('id', campaign_id).execute()
+            "total_prospects": total_prospects
+        }).eq('id', campaign_id).eq('created_by', current_user).eq('status', CampaignStatus.DRAFT.value).execute()
+        if not result.data:
+            raise HTTPException(status_code=400, detail="Only draft campaigns can be updated")
 
-        return result.data[0]
+        return {**result.data[0], "content": campaign.content}
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error updating campaign: {str(e)}")
+        logger.error("Error updating campaign: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/", response_model=List[CampaignDB])
 async def list_campaigns(current_user: str = Depends(get_current_user)):
     try:
-        result = supabase.table('campaigns').select("*").eq('created_by', current_user).execute()
-        return result.data
+        result = supabase.table('campaigns').select(CAMPAIGN_SUMMARY_COLUMNS).eq('created_by', current_user).execute()
+        return [with_template(campaign) for campaign in result.data]
     except Exception as e:
-        logger.error(f"Error listing campaigns: {str(e)}")
+        logger.error("Error listing campaigns: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{campaign_id}", response_model=CampaignDB)
 async def get_campaign(campaign_id: str, current_user: str = Depends(get_current_user)):
     try:
-        result = supabase.table('campaigns').select("*").eq('id', campaign_id).eq('created_by', current_user).execute()
+        result = supabase.table('campaigns').select("*, email_templates(content)").eq('id', campaign_id).eq('created_by', current_user).execute()
         if not result.data:
             raise HTTPException(status_code=404, detail="Campaign not found")
-        return result.data[0]
+        return with_template(result.data[0])
     except Exception as e:
-        logger.error(f"Error getting campaign: {str(e)}")
+        logger.error("Error getting campaign: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
-async def send_campaign_emails(campaign_id: str, current_user: str):
+@router.get("/{campaign_id}/stats", response_model=CampaignStats)
+async def get_campaign_stats(campaign_id: str, current_user: str = Depends(get_current_user)):
+    """Read the campaign's pre-aggregated rollups in a single query."""
     try:
-        # Get campaign details
-        campaign = supabase.table('campaigns').select("*").eq('id', campaign_id).single().execute()
-        if not campaign.data:
-            logger.error(f"Campaign {campaign_id} not found")
-            return
+        result = supabase.table('campaigns').select(
+            "id, total_prospects, campaign_stats(*), campaign_stats_hourly(*)"
+        ).eq('id', campaign_id).eq('created_by', current_user).execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Campaign not found")
 
-        # Update campaign status to running
-        supabase.table('campaigns').update({
-            "status": CampaignStatus.RUNNING,
-            "started_at": datetime.utcnow().isoformat()
-        }).eq('id', campaign_id).execute()
+        row = result.data[0]
+        totals = row.get('campaign_stats') or {}
+        if isinstance(totals, list):
+            totals = totals[0] if totals else {}
+        counters = {name: totals.get(name, 0) for name in ("sent", "failed", "bounced", "opened", "clicked")}
+        sent = counters["sent"]
+        attempted = sent + counters["failed"]
+        return CampaignStats(
+            campaign_id=campaign_id,
+            total_prospects=row['total_prospects'],
+            **counters,
+            open_rate=counters["opened"] / sent if sent else 0.0,
+            click_rate=counters["clicked"] / sent if sent else 0.0,
+            bounce_rate=counters["bounced"] / attempted if attempted else 0.0,
+            hourly=sorted(row.get('campaign_stats_hourly') or [], key=lambda bucket: bucket['hour'])
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error getting campaign stats: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Get product details
-        product = supabase.table('products').select("*").eq('id', campaign.data['product_id']).single().execute()
-        if not product.data:
-            logger.error(f"Product not found for campaign {campaign_id}")
-            supabase.table('campaigns').update({
-                "status": CampaignStatus.FAILED,
-                "completed_at": datetime.utcnow().isoformat()
-            }).eq('id', campaign_id).execute()
-            return
+def fail_campaign(campaign_id: str):
+    supabase.table('campaigns').update({
+        "status": CampaignStatus.FAILED,
+        "completed_at": datetime.utcnow().isoformat()
+    }).eq('id', campaign_id).execute()
 
-        # Get prospects
-        prospects = supabase.table('prospects').select("*").in_('id', campaign.data['prospect_ids']).execute()
-        if not prospects.data:
-            logger.error(f"No prospects found for campaign {campaign_id}")
-            supabase.table('campaigns').update({
-                "status": CampaignStatus.FAILED,
-                "completed_at": datetime.utcnow().isoformat()
-            }).eq('id', campaign_id).execute()
-            return
+async def send_campaign_emails(campaign_id: str, current_user: str, campaign: Optional[dict] = None):
+    """
+    Queue a campaign that was already claimed as RUNNING for sending.
 
-        # Prepare recipients list with template variables
-        recipients = [{
-            'email': prospect['email'],
-            'prospect_name': prospect['full_name'],
-            'company_name': prospect.get('company', ''),
-            'product_name': product.data['name']
-        } for prospect in prospects.data]
-
-        # Send emails using bulk send
-        successful_emails, failed_emails = email_service.send_bulk_emails(
-            recipients=recipients,
-            subject=campaign.data['subject'],
-            content_template=campaign.data['content']
-        )
+    Callers pass the row their claiming update returned, so the only round trip
+    before sharding is the product check; without it, the campaign is read
+    with its product embedded in one query instead.
+    """
+    try:
+        if campaign is None:
+            result = supabase.table('campaigns').select("*, products(id)").eq('id', campaign_id).execute()
+            if not result.data:
+                logger.error("Campaign %s not found", campaign_id)
+                return
+            campaign = result.data[0]
+            product_found = bool(campaign.pop('products', None))
+        else:
+            product = supabase.table('products').select("id").eq('id', campaign['product_id']).execute()
+            product_found = bool(product.data)
+
+        if not product_found:
+            logger.error("Product not found for campaign %s", campaign_id)
+            fail_campaign(campaign_id)
+            return
 
-        # Update campaign status
-        supabase.table('campaigns').update({
-            "status": CampaignStatus.COMPLETED if len(failed_emails) == 0 else CampaignStatus.FAILED,
-            "completed_at": datetime.utcnow().isoformat(),
-            "sent_count": len(successful_emails),
-            "failed_count": len(failed_emails)
-        }).eq('id', campaign_id).execute()
+        # Split the audience into shards; shard workers (in this or other processes) send them
+        shard_count = await create_campaign_shards(campaign)
+        if shard_count == 0:
+            logger.error("No prospects found for campaign %s", campaign_id)
+            fail_campaign(campaign_id)
+            return
 
-        # Log results
-        logger.info(f"Campaign {campaign_id} completed: {len(successful_emails)} sent, {len(failed_emails)} failed")
+        logger.info("Campaign %s queued as %s shards", campaign_id, shard_count)
 
     except Exception as e:
-        logger.error(f"Error processing campaign {campaign_id}: {str(e)}")
-        # Update campaign status to failed
-        supabase.table('campaigns').update({
-            "status": CampaignStatus.FAILED,
-            "completed_at": datetime.utcnow().isoformat()
-        }).eq('id', campaign_id).execute()
+        logger.error("Error processing campaign %s: %s", campaign_id, e)
+        fail_campaign(campaign_id)
 
 @router.post("/{campaign_id}/start")
 async def start_campaign(campaign_id: str, background_tasks: BackgroundTasks, current_user: str = Depends(get_current_user)):
+    """
+    One round trip: a conditional update claims the campaign as RUNNING only if
+    it belongs to the user and can be started, so it can't be started twice.
+    """
     try:
-        # Check if campaign exists and belongs to user
-        campaign = supabase.table('campaigns').select("*").eq('id', campaign_id).eq('created_by', current_user).single().execute()
-        if not campaign.data:
-            raise HTTPException(status_code=404, detail="Campaign not found")
+        result = supabase.table('campaigns').update({
+            "status": CampaignStatus.RUNNING,
+            "started_at": datetime.utcnow().isoformat(),
+            "completed_at": None
+        }).eq('id', campaign_id).eq('created_by', current_user).in_(
+            'status', [CampaignStatus.DRAFT.value, CampaignStatus.FAILED.value, CampaignStatus.SCHEDULED.value]
+        ).execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Campaign not found or cannot be started")
 
-        # Check if campaign can be started
-        if campaign.data['status'] not in [CampaignStatus.DRAFT, CampaignStatus.FAILED]:
-            raise HTTPException(status_code=400, detail="Campaign cannot be started")
+        # Starting now supersedes any pending schedule
+        campaign_scheduler.cancel(campaign_id)
 
         # Add email sending task to background tasks
-        background_tasks.add_task(send_campaign_emails, campaign_id, current_user)
+        background_tasks.add_task(send_campaign_emails, campaign_id, current_user, result.data[0])
 
         return {"message": "Campaign started successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error starting campaign: {str(e)}")
+        logger.error("Error starting campaign: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/{campaign_id}/retry")
-async def retry_campaign(campaign_id: str, background_tasks: BackgroundTasks, current_user: str = Depends(get_current_user)):
+@router.post("/{campaign_id}/schedule", response_model=CampaignDB)
+async def schedule_campaign(campaign_id: str, schedule: CampaignSchedule, current_user: str = Depends(get_current_user)):
     try:
-        # Check if campaign exists and belongs to user
-        campaign = supabase.table('campaigns').select("*").eq('id', campaign_id).eq('created_by', current_user).single().execute()
-        if not campaign.data:
-            raise HTTPException(status_code=404, detail="Campaign not found")
+        # Only draft or already scheduled campaigns owned by the user can be (re)scheduled
+        result = supabase.table('campaigns').update({
+            "status": CampaignStatus.SCHEDULED,
+            "scheduled_at": schedule.scheduled_at.isoformat(),
+            "updated_at": datetime.utcnow().isoformat()
+        }).eq('id', campaign_id).eq('created_by', current_user).in_(
+            'status', [CampaignStatus.DRAFT.value, CampaignStatus.SCHEDULED.value]
+        ).execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Campaign not found or cannot be scheduled")
+
+        campaign_scheduler.schedule(campaign_id, schedule.scheduled_at)
+        return result.data[0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error scheduling campaign: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{campaign_id}/unschedule", response_model=CampaignDB)
+async def unschedule_campaign(campaign_id: str, current_user: str = Depends(get_current_user)):
+    try:
+        result = supabase.table('campaigns').update({
+            "status": CampaignStatus.DRAFT,
+            "scheduled_at": None,
+            "updated_at": datetime.utcnow().isoformat()
+        }).eq('id', campaign_id).eq('created_by', current_user).eq('status', CampaignStatus.SCHEDULED.value).execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Scheduled campaign not found")
 
-        # Check if campaign can be retried (must be completed with failed emails)
-        if campaign.data['status'] != CampaignStatus.COMPLETED or campaign.data['failed_count'] == 0:
-            raise HTTPException(status_code=400, detail="Campaign cannot be retried")
+        campaign_scheduler.cancel(campaign_id)
+        return result.data[0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error unscheduling campaign: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Reset campaign status for retry
-        supabase.table('campaigns').update({
+@router.post("/{campaign_id}/retry")
+async def retry_campaign(campaign_id: str, background_tasks: BackgroundTasks, current_user: str = Depends(get_current_user)):
+    """One round trip: only the user's completed campaigns with failed emails are claimed for a retry."""
+    try:
+        # Successful sends are kept; the failed count starts over
+        result = supabase.table('campaigns').update({
             "status": CampaignStatus.RUNNING,
             "started_at": datetime.utcnow().isoformat(),
             "completed_at": None,
-            "sent_count": campaign.data['sent_count'],  # Keep existing successful sends
-            "failed_count": 0  # Reset failed count
-        }).eq('id', campaign_id).execute()
+            "failed_count": 0
+        }).eq('id', campaign_id).eq('created_by', current_user).eq('status', CampaignStatus.COMPLETED.value).gt(
+            'failed_count', 0
+        ).execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Campaign not found or cannot be retried")
 
         # Add email sending task to background tasks
-        background_tasks.add_task(send_campaign_emails, campaign_id, current_user)
+        background_tasks.add_task(send_campaign_emails, campaign_id, current_user, result.data[0])
 
         return {"message": "Campaign retry initiated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error retrying campaign: {str(e)}")
+        logger.error("Error retrying campaign: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/{campaign_id}")
-async def delete_campaign(campaign_id: str):
+async def delete_campaign(campaign_id: str, current_user: str = Depends(get_current_user)):
     try:
         # Delete the campaign from Supabase
-        response = supabase.table('campaigns').delete().eq('id', campaign_id).execute()
+        response = supabase.table('campaigns').delete().eq('id', campaign_id).eq('created_by', current_user).execute()
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Campaign not found")
             
         return {"message": "Campaign deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error deleting campaign: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        logger.error("Error deleting campaign: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,14 +1,15 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-import openai
-from config.openai import openai_settings
+from typing import List
+from datetime import date, timedelta
+from config.supabase import supabase
+from services.openai_gateway import GatewayBusy, RateLimited, openai_gateway
+from .auth import get_current_user
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-openai.api_key = openai_settings.api_key
-
 class EmailGenerationRequest(BaseModel):
     productDescription: str
     prompt: str
@@ -17,8 +18,14 @@ class EmailContent(BaseModel):
     subject: str
     content: str
 
+class OpenAIUsage(BaseModel):
+    day: date
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+
 @router.post("/generate-email", response_model=EmailContent)
-async def generate_email(request: EmailGenerationRequest):
+async def generate_email(request: EmailGenerationRequest, current_user: str = Depends(get_current_user)):
     try:
         # Create a system message that sets up the context
         system_message = """You are an expert B2B email copywriter specializing in creating professional, high-converting outreach emails.
@@ -73,15 +80,15 @@ Format the response exactly as:
 SUBJECT: [subject line with proper placeholders]
 CONTENT: [HTML email content with proper placeholders]"""
 
-        # Call OpenAI API
-        response = await openai.ChatCompletion.acreate(
-            model="gpt-4",
-            messages=[
+        # Call OpenAI API through the gateway, which queues and retries within the rate limits
+        response = await openai_gateway.chat_completion(
+            current_user,
+            [
                 {"role": "system", "content": system_message},
                 {"role": "user", "content": user_message}
             ],
-            temperature=0.7,
-            max_tokens=2000
+            max_tokens=2000,
+            temperature=0.7
         )
 
         # Extract subject and content from the response
@@ -111,6 +118,25 @@ CONTENT: [HTML email content with proper placeholders]"""
 
         return EmailContent(subject=subject_line, content=content)
 
+    except GatewayBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(round(e.retry_after))})
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(round(e.retry_after))})
+    except Exception as e:
+        logger.error("Error generating email: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/usage", response_model=List[OpenAIUsage])
+async def get_usage(days: int = 30, current_user: str = Depends(get_current_user)):
+    """The current user's daily OpenAI token usage over the last days."""
+    try:
+        since = (date.today() - timedelta(days=days)).isoformat()
+        result = supabase.table('openai_usage_daily').select("day, requests, prompt_tokens, completion_tokens")\
+            .eq('user_id', current_user)\
+            .gte('day', since)\
+            .order('day', desc=True)\
+            .execute()
+        return result.data
     except Exception as e:
-        logger.error(f"Error generating email: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        logger.error("Error getting OpenAI usage: %s", e)
+        raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
@@ -36,34 +36,32 @@ async def create_product(product: ProductCreate, current_user: str = Depends(get
 
 @router.put("/{product_id}", response_model=ProductResponse)
 async def update_product(product_id: str, product: ProductCreate, current_user: str = Depends(get_current_user)):
+    """One round trip: the update only matches the product if it belongs to the current user."""
     try:
-        # Check if product exists and belongs to the current user
-        existing = supabase.table('products').select("*").eq('id', product_id).eq('created_by', current_user).execute()
-        if not existing.data:
-            raise HTTPException(status_code=404, detail="Product not found or you don't have permission to update it")
-        
-        # Update product
         result = supabase.table('products').update({
             "name": product.name,
             "description": product.description,
             "updated_at": datetime.utcnow().isoformat()
-        }).eq('id', product_id).execute()
-        
+        }).eq('id', product_id).eq('created_by', current_user).execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Product not found or you don't have permission to update it")
+
         return result.data[0]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/{product_id}")
 async def delete_product(product_id: str, current_user: str = Depends(get_current_user)):
+    """One round trip: the delete only matches the product if it belongs to the current user."""
     try:
-        # Check if product exists and belongs to the current user
-        existing = supabase.table('products').select("*").eq('id', product_id).eq('created_by', current_user).execute()
-        if not existing.data:
+        result = supabase.table('products').delete().eq('id', product_id).eq('created_by', current_user).execute()
+        if not result.data:
             raise HTTPException(status_code=404, detail="Product not found or you don't have permission to delete it")
-        
-        # Delete product
-        supabase.table('products').delete().eq('id', product_id).execute()
         return {"message": "Product deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -1,12 +1,24 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, UploadFile, File
+from pydantic import BaseModel, EmailStr, ValidationError
+from typing import Dict, List, Optional
+import asyncio
 import csv
 import io
+import json
+import logging
+import re
+import uuid
 from datetime import datetime
+from config.prospects import prospect_settings
 from config.supabase import supabase
+from models.prospect import ProspectBulkDelete, ProspectBulkItem, ProspectBulkResult, ProspectBulkUpsert
+from services.segments import segment_query
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Ids per in.(...) filter, keeping request URLs well under proxy limits
+ID_FILTER_BATCH = 200
 
 class ProspectCreate(BaseModel):
     email: EmailStr
@@ -20,9 +32,15 @@ class ProspectResponse(BaseModel):
     full_name: str
     company: Optional[str]
     custom_fields: Optional[dict]
+    import_batch_id: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
+class ProspectSearchPage(BaseModel):
+    prospects: List[ProspectResponse]
+    # Pass as after to get the next page; None on the last page
+    next_after: Optional[str] = None
+
 @router.post("/upload", response_model=dict)
 async def upload_prospects(file: UploadFile = File(...)):
     try:
@@ -33,6 +51,8 @@ async def upload_prospects(file: UploadFile = File(...)):
         
         prospects_count = 0
         errors = []
+        # Tag every row of this upload so it can be targeted as a segment
+        import_batch_id = str(uuid.uuid4())
         
         for row in csv_reader:
             try:
@@ -49,7 +69,8 @@ async def upload_prospects(file: UploadFile = File(...)):
                     "email": email,
                     "full_name": full_name,
                     "company": company,
-                    "custom_fields": {}
+                    "custom_fields": {},
+                    "import_batch_id": import_batch_id
                 }
                 
                 # Add any additional columns as custom fields
@@ -66,6 +87,7 @@ async def upload_prospects(file: UploadFile = File(...)):
         
         return {
             "prospects_count": prospects_count,
+            "import_batch_id": import_batch_id,
             "errors": errors
         }
     except Exception as e:
@@ -84,15 +106,111 @@ async def create_prospect(prospect: ProspectCreate):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def check_bulk_size(count: int):
+    if count > prospect_settings.prospect_bulk_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {prospect_settings.prospect_bulk_max_items} prospects per request"
+        )
+
+def bulk_upsert(items: List[dict]) -> List[ProspectBulkResult]:
+    """
+    Create and update prospects in batches: one update_prospects call for the
+    updates and one insert for the new prospects, whatever the number of items.
+    The update only touches rows that exist when it runs, so an id it doesn't
+    return is reported as not found rather than recreated.
+    """
+    results: List[Optional[ProspectBulkResult]] = [None] * len(items)
+    updates: Dict[str, int] = {}
+    creates: List[int] = []
+    rows: Dict[int, dict] = {}
+
+    for index, item in enumerate(items):
+        try:
+            prospect = ProspectBulkItem.model_validate(item)
+        except ValidationError as e:
+            results[index] = ProspectBulkResult(index=index, status="invalid", error=str(e))
+            continue
+        rows[index] = {
+            "email": prospect.email,
+            "full_name": prospect.full_name,
+            "company": prospect.company,
+            "custom_fields": prospect.custom_fields
+        }
+        if prospect.id is None:
+            creates.append(index)
+            continue
+        prospect_id = str(prospect.id)
+        if prospect_id in updates:
+            # One statement can't update a row twice; the last occurrence wins
+            earlier = updates[prospect_id]
+            results[earlier] = ProspectBulkResult(
+                index=earlier, id=prospect_id, status="invalid", error="Duplicate id, superseded by a later item"
+            )
+        updates[prospect_id] = index
+
+    if updates:
+        try:
+            result = supabase.rpc('update_prospects', {
+                "p_rows": [{"id": prospect_id, **rows[index]} for prospect_id, index in updates.items()]
+            }).execute()
+            updated = {row['id'] for row in result.data}
+            for prospect_id, index in updates.items():
+                status = "updated" if prospect_id in updated else "not_found"
+                results[index] = ProspectBulkResult(index=index, id=prospect_id, status=status)
+        except Exception as e:
+            logger.error("Error updating %s prospects: %s", len(updates), e)
+            for prospect_id, index in updates.items():
+                results[index] = ProspectBulkResult(index=index, id=prospect_id, status="error", error=str(e))
+
+    if creates:
+        try:
+            # PostgREST returns inserted rows in input order
+            result = supabase.table('prospects').insert([rows[index] for index in creates]).execute()
+            for index, row in zip(creates, result.data):
+                results[index] = ProspectBulkResult(index=index, id=row['id'], status="created")
+        except Exception as e:
+            logger.error("Error creating %s prospects: %s", len(creates), e)
+            for index in creates:
+                results[index] = ProspectBulkResult(index=index, status="error", error=str(e))
+
+    return results
+
+def bulk_delete(ids: List[str]) -> List[ProspectBulkResult]:
+    """Delete prospects with one request per ID_FILTER_BATCH ids."""
+    deleted = set()
+    for start in range(0, len(ids), ID_FILTER_BATCH):
+        result = supabase.table('prospects').delete().in_('id', ids[start:start + ID_FILTER_BATCH]).execute()
+        deleted.update(row['id'] for row in result.data)
+    return [
+        ProspectBulkResult(index=index, id=prospect_id, status="deleted" if prospect_id in deleted else "not_found")
+        for index, prospect_id in enumerate(ids)
+    ]
+
+@router.post("/bulk", response_model=List[ProspectBulkResult])
+async def bulk_upsert_prospects(request: ProspectBulkUpsert):
+    """Create or update many prospects; returns a status for each item, in order."""
+    check_bulk_size(len(request.prospects))
+    try:
+        return await asyncio.to_thread(bulk_upsert, request.prospects)
+    except Exception as e:
+        logger.error("Error in bulk prospect upsert: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/bulk/delete", response_model=List[ProspectBulkResult])
+async def bulk_delete_prospects(request: ProspectBulkDelete):
+    """Delete many prospects by id; returns a status for each id, in order."""
+    check_bulk_size(len(request.ids))
+    try:
+        return await asyncio.to_thread(bulk_delete, [str(prospect_id) for prospect_id in request.ids])
+    except Exception as e:
+        logger.error("Error in bulk prospect delete: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.put("/{prospect_id}", response_model=ProspectResponse)
 async def update_prospect(prospect_id: str, prospect: ProspectCreate):
+    """One round trip; an update that matches no row means the prospect doesn't exist."""
     try:
-        # Check if prospect exists
-        existing = supabase.table('prospects').select("*").eq('id', prospect_id).execute()
-        if not existing.data:
-            raise HTTPException(status_code=404, detail="Prospect not found")
-        
-        # Update prospect
         result = supabase.table('prospects').update({
             "email": prospect.email,
             "full_name": prospect.full_name,
@@ -100,23 +218,73 @@ async def update_prospect(prospect_id: str, prospect: ProspectCreate):
             "custom_fields": prospect.custom_fields,
             "updated_at": datetime.utcnow().isoformat()
         }).eq('id', prospect_id).execute()
-        
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Prospect not found")
+
         return result.data[0]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/{prospect_id}")
 async def delete_prospect(prospect_id: str):
+    """One round trip; a delete that matches no row means the prospect doesn't exist."""
     try:
-        # Check if prospect exists
-        existing = supabase.table('prospects').select("*").eq('id', prospect_id).execute()
-        if not existing.data:
+        result = supabase.table('prospects').delete().eq('id', prospect_id).execute()
+        if not result.data:
             raise HTTPException(status_code=404, detail="Prospect not found")
-        
-        # Delete prospect
-        supabase.table('prospects').delete().eq('id', prospect_id).execute()
         return {"message": "Prospect deleted successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def like_pattern(term: str) -> str:
+    """ilike pattern matching term anywhere, with its own wildcards taken literally."""
+    return "%" + re.sub(r"([\\%_])", r"\\\1", term) + "%"
+
+@router.get("/search", response_model=ProspectSearchPage)
+async def search_prospects(
+    q: Optional[str] = Query(None, min_length=3, description="Text found anywhere in email, full name or company"),
+    company: Optional[str] = None,
+    import_batch_id: Optional[str] = None,
+    custom_fields: Optional[str] = Query(None, description='JSON object the custom fields must contain, e.g. {"industry": "SaaS"}'),
+    limit: int = Query(50, ge=1),
+    after: Optional[str] = Query(None, description="next_after of the previous page")
+):
+    """
+    Search prospects a page at a time.
+
+    q is matched through the trigram index on search_text (migration 012) and
+    custom_fields through the GIN index on custom_fields; pages are keyset
+    paginated on id, so deep pages cost the same as the first.
+    """
+    try:
+        filters = {"company": company, "import_batch_id": import_batch_id}
+        if custom_fields:
+            try:
+                filters["custom_fields"] = json.loads(custom_fields)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="custom_fields must be a JSON object")
+            if not isinstance(filters["custom_fields"], dict):
+                raise HTTPException(status_code=400, detail="custom_fields must be a JSON object")
+
+        limit = min(limit, prospect_settings.prospect_search_max_limit)
+        query = segment_query(filters).order('id').limit(limit)
+        if q:
+            query = query.ilike('search_text', like_pattern(q))
+        if after:
+            query = query.gt('id', after)
+        result = await asyncio.to_thread(query.execute)
+        return {
+            "prospects": result.data,
+            "next_after": result.data[-1]['id'] if len(result.data) == limit else None
+        }
+    except HTTPException:
+        raise
     except Exception as e:
+        logger.error("Error searching prospects: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{prospect_id}", response_model=ProspectResponse)
@@ -0,0 +1,102 @@
+from fastapi import APIRouter, HTTPException, Depends
+from typing import List
+from datetime import datetime
+from config.supabase import supabase
+from models.segment import SegmentCreate, SegmentResponse
+from services.segments import count_segment_prospects
+from .auth import get_current_user
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.post("/", response_model=SegmentResponse)
+async def create_segment(segment: SegmentCreate, current_user: str = Depends(get_current_user)):
+    try:
+        now = datetime.utcnow().isoformat()
+        result = supabase.table('segments').insert({
+            "name": segment.name,
+            "description": segment.description,
+            "company": segment.company,
+            "custom_fields": segment.custom_fields,
+            "import_batch_id": segment.import_batch_id,
+            "created_by": current_user,
+            "created_at": now,
+            "updated_at": now
+        }).execute()
+        return result.data[0]
+    except Exception as e:
+        logger.error("Error creating segment: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.put("/{segment_id}", response_model=SegmentResponse)
+async def update_segment(segment_id: str, segment: SegmentCreate, current_user: str = Depends(get_current_user)):
+    try:
+        # Check if segment exists and belongs to the current user
+        existing = supabase.table('segments').select("id").eq('id', segment_id).eq('created_by', current_user).execute()
+        if not existing.data:
+            raise HTTPException(status_code=404, detail="Segment not found")
+
+        result = supabase.table('segments').update({
+            "name": segment.name,
+            "description": segment.description,
+            "company": segment.company,
+            "custom_fields": segment.custom_fields,
+            "import_batch_id": segment.import_batch_id,
+            "updated_at": datetime.utcnow().isoformat()
+        }).eq('id', segment_id).execute()
+        return result.data[0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error updating segment: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/", response_model=List[SegmentResponse])
+async def list_segments(current_user: str = Depends(get_current_user)):
+    try:
+        result = supabase.table('segments').select("*").eq('created_by', current_user).execute()
+        return result.data
+    except Exception as e:
+        logger.error("Error listing segments: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{segment_id}", response_model=SegmentResponse)
+async def get_segment(segment_id: str, current_user: str = Depends(get_current_user)):
+    try:
+        result = supabase.table('segments').select("*").eq('id', segment_id).eq('created_by', current_user).execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Segment not found")
+        return result.data[0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error getting segment: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{segment_id}/count")
+async def get_segment_count(segment_id: str, current_user: str = Depends(get_current_user)):
+    """Evaluate the segment now and return how many prospects it matches."""
+    try:
+        result = supabase.table('segments').select("*").eq('id', segment_id).eq('created_by', current_user).execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Segment not found")
+        return {"segment_id": segment_id, "prospect_count": count_segment_prospects(result.data[0])}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error counting segment: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/{segment_id}")
+async def delete_segment(segment_id: str, current_user: str = Depends(get_current_user)):
+    try:
+        response = supabase.table('segments').delete().eq('id', segment_id).eq('created_by', current_user).execute()
+        if not response.data:
+            raise HTTPException(status_code=404, detail="Segment not found")
+        return {"message": "Segment deleted successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error deleting segment: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
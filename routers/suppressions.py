@@ -0,0 +1,69 @@
+from fastapi import APIRouter, HTTPException, Depends
+from typing import List
+from config.supabase import supabase
+from models.suppression import SuppressionCreate, SuppressionResponse
+from services.suppressions import MANUAL, normalize_email, suppression_list
+from .auth import get_current_user
+import asyncio
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.post("/", response_model=SuppressionResponse)
+async def create_suppression(suppression: SuppressionCreate, current_user: str = Depends(get_current_user)):
+    """Block an address from all future campaigns."""
+    try:
+        await asyncio.to_thread(suppression_list.add, suppression.email, MANUAL, current_user)
+        result = supabase.table('suppressions').select("*").eq('email', normalize_email(suppression.email)).execute()
+        return result.data[0]
+    except Exception as e:
+        logger.error("Error creating suppression: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/", response_model=List[SuppressionResponse])
+async def list_suppressions(limit: int = 100, offset: int = 0, current_user: str = Depends(get_current_user)):
+    """List the addresses the current user blocked manually."""
+    try:
+        result = supabase.table('suppressions').select("*")\
+            .eq('created_by', current_user)\
+            .order('created_at', desc=True)\
+            .range(offset, offset + limit - 1)\
+            .execute()
+        return result.data
+    except Exception as e:
+        logger.error("Error listing suppressions: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{email}", response_model=SuppressionResponse)
+async def get_suppression(email: str, current_user: str = Depends(get_current_user)):
+    """Check whether an address is suppressed, and why."""
+    try:
+        result = supabase.table('suppressions').select("*").eq('email', normalize_email(email)).execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Address is not suppressed")
+        return result.data[0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error getting suppression: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/{email}")
+async def delete_suppression(email: str, current_user: str = Depends(get_current_user)):
+    """Lift a manual block. Bounces and unsubscribes can't be removed through the API."""
+    try:
+        result = supabase.table('suppressions').delete()\
+            .eq('email', normalize_email(email))\
+            .eq('reason', MANUAL)\
+            .eq('created_by', current_user)\
+            .execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Suppression not found")
+        suppression_list.discard(email)
+        return {"message": "Suppression deleted successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error deleting suppression: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
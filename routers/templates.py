@@ -0,0 +1,44 @@
+from fastapi import APIRouter, HTTPException, Depends
+from typing import List
+from config.supabase import supabase
+from models.template import EmailTemplateCreate, EmailTemplateResponse, EmailTemplateSummary
+from services.templates import TEMPLATE_SUMMARY_COLUMNS, store_template
+from .auth import get_current_user
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.post("/", response_model=EmailTemplateSummary)
+async def create_template(template: EmailTemplateCreate, current_user: str = Depends(get_current_user)):
+    """Save a template; saving content that already exists returns the existing template."""
+    try:
+        return store_template(current_user, template.subject, template.content, template.parent_id)
+    except Exception as e:
+        logger.error("Error creating template: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/", response_model=List[EmailTemplateSummary])
+async def list_templates(current_user: str = Depends(get_current_user)):
+    try:
+        result = supabase.table('email_templates').select(TEMPLATE_SUMMARY_COLUMNS)\
+            .eq('created_by', current_user)\
+            .order('created_at', desc=True)\
+            .execute()
+        return result.data
+    except Exception as e:
+        logger.error("Error listing templates: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{template_id}", response_model=EmailTemplateResponse)
+async def get_template(template_id: str, current_user: str = Depends(get_current_user)):
+    try:
+        result = supabase.table('email_templates').select("*").eq('id', template_id).eq('created_by', current_user).execute()
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Template not found")
+        return result.data[0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error getting template: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from config.supabase import supabase
+from services.suppressions import UNSUBSCRIBE, suppression_list
+from services.tracking import CLICK, OPEN, parse_token, tracking_buffer, verify_url
+import asyncio
+import base64
+
+router = APIRouter()
+
+# 1x1 transparent GIF
+PIXEL = base64.b64decode("R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7")
+NO_CACHE_HEADERS = {"Cache-Control": "no-store, no-cache, must-revalidate, max-age=0", "Pragma": "no-cache"}
+
+@router.get("/o/{token}.gif", include_in_schema=False)
+async def track_open(token: str):
+    recipient = parse_token(token)
+    if recipient:
+        tracking_buffer.record(recipient[0], recipient[1], OPEN)
+    return Response(content=PIXEL, media_type="image/gif", headers=NO_CACHE_HEADERS)
+
+@router.get("/c/{token}", include_in_schema=False)
+async def track_click(token: str, u: str, s: str):
+    # Only URLs signed when the campaign was rendered are redirected to
+    if not verify_url(u, s):
+        raise HTTPException(status_code=400, detail="Invalid link")
+    recipient = parse_token(token)
+    if recipient:
+        tracking_buffer.record(recipient[0], recipient[1], CLICK)
+    return RedirectResponse(u, status_code=302)
+
+UNSUBSCRIBE_PAGE = """<html><body>
+<p>Unsubscribe from these emails?</p>
+<form method="post"><button type="submit">Unsubscribe</button></form>
+</body></html>"""
+
+@router.get("/u/{token}", include_in_schema=False, response_class=HTMLResponse)
+async def unsubscribe_page(token: str):
+    # Only confirms: link scanners and prefetchers follow GET links without a person clicking
+    if not parse_token(token):
+        raise HTTPException(status_code=400, detail="Invalid link")
+    return UNSUBSCRIBE_PAGE
+
+@router.post("/u/{token}", include_in_schema=False, response_class=HTMLResponse)
+async def unsubscribe(token: str):
+    """The confirmation form and RFC 8058 one-click requests from mail clients both post here."""
+    recipient = parse_token(token)
+    if not recipient:
+        raise HTTPException(status_code=400, detail="Invalid link")
+    prospect = await asyncio.to_thread(
+        supabase.table('prospects').select("email").eq('id', recipient[1]).execute
+    )
+    if prospect.data:
+        await asyncio.to_thread(suppression_list.add, prospect.data[0]['email'], UNSUBSCRIBE)
+    return "<html><body><p>You have been unsubscribed and will not receive further emails.</p></body></html>"
@@ -0,0 +1,70 @@
+from config.supabase import supabase
+from config.tracking import tracking_settings
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SENT = "sent"
+FAILED = "failed"
+BOUNCED = "bounced"
+COUNTERS = (SENT, FAILED, BOUNCED, "opened", "clicked")
+
+def _current_hour() -> str:
+    return datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0).isoformat()
+
+class CampaignStatsRecorder:
+    """
+    Accumulates delivery counter deltas per campaign and hour bucket.
+
+    Deltas are added to the campaign_stats rollups in one increment_campaign_stats
+    call per flush, so per-message cost is a dictionary update. Open and click
+    rollups are maintained by record_tracking_events in the database.
+    """
+
+    def __init__(self):
+        self.deltas: Dict[Tuple[str, str], Counter] = defaultdict(Counter)
+        self.task: Optional[asyncio.Task] = None
+
+    def record(self, campaign_id: str, counter: str, amount: int = 1):
+        self.deltas[(campaign_id, _current_hour())][counter] += amount
+
+    async def flush(self):
+        deltas, self.deltas = self.deltas, defaultdict(Counter)
+        if not deltas:
+            return
+        rows = [{
+            "campaign_id": campaign_id,
+            "hour": hour,
+            **{name: counts.get(name, 0) for name in COUNTERS}
+        } for (campaign_id, hour), counts in deltas.items()]
+        try:
+            await asyncio.to_thread(supabase.rpc('increment_campaign_stats', {"deltas": rows}).execute)
+        except Exception as e:
+            logger.error("Error flushing campaign stats: %s", e)
+            # Keep the deltas for the next flush
+            for key, counts in deltas.items():
+                self.deltas[key].update(counts)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(tracking_settings.tracking_flush_interval)
+            await self.flush()
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
+
+campaign_stats = CampaignStatsRecorder()
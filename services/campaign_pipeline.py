@@ -0,0 +1,427 @@
+from config.campaign import campaign_settings
+from config.supabase import supabase
+from config.tracking import tracking_settings
+from services.email_service import SendResult, email_service
+from services.segments import fetch_segment_pages
+from services.send_window import campaign_send_window
+from services.render_pool import RenderPool, render_pool
+from services.tracking import add_tracking, make_token
+from services.analytics import BOUNCED, FAILED, SENT, campaign_stats
+from services.send_ledger import make_message_id, send_ledger
+from services.suppressions import suppression_list
+from services.send_scheduler import send_scheduler
+from services.recipients import RECIPIENT_COLUMNS, Recipient
+from services.templates import skeleton_cache
+from services.mime_skeleton import MessageSkeleton
+from collections import deque
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+# Per-recipient records, sampled separately (see LOG_SAMPLE_RATES)
+recipient_logger = logging.getLogger(f"{__name__}.recipients")
+
+# Marks the end of a stage's output
+_DONE = object()
+
+# Campaign columns a pipeline uses; inline audiences come from the shard's prospect_ids
+CAMPAIGN_COLUMNS = (
+    "id, created_by, product_id, subject, content, template_id, segment_id, transport, "
+    "send_window_start, send_window_end, timezone, total_prospects"
+)
+
+async def fetch_prospect_pages(prospect_ids: List[str], page_size: int) -> AsyncIterator[List[dict]]:
+    """Yield the campaign's prospects one page at a time."""
+    for start in range(0, len(prospect_ids), page_size):
+        page_ids = prospect_ids[start:start + page_size]
+        result = await asyncio.to_thread(
+            supabase.table('prospects').select(RECIPIENT_COLUMNS).in_('id', page_ids).execute
+        )
+        if result.data:
+            yield result.data
+
+class CampaignPipeline:
+    """
+    Streams a campaign through fetch -> render -> send stages.
+
+    Stages are connected by bounded queues, so a slow sender applies backpressure
+    to rendering and fetching, and memory use stays independent of audience size.
+    When a shard is given, only that shard's slice of the audience is sent.
+
+    Transient send errors don't hold a sender: the message goes into a retry heap
+    with exponential backoff and is fed back to the senders when due. While every
+    SMTP host's circuit breaker is open, senders pause instead of burning attempts.
+    Transports that accept batches get as many queued messages per call as they take.
+    Every delivery waits for a slot from the transport's fair scheduler, which
+    shares sending capacity between the campaigns running in this process.
+
+    A campaign with a send window doesn't wait for its window, or for a paced
+    send, longer than the shard time slice. It stops early instead and sets
+    resume_at, so the shard worker can hand the shard back until then rather
+    than hold a worker slot while sleeping. Recipients not sent yet are fetched
+    again when the shard resumes; the ledger skips the ones already delivered.
+    """
+
+    def __init__(self, campaign: dict, product: dict, shard: Optional[dict] = None):
+        self.campaign = campaign
+        self.product = product
+        self.shard = shard or {}
+        self.page_size = campaign_settings.campaign_page_size
+        self.transport_name = campaign.get('transport')
+        self.transport = email_service.transport(self.transport_name)
+        # One worker per transport connection slot, so throughput scales with e.g. sender accounts
+        self.send_concurrency = max(1, campaign_settings.campaign_send_concurrency, self.transport.max_connections)
+        self.scheduler = send_scheduler(self.transport.name, self.transport.max_connections)
+        self.send_delay = campaign_settings.campaign_send_delay
+        self.prospects = asyncio.Queue(maxsize=campaign_settings.campaign_queue_size)
+        # Room for a stop marker per sender, see stop()
+        self.messages = asyncio.Queue(maxsize=max(campaign_settings.campaign_queue_size, self.send_concurrency))
+        self.sent_count = 0
+        self.failed_count = 0
+        self.skipped_count = 0
+        self.suppressed_count = 0
+        self.window = campaign_send_window(campaign)
+        # Loop time after which waiting on the window hands the shard back; set when run
+        self.deadline: Optional[float] = None
+        # Epoch seconds at which a shard that stopped early should be resumed
+        self.resume_at: Optional[float] = None
+        self.stopping = False
+        self.feeders: List[asyncio.Task] = []
+        self.retry_task: Optional[asyncio.Task] = None
+        self.deferred: List[Tuple[float, int, Recipient]] = []
+        self.deferred_seq = itertools.count()
+        self.skeleton = None
+        # Identifies the skeleton to the render pool's workers, which cache it
+        self.render_key = None
+        self.tracking = bool(tracking_settings.tracking_base_url)
+        self.tracking_base_url = (tracking_settings.tracking_base_url or "").rstrip("/")
+        # Optional process pool for CPU-heavy rendering, shared by the process' campaigns
+        self.render_pool: Optional[RenderPool] = None
+        self.render_batch_size = max(1, campaign_settings.campaign_render_batch_size)
+        self.batch: List[Tuple[str, str, str, Dict[str, str]]] = []
+        self.rendering: Deque[asyncio.Future] = deque()
+        # (due, seq, attempt, message) of messages waiting to be retried
+        self.retries: List[Tuple[float, int, int, tuple]] = []
+        self.retry_seq = itertools.count()
+        self.retry_added = asyncio.Event()
+        # Messages rendered but not yet sent or given up on, including those awaiting a retry
+        self.outstanding = 0
+        self.rendered_all = False
+
+    async def prospect_pages(self) -> AsyncIterator[List[dict]]:
+        """Page through the campaign's (or shard's) targets, resolving its segment lazily."""
+        if self.campaign.get('segment_id'):
+            segment = await asyncio.to_thread(
+                supabase.table('segments').select("*").eq('id', self.campaign['segment_id']).single().execute
+            )
+            pages = fetch_segment_pages(
+                segment.data, self.page_size, RECIPIENT_COLUMNS,
+                after_id=self.shard.get('after_id'), upto_id=self.shard.get('upto_id')
+            )
+        else:
+            if self.shard.get('prospect_ids') is not None:
+                prospect_ids = self.shard['prospect_ids']
+            else:
+                prospect_ids = self.campaign.get('prospect_ids') or []
+                if self.shard.get('range_end') is not None:
+                    prospect_ids = prospect_ids[self.shard['range_start']:self.shard['range_end']]
+            pages = fetch_prospect_pages(prospect_ids, self.page_size)
+        async for page in pages:
+            yield page
+
+    async def fetch(self):
+        try:
+            async for page in self.prospect_pages():
+                # Suppressed addresses are dropped before any rendering or ledger lookup
+                # Rows are replaced by compact records straight away
+                recipients = [Recipient.from_row(row) for row in page if not suppression_list.contains(row['email'])]
+                self.suppressed_count += len(page) - len(recipients)
+                del page
+                if not recipients:
+                    continue
+                # One ledger lookup per page skips recipients a previous run already delivered to
+                delivered = await send_ledger.delivered_among(self.campaign['id'], [recipient.prospect_id for recipient in recipients])
+                self.skipped_count += len(delivered)
+                for recipient in recipients:
+                    if recipient.prospect_id not in delivered:
+                        await self.prospects.put(recipient)
+        finally:
+            if not self.stopping:
+                await self.prospects.put(_DONE)
+
+    def values(self, recipient: Recipient) -> Dict[str, str]:
+        """The recipient's placeholder values; built just before rendering and dropped after."""
+        values = {
+            'email': recipient.email,
+            'prospect_name': recipient.name,
+            'company_name': recipient.company,
+            'product_name': self.product['name']
+        }
+        if self.tracking:
+            token = make_token(self.campaign['id'], recipient.prospect_id)
+            values['tracking_token'] = token
+            values['unsubscribe_url'] = f"{self.tracking_base_url}/t/u/{token}"
+        return values
+
+    async def enqueue(self, message: tuple):
+        self.outstanding += 1
+        await self.messages.put((message, 0))
+
+    async def settle(self):
+        """Account for a message that reached a final outcome; stop the senders once all have."""
+        self.outstanding -= 1
+        await self.finish_if_idle()
+
+    async def finish_if_idle(self):
+        if self.rendered_all and self.outstanding == 0:
+            self.rendered_all = False
+            for _ in range(self.send_concurrency):
+                await self.messages.put(_DONE)
+
+    async def emit(self, recipient: Recipient):
+        """Render a recipient inline, or add it to the next batch for the render pool."""
+        values = self.values(recipient)
+        message_id = make_message_id(self.campaign['id'], recipient.prospect_id, self.skeleton.message_id_domain)
+        if self.render_pool is None:
+            data = email_service.render_message(self.skeleton, values, message_id)
+            await self.enqueue((recipient.prospect_id, recipient.email, message_id, data))
+            return
+        self.batch.append((recipient.prospect_id, recipient.email, message_id, email_service.placeholder_values(values)))
+        if len(self.batch) >= self.render_batch_size:
+            await self.flush_batch()
+
+    async def flush_batch(self):
+        """Submit the pending batch to the render pool, keeping a bounded number in flight."""
+        if self.batch:
+            self.rendering.append(self.render_pool.render(self.render_key, self.skeleton, self.batch))
+            self.batch = []
+        # Batches complete in submission order, so the oldest is awaited first
+        while len(self.rendering) > self.render_pool.processes * 2:
+            await self.collect_rendered()
+
+    async def collect_rendered(self):
+        for message in await self.rendering.popleft():
+            await self.enqueue(message)
+
+    async def flush_rendered(self):
+        if self.render_pool is not None:
+            await self.flush_batch()
+            while self.rendering:
+                await self.collect_rendered()
+
+    async def release_deferred(self, wait: bool):
+        """Render deferred recipients whose send window has opened; with wait, drain them all."""
+        loop = asyncio.get_running_loop()
+        while self.deferred:
+            due = self.deferred[0][0]
+            if due > loop.time():
+                if not wait:
+                    return
+                if due > self.deadline:
+                    # Finish what can be sent now and resume when the window opens
+                    self.hand_back(due - loop.time())
+                    self.deferred.clear()
+                    return
+                await self.flush_rendered()
+                await asyncio.sleep(due - loop.time())
+            _, _, recipient = heapq.heappop(self.deferred)
+            await self.emit(recipient)
+
+    def compile(self, subject: str, content: str) -> MessageSkeleton:
+        if self.tracking:
+            # Links and the open pixel are rewritten once per campaign, not per recipient
+            content = add_tracking(content, self.tracking_base_url)
+        return email_service.build_skeleton(subject, content)
+
+    async def render(self):
+        variant = self.tracking_base_url if self.tracking else ""
+        if self.campaign.get('template_id'):
+            self.skeleton = await skeleton_cache.get(self.campaign['template_id'], variant, self.compile)
+            self.render_key = f"template:{self.campaign['template_id']}:{variant}"
+        else:
+            self.skeleton = self.compile(self.campaign['subject'], self.campaign['content'])
+            self.render_key = f"campaign:{self.campaign['id']}:{variant}"
+        self.render_pool = render_pool()
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                if self.prospects.empty():
+                    # Don't hold a partial batch back while waiting on the database
+                    await self.flush_rendered()
+                recipient = await self.prospects.get()
+                if recipient is _DONE:
+                    break
+                if self.window:
+                    # Recipients outside their local send window wait in a heap until it opens
+                    delay = self.window.delay_for(recipient.timezone)
+                    if delay > 0:
+                        heapq.heappush(self.deferred, (loop.time() + delay, next(self.deferred_seq), recipient))
+                        continue
+                    await self.release_deferred(wait=False)
+                await self.emit(recipient)
+            await self.release_deferred(wait=True)
+            await self.flush_rendered()
+        finally:
+            # Batches still rendering when the pipeline stops are not needed anymore
+            for future in self.rendering:
+                future.cancel()
+        self.rendered_all = True
+        await self.finish_if_idle()
+
+    async def retry(self):
+        """Feed messages from the retry heap back to the senders as they come due."""
+        loop = asyncio.get_running_loop()
+        while True:
+            self.retry_added.clear()
+            timeout = self.retries[0][0] - loop.time() if self.retries else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self.retry_added.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, attempt, message = heapq.heappop(self.retries)
+            await self.messages.put((message, attempt))
+
+    def schedule_retry(self, message: tuple, attempt: int):
+        delay = email_service.retry_delay(attempt)
+        recipient_logger.warning("Retrying email to %s in %.1fs (%s/%s)", message[1], delay, attempt + 1, email_service.max_attempts)
+        due = asyncio.get_running_loop().time() + delay
+        heapq.heappush(self.retries, (due, next(self.retry_seq), attempt + 1, message))
+        self.retry_added.set()
+
+    async def deliver(self, messages: List[Tuple[str, bytes]]) -> List[SendResult]:
+        results: List[Optional[SendResult]] = [None] * len(messages)
+        todo = list(range(len(messages)))
+        while True:
+            try:
+                attempted = await asyncio.to_thread(
+                    email_service.deliver_batch, [messages[index] for index in todo], self.transport_name
+                )
+            except Exception as e:
+                logger.error("Error sending %s messages: %s", len(todo), e)
+                attempted = [SendResult.FAILED] * len(todo)
+            waiting = []
+            for index, result in zip(todo, attempted):
+                if result == SendResult.UNAVAILABLE:
+                    waiting.append(index)
+                else:
+                    results[index] = result
+            if not waiting:
+                return results
+            todo = waiting
+            # The transport is down: hold this sender, and so the campaign, until a breaker half-opens
+            await asyncio.sleep(max(1.0, email_service.retry_after(self.transport_name)))
+
+    async def next_batch(self) -> Optional[List[Tuple[tuple, int]]]:
+        """Wait for a message, then take whatever else is queued, up to the transport's batch size."""
+        item = await self.messages.get()
+        if item is _DONE:
+            return None
+        batch = [item]
+        while len(batch) < self.transport.batch_size and not self.messages.empty():
+            item = self.messages.get_nowait()
+            if item is _DONE:
+                self.messages.put_nowait(item)
+                break
+            batch.append(item)
+        return batch
+
+    async def send(self):
+        while True:
+            batch = await self.next_batch()
+            if batch is None:
+                break
+            pending = []
+            for message, attempt in batch:
+                if send_ledger.is_delivered(self.campaign['id'], message[0]):
+                    self.skipped_count += 1
+                    await self.settle()
+                    continue
+                if self.window:
+                    wait = await self.window.pace(self.deadline - asyncio.get_running_loop().time())
+                    if wait:
+                        self.stop(wait)
+                        break
+                pending.append((message, attempt))
+            if not pending:
+                continue
+
+            async with self.scheduler.slot(self.campaign['id'], len(pending)):
+                results = await self.deliver([(message[1], message[3]) for message, _ in pending])
+            for (message, attempt), result in zip(pending, results):
+                prospect_id, to_email, message_id, data = message
+                if result == SendResult.RETRY and attempt + 1 < email_service.max_attempts:
+                    self.schedule_retry(message, attempt)
+                    continue
+                if result == SendResult.SENT:
+                    self.sent_count += 1
+                    send_ledger.record(self.campaign['id'], prospect_id, message_id)
+                    campaign_stats.record(self.campaign['id'], SENT)
+                else:
+                    self.failed_count += 1
+                    campaign_stats.record(self.campaign['id'], FAILED)
+                    if result == SendResult.BOUNCED:
+                        campaign_stats.record(self.campaign['id'], BOUNCED)
+                await self.settle()
+            if self.send_delay:
+                await asyncio.sleep(self.send_delay)
+
+    def hand_back(self, delay: float):
+        """Have the shard resumed in delay seconds instead of finishing it in this run."""
+        resume_at = time.time() + delay
+        if self.resume_at is None or resume_at < self.resume_at:
+            self.resume_at = resume_at
+
+    def stop(self, delay: float):
+        """Stop early: fetching and rendering end now, senders after the messages they hold."""
+        self.hand_back(delay)
+        if self.stopping:
+            return
+        self.stopping = True
+        for task in self.feeders + [self.retry_task]:
+            task.cancel()
+        while not self.messages.empty():
+            self.messages.get_nowait()
+        for _ in range(self.send_concurrency):
+            self.messages.put_nowait(_DONE)
+
+    async def stoppable(self, stage):
+        try:
+            await stage
+        except asyncio.CancelledError:
+            if not self.stopping:
+                raise
+
+    async def run(self) -> Tuple[int, int]:
+        """
+        Run all stages to completion, or until stopped early with resume_at set,
+        and return (sent_count, failed_count).
+
+        Recipients skipped because the ledger shows them as delivered count as sent;
+        suppressed recipients count as neither.
+        """
+        send_ledger.open(self.campaign['id'])
+        self.scheduler.register(self.campaign['id'], self.campaign.get('created_by'))
+        if self.window:
+            self.deadline = asyncio.get_running_loop().time() + campaign_settings.campaign_shard_time_slice
+        self.feeders = [asyncio.create_task(self.stoppable(self.fetch())), asyncio.create_task(self.stoppable(self.render()))]
+        stages = self.feeders + [asyncio.create_task(self.send()) for _ in range(self.send_concurrency)]
+        retry_task = self.retry_task = asyncio.create_task(self.retry())
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            for stage in stages:
+                stage.cancel()
+            raise
+        finally:
+            retry_task.cancel()
+            self.scheduler.unregister(self.campaign['id'])
+            send_ledger.close(self.campaign['id'])
+        if self.suppressed_count:
+            logger.info("Skipped %s suppressed recipients of campaign %s", self.suppressed_count, self.campaign['id'])
+        return self.sent_count + self.skipped_count, self.failed_count
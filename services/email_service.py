@@ -1,115 +1,143 @@
 from config.email import email_settings
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from services.mime_skeleton import MessageSkeleton
+import asyncio
 import logging
-from typing import Dict, List, Tuple
-import ssl
-import time
-
-logger = logging.getLogger(__name__)
+from typing import Dict, List, Optional, Tuple
+from services.retry import CircuitBreaker, backoff_delay
+from services.smtp_pool import SharedQuota
+from services.suppressions import BOUNCE, suppression_list
+from services.transports import EmailTransport, HttpBatchTransport, SendResult, SinkTransport, SmtpTransport
+
+# Per-recipient records, sampled separately (see LOG_SAMPLE_RATES)
+recipient_logger = logging.getLogger(f"{__name__}.recipients")
+
+# Placeholder name -> recipient key
+PLACEHOLDER_MAPPINGS = {
+    'prospect_name': 'prospect_name',
+    'prospect_email': 'email',
+    'company_name': 'company_name',
+    'tracking_token': 'tracking_token',
+    'unsubscribe_url': 'unsubscribe_url'
+}
+
+TRANSPORT_NAMES = ("smtp", "http", "sink")
 
 class EmailService:
     def __init__(self):
-        self.host = email_settings.smtp_host
-        self.port = email_settings.smtp_port
-        self.username = email_settings.smtp_username
-        self.password = email_settings.smtp_password
         self.from_email = email_settings.smtp_from_email
         self.from_name = email_settings.smtp_from_name
-        self.max_retries = 3
-        self.retry_delay = 5  # seconds
+        self.max_attempts = email_settings.smtp_max_attempts
+        self.smtp = SmtpTransport(
+            email_settings.all_accounts(),
+            email_settings.smtp_account_cooldown,
+            email_settings.smtp_breaker_threshold,
+            email_settings.smtp_breaker_reset_timeout,
+            email_settings.smtp_breaker_max_reset_timeout,
+            SharedQuota(email_settings.smtp_quota_reservation) if email_settings.smtp_quota_reservation > 0 else None
+        )
+        # Other transports are created on first use
+        self.transports: Dict[str, EmailTransport] = {"smtp": self.smtp}
+
+    def transport(self, name: Optional[str] = None) -> EmailTransport:
+        """Return a transport by name, defaulting to the email_transport setting."""
+        name = name or email_settings.email_transport
+        if name not in self.transports:
+            self.transports[name] = self.create_transport(name)
+        return self.transports[name]
+
+    def create_transport(self, name: str) -> EmailTransport:
+        if name == "http":
+            if not email_settings.email_api_url:
+                raise ValueError("The http transport needs EMAIL_API_URL to be set")
+            return HttpBatchTransport(
+                email_settings.email_api_url,
+                email_settings.email_api_key,
+                self.from_email,
+                self.from_name,
+                email_settings.email_api_batch_size,
+                email_settings.email_api_concurrency,
+                email_settings.email_api_timeout,
+                CircuitBreaker(
+                    email_settings.email_api_url,
+                    email_settings.smtp_breaker_threshold,
+                    email_settings.smtp_breaker_reset_timeout,
+                    email_settings.smtp_breaker_max_reset_timeout
+                )
+            )
+        if name == "sink":
+            return SinkTransport(
+                self.from_email,
+                self.from_name,
+                email_settings.email_sink_dir,
+                email_settings.email_api_batch_size,
+                email_settings.email_api_concurrency
+            )
+        raise ValueError(f"Unknown email transport: {name}")
 
     def test_connection(self) -> bool:
-        """Test the SMTP connection and credentials."""
-        try:
-            logger.info("Testing SMTP connection...")
-            with smtplib.SMTP(self.host, self.port) as server:
-                server.starttls()
-                server.login(self.username, self.password)
-                logger.info("SMTP connection test successful")
+        """Test the SMTP connection and credentials of every sender account."""
+        return self.smtp.test_connection()
+
+    def account_usage(self) -> List[Dict]:
+        """Per-account usage and availability, as seen by this process."""
+        return self.smtp.usage()
+
+    def retry_after(self, transport: Optional[str] = None) -> float:
+        """Seconds until an unavailable transport is worth trying again."""
+        return self.transport(transport).retry_after()
+
+    def retry_delay(self, attempt: int) -> float:
+        """Backoff before the next try of a message that has failed attempt + 1 times."""
+        return backoff_delay(attempt, email_settings.smtp_retry_base_delay, email_settings.smtp_retry_max_delay)
+
+    def build_skeleton(self, subject: str, content_template: str) -> MessageSkeleton:
+        """Pre-encode the parts of a message that are the same for every recipient."""
+        return MessageSkeleton(
+            subject=subject,
+            html=content_template,
+            message_id_domain=self.from_email.rsplit('@', 1)[-1]
+        )
+
+    def placeholder_values(self, recipient: Dict[str, str]) -> Dict[str, str]:
+        """Map a recipient to the values of the {{placeholder}} markers."""
+        return {placeholder: recipient.get(key) or '' for placeholder, key in PLACEHOLDER_MAPPINGS.items()}
+
+    def render_message(self, skeleton: MessageSkeleton, recipient: Dict[str, str], message_id: Optional[str] = None) -> bytes:
+        """Fill a skeleton's {{placeholder}} markers with recipient values."""
+        return skeleton.render(recipient['email'], self.placeholder_values(recipient), message_id)
+
+    async def send_email_async(self, to_email: str, subject: str, content: str) -> bool:
+        """Send a single, non-personalized email, retrying with backoff without blocking the event loop."""
+        message = self.build_skeleton(subject, content).render(to_email, {})
+        return await self.send_message_async(to_email, message)
+
+    async def send_message_async(self, to_email: str, message: bytes) -> bool:
+        """Send a pre-rendered message, retrying transient errors with exponential backoff."""
+        for attempt in range(self.max_attempts):
+            result = await asyncio.to_thread(self.deliver, to_email, message)
+            if result == SendResult.SENT:
                 return True
-        except smtplib.SMTPAuthenticationError:
-            logger.error("SMTP authentication failed. Please check your credentials.")
-            return False
-        except Exception as e:
-            logger.error(f"SMTP connection test failed: {str(e)}")
-            return False
-
-    def send_email(self, to_email: str, subject: str, content: str, retry_count: int = 0) -> bool:
-        """Send an email with retry logic."""
-        try:
-            message = MIMEMultipart()
-            message["From"] = f"{self.from_name} <{self.from_email}>"
-            message["To"] = to_email
-            message["Subject"] = subject
-
-            message.attach(MIMEText(content, "html"))
-
-            with smtplib.SMTP(self.host, self.port) as server:
-                server.starttls()
-                server.login(self.username, self.password)
-                server.send_message(message)
-
-            logger.info(f"Email sent successfully to {to_email}")
-            return True
-
-        except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError) as e:
-            if retry_count < self.max_retries:
-                logger.warning(f"Connection error, retrying... ({retry_count + 1}/{self.max_retries})")
-                time.sleep(self.retry_delay)
-                return self.send_email(to_email, subject, content, retry_count + 1)
-            logger.error(f"Failed to send email to {to_email} after {self.max_retries} retries: {str(e)}")
-            return False
-
-        except smtplib.SMTPRecipientsRefused:
-            logger.error(f"Invalid recipient: {to_email}")
-            return False
-
-        except Exception as e:
-            logger.error(f"Failed to send email to {to_email}: {str(e)}")
-            return False
-
-    def send_bulk_emails(self, recipients: List[Dict[str, str]], subject: str, content_template: str) -> Tuple[List[str], List[str]]:
-        """
-        Send emails to multiple recipients with tracking.
-        Returns tuple of (successful_emails, failed_emails)
-        """
-        successful_emails = []
-        failed_emails = []
-
-        # Define placeholder mappings
-        placeholder_mappings = {
-            'prospect_name': 'prospect_name',
-            'prospect_email': 'email',
-            'company_name': 'company_name'
-        }
-
-        for recipient in recipients:
-            try:
-                # Replace placeholders in subject and content
-                personalized_subject = subject
-                personalized_content = content_template
-
-                # Replace placeholders with double curly braces
-                for placeholder, key in placeholder_mappings.items():
-                    placeholder_pattern = f"{{{{{placeholder}}}}}"
-                    value = recipient.get(key, '')
-                    personalized_subject = personalized_subject.replace(placeholder_pattern, value)
-                    personalized_content = personalized_content.replace(placeholder_pattern, value)
-
-                if self.send_email(recipient['email'], personalized_subject, personalized_content):
-                    successful_emails.append(recipient['email'])
-                else:
-                    failed_emails.append(recipient['email'])
-
-                # Add a small delay between sends to avoid rate limiting
-                time.sleep(0.5)
-
-            except Exception as e:
-                logger.error(f"Error processing recipient {recipient['email']}: {str(e)}")
-                failed_emails.append(recipient['email'])
-
-        return successful_emails, failed_emails
+            if result in (SendResult.BOUNCED, SendResult.FAILED):
+                return False
+            if attempt + 1 < self.max_attempts:
+                delay = max(self.retry_delay(attempt), self.retry_after())
+                recipient_logger.warning("Retrying email to %s in %.1fs (%s/%s)", to_email, delay, attempt + 1, self.max_attempts)
+                await asyncio.sleep(delay)
+
+        recipient_logger.error("Failed to send email to %s after %s attempts", to_email, self.max_attempts)
+        return False
+
+    def deliver(self, to_email: str, message: bytes, transport: Optional[str] = None) -> SendResult:
+        """Make one delivery attempt."""
+        return self.deliver_batch([(to_email, message)], transport)[0]
+
+    def deliver_batch(self, messages: List[Tuple[str, bytes]], transport: Optional[str] = None) -> List[SendResult]:
+        """Make one delivery attempt for each (to_email, message) pair; refused recipients are suppressed."""
+        selected = self.transport(transport)
+        results = selected.send_batch(messages) if len(messages) > 1 else [selected.send(*messages[0])]
+        for (to_email, _), result in zip(messages, results):
+            if result == SendResult.BOUNCED:
+                suppression_list.add(to_email, BOUNCE)
+        return results
 
 email_service = EmailService() 
\ No newline at end of file
@@ -0,0 +1,158 @@
+from email.header import Header
+from email.utils import formatdate
+from html.parser import HTMLParser
+import binascii
+import re
+import uuid
+from typing import Dict, List, Optional, Union
+
+CRLF = b"\r\n"
+PLACEHOLDER_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+# RFC 8058: mail clients may unsubscribe with a POST to the List-Unsubscribe URL
+ONE_CLICK_HEADER = b"List-Unsubscribe-Post: List-Unsubscribe=One-Click" + CRLF
+
+# Tags that start a new line when HTML is flattened to plain text
+_BLOCK_TAGS = {"p", "div", "br", "tr", "li", "h1", "h2", "h3", "h4", "h5", "h6", "table", "ul", "ol"}
+_SKIPPED_TAGS = {"style", "script", "head", "title"}
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIPPED_TAGS:
+            self.skipping += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.parts.append(f" ({href}) ")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED_TAGS:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+def html_to_text(html: str) -> str:
+    """Flatten an HTML body to a readable plain-text alternative."""
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    lines = [" ".join(line.split()) for line in "".join(extractor.parts).splitlines()]
+    # Collapse runs of blank lines left behind by nested block tags
+    text = re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+    return text.strip()
+
+def _clean_header_value(value: str) -> str:
+    # Personalized values must never be able to inject extra headers
+    return value.replace("\r", " ").replace("\n", " ")
+
+def encode_header(name: str, value: str) -> bytes:
+    """Encode a single header line, using RFC 2047 only when it is needed."""
+    value = _clean_header_value(value)
+    if value.isascii():
+        if len(name) + len(value) < 76:
+            return f"{name}: {value}".encode("ascii") + CRLF
+        # Long ASCII values are only folded, never encoded, so addresses stay intact
+        encoded = Header(value, "us-ascii", header_name=name).encode(linesep="\r\n")
+    else:
+        encoded = Header(value, "utf-8", header_name=name).encode(linesep="\r\n")
+    return f"{name}: {encoded}".encode("ascii") + CRLF
+
+def _qp_line(line: str) -> bytes:
+    return binascii.b2a_qp(line.encode("utf-8") + CRLF, istext=True)
+
+class _CompiledText:
+    """
+    A text template split into lines, quoted-printable encoded ahead of time.
+
+    Lines without placeholders are encoded once; only lines containing a
+    placeholder are substituted and encoded per recipient.
+    """
+
+    def __init__(self, template: str):
+        self.lines: List[Union[bytes, List[str]]] = []
+        for line in template.splitlines():
+            if PLACEHOLDER_PATTERN.search(line):
+                # Even indexes are literal text, odd indexes are placeholder names
+                self.lines.append(PLACEHOLDER_PATTERN.split(line))
+            else:
+                self.lines.append(_qp_line(line))
+
+    def render(self, values: Dict[str, str]) -> bytes:
+        out = []
+        for line in self.lines:
+            if isinstance(line, bytes):
+                out.append(line)
+            else:
+                out.append(_qp_line(_fill(line, values)))
+        return b"".join(out)
+
+def _fill(parts: List[str], values: Dict[str, str]) -> str:
+    return "".join(
+        part if i % 2 == 0 else values.get(part, "")
+        for i, part in enumerate(parts)
+    )
+
+class MessageSkeleton:
+    """
+    A per-campaign multipart/alternative message with static parts pre-encoded.
+
+    Build it once per campaign, then call render() per recipient; only the
+    To/Subject/Date/Message-ID headers and the body lines that contain
+    placeholders are encoded for each message. The From header is left out
+    so the sender account can be chosen at send time. Recipients whose values
+    have an unsubscribe_url also get one-click List-Unsubscribe headers.
+    """
+
+    def __init__(self, subject: str, html: str, message_id_domain: str):
+        self.message_id_domain = message_id_domain
+        self.subject_parts = PLACEHOLDER_PATTERN.split(subject)
+        boundary = f"=_campaign_{uuid.uuid4().hex}"
+
+        self.static_headers = (
+            b"MIME-Version: 1.0" + CRLF
+            + f'Content-Type: multipart/alternative; boundary="{boundary}"'.encode("ascii") + CRLF
+        )
+        part_header = (
+            b"Content-Type: text/%s; charset=\"utf-8\"" + CRLF
+            + b"Content-Transfer-Encoding: quoted-printable" + CRLF + CRLF
+        )
+        delimiter = b"--" + boundary.encode("ascii") + CRLF
+        self.text_prefix = CRLF + delimiter + part_header % b"plain"
+        self.html_prefix = CRLF + delimiter + part_header % b"html"
+        self.suffix = CRLF + b"--" + boundary.encode("ascii") + b"--" + CRLF
+
+        self.text = _CompiledText(html_to_text(html))
+        self.html = _CompiledText(html)
+
+    def make_message_id(self) -> str:
+        return f"<{uuid.uuid4().hex}@{self.message_id_domain}>"
+
+    def render(self, to_email: str, values: Dict[str, str], message_id: Optional[str] = None) -> bytes:
+        """Produce the wire-format bytes of one recipient's message, minus the From header."""
+        headers = (
+            self.static_headers
+            + encode_header("To", to_email)
+            + encode_header("Subject", _fill(self.subject_parts, values))
+            + encode_header("Date", formatdate(localtime=True))
+            + encode_header("Message-ID", message_id or self.make_message_id())
+        )
+        if values.get("unsubscribe_url"):
+            headers += encode_header("List-Unsubscribe", f"<{values['unsubscribe_url']}>") + ONE_CLICK_HEADER
+        return b"".join((
+            headers,
+            self.text_prefix,
+            self.text.render(values),
+            self.html_prefix,
+            self.html.render(values),
+            self.suffix
+        ))
@@ -0,0 +1,234 @@
+from config.openai import openai_settings
+from config.supabase import supabase
+from services.retry import backoff_delay
+from collections import deque
+from datetime import date
+import asyncio
+import logging
+import openai
+import openai.error
+import time
+from typing import Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough prompt size estimate used for budgeting until the API reports actual usage
+CHARS_PER_TOKEN = 4
+
+# Errors worth retrying; RateLimitError is handled separately to honour Retry-After
+TRANSIENT_ERRORS = (
+    openai.error.APIError,
+    openai.error.APIConnectionError,
+    openai.error.ServiceUnavailableError,
+    openai.error.Timeout,
+    openai.error.TryAgain
+)
+
+class GatewayBusy(Exception):
+    """The request waited in the queue longer than the queue timeout."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("The AI service is busy, please try again shortly")
+        self.retry_after = retry_after
+
+class RateLimited(Exception):
+    """The API kept rejecting the request for rate limits, or the account is out of quota."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    return sum(len(message["content"]) for message in messages) // CHARS_PER_TOKEN + max_tokens
+
+class MinuteBudget:
+    """Continuously refilling allowance of some unit per minute (a token bucket)."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = max(1, per_minute)
+        self.available = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available (amounts above capacity wait for a full bucket)."""
+        self.refill()
+        missing = min(amount, self.capacity) - self.available
+        return max(0.0, missing * 60 / self.capacity)
+
+    def take(self, amount: float):
+        self.refill()
+        self.available -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        self.available = min(self.capacity, self.available + amount)
+
+class OpenAIGateway:
+    """
+    Single entry point for OpenAI chat completions.
+
+    Requests are admitted within requests-per-minute and tokens-per-minute
+    budgets and a concurrency limit. Excess requests wait in per-user queues that
+    are served round-robin, so one user's burst can't crowd out everyone else.
+    Rate limit and transient errors are retried with backoff; a 429 also pauses
+    admission for everyone until its Retry-After has passed. Token usage is
+    recorded per user and day.
+    """
+
+    def __init__(self):
+        self.requests = MinuteBudget(openai_settings.requests_per_minute)
+        self.tokens = MinuteBudget(openai_settings.tokens_per_minute)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.queues: Dict[str, Deque[Tuple[int, asyncio.Future]]] = {}
+        # Users with queued requests, in round-robin order
+        self.turns: Deque[str] = deque()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    async def admit(self, user_id: str, tokens: int):
+        """Wait for this user's turn and for budget to send a request of the given size."""
+        future = asyncio.get_running_loop().create_future()
+        if user_id not in self.queues:
+            self.queues[user_id] = deque()
+            self.turns.append(user_id)
+        self.queues[user_id].append((tokens, future))
+        self.wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), openai_settings.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Admitted at the last moment; give the slot back
+                self.finish(tokens, 0)
+            future.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                raise GatewayBusy(max(1.0, self.tokens.wait_time(tokens)))
+            raise
+
+    def next_waiter(self) -> Optional[Tuple[str, int, asyncio.Future]]:
+        """The request at the head of the next user's queue, dropping abandoned ones."""
+        while self.turns:
+            user_id = self.turns[0]
+            queue = self.queues[user_id]
+            while queue and queue[0][1].done():
+                queue.popleft()
+            if queue:
+                return user_id, queue[0][0], queue[0][1]
+            self.turns.popleft()
+            del self.queues[user_id]
+        return None
+
+    async def run(self):
+        while True:
+            waiter = self.next_waiter()
+            if waiter is None or self.in_flight >= openai_settings.max_concurrency:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            user_id, tokens, future = waiter
+            delay = max(
+                self.paused_until - time.monotonic(),
+                self.requests.wait_time(1),
+                self.tokens.wait_time(tokens)
+            )
+            if delay > 0:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.queues[user_id].popleft()
+            self.turns.rotate(-1)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+            future.set_result(None)
+
+    def finish(self, estimated: int, used: int):
+        """Release a request's slot and refund what it was over-budgeted by."""
+        self.in_flight -= 1
+        if used < estimated:
+            self.tokens.refund(estimated - used)
+        self.wakeup.set()
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def chat_completion(self, user_id: str, messages: List[Dict[str, str]], max_tokens: int, **params) -> dict:
+        """Create a chat completion on behalf of a user, queueing and retrying as needed."""
+        estimated = estimate_tokens(messages, max_tokens)
+        for attempt in range(openai_settings.max_retries + 1):
+            await self.admit(user_id, estimated)
+            used = 0
+            try:
+                response = await openai.ChatCompletion.acreate(
+                    model=openai_settings.model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    api_key=openai_settings.api_key,
+                    api_base=openai_settings.api_base,
+                    **params
+                )
+                usage = response.get("usage") or {}
+                used = usage.get("total_tokens", estimated)
+                await self.record_usage(user_id, usage)
+                return response
+            except openai.error.RateLimitError as e:
+                # Requests that reached the API count against its limit
+                used = estimated
+                if e.code == "insufficient_quota":
+                    raise RateLimited("The AI service quota is exhausted", 3600)
+                retry_after = self.retry_after(e) or backoff_delay(
+                    attempt, openai_settings.retry_base_delay, openai_settings.retry_max_delay
+                )
+                self.pause(retry_after)
+                if attempt == openai_settings.max_retries:
+                    raise RateLimited("The AI service is rate limited, please try again shortly", retry_after)
+                logger.warning("OpenAI rate limited, retrying in %.1fs (%s/%s)", retry_after, attempt + 1, openai_settings.max_retries)
+            except TRANSIENT_ERRORS as e:
+                if attempt == openai_settings.max_retries:
+                    raise
+                delay = backoff_delay(attempt, openai_settings.retry_base_delay, openai_settings.retry_max_delay)
+                logger.warning("OpenAI request failed, retrying in %.1fs (%s/%s): %s", delay, attempt + 1, openai_settings.max_retries, e)
+                await asyncio.sleep(delay)
+            finally:
+                self.finish(estimated, used)
+
+    @staticmethod
+    def retry_after(error: openai.error.OpenAIError) -> Optional[float]:
+        try:
+            return float((error.headers or {}).get("retry-after"))
+        except (TypeError, ValueError):
+            return None
+
+    async def record_usage(self, user_id: str, usage: dict):
+        try:
+            await asyncio.to_thread(
+                supabase.rpc('record_openai_usage', {
+                    "p_user": user_id,
+                    "p_day": date.today().isoformat(),
+                    "p_prompt_tokens": usage.get("prompt_tokens", 0),
+                    "p_completion_tokens": usage.get("completion_tokens", 0)
+                }).execute
+            )
+        except Exception as e:
+            logger.error("Error recording OpenAI usage for user %s: %s", user_id, e)
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+openai_gateway = OpenAIGateway()
@@ -0,0 +1,196 @@
+from config.auth import auth_settings
+from config.rate_limit import rate_limit_settings
+from services.retry import CircuitBreaker
+from collections import OrderedDict
+from fastapi.responses import JSONResponse
+from jose import JWTError, jwt
+import logging
+import math
+import re
+import time
+from typing import List, Optional, Pattern, Tuple
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Expensive endpoints get their own, tighter buckets; (method, path pattern, route class)
+ROUTE_CLASSES: List[Tuple[str, Pattern, str]] = [
+    ("POST", re.compile(r"^/api/openai/generate-email/?$"), "ai"),
+    ("POST", re.compile(r"^/api/prospects/(upload|bulk|bulk/delete)/?$"), "import"),
+    ("POST", re.compile(r"^/api/campaigns/[^/]+/(start|retry|schedule)/?$"), "send"),
+    ("GET", re.compile(r"^/(test-email|send-test-email/[^/]+)/?$"), "send"),
+]
+
+def classify(method: str, path: str) -> Optional[str]:
+    """The route class of a request, or None for requests that aren't limited."""
+    for route_method, pattern, route_class in ROUTE_CLASSES:
+        if method == route_method and pattern.match(path):
+            return route_class
+    # Tracking pixels and links are opened by recipients, not API clients
+    if path.startswith("/api/") and method != "OPTIONS":
+        return "default"
+    return None
+
+def limits(route_class: str) -> Tuple[int, int]:
+    """(requests per minute, burst) for a route class."""
+    return (
+        getattr(rate_limit_settings, f"rate_limit_{route_class}_per_minute"),
+        getattr(rate_limit_settings, f"rate_limit_{route_class}_burst")
+    )
+
+def client_identity(scope: dict) -> str:
+    """
+    The user a request is made by, from the bearer token's subject.
+
+    The token is verified locally against the JWT secret instead of asking
+    Supabase, so limiting adds no round trip; requests without a valid token
+    are limited by client address and then rejected by the endpoint itself.
+    """
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    claims = jwt.decode(
+                        token, auth_settings.jwt_secret,
+                        algorithms=[auth_settings.jwt_algorithm],
+                        options={"verify_aud": False}
+                    )
+                    if claims.get("sub"):
+                        return f"user:{claims['sub']}"
+                except JWTError:
+                    pass
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+class MemoryRateLimitStore:
+    """Token buckets held by this process, evicting the least recently used beyond max_clients."""
+
+    def __init__(self, max_clients: int):
+        self.max_clients = max(1, max_clients)
+        # key -> [tokens, last update]
+        self.buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    async def take(self, key: str, per_minute: int, burst: int) -> float:
+        """Take a token from the key's bucket; returns 0 if allowed, else seconds until a token is available."""
+        rate = max(1, per_minute) / 60
+        burst = max(1, burst)
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [float(burst), now]
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / rate
+
+# Atomic token bucket update; Redis' clock is used so replicas agree on elapsed time
+TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+class RedisRateLimitStore:
+    """
+    Token buckets shared by all API replicas through Redis.
+
+    If Redis is slow or unreachable, requests are limited by the in-memory
+    store of this replica instead of waiting on it or being rejected, and a
+    circuit breaker stops every request from paying the timeout meanwhile.
+    """
+
+    # Seconds a bucket update may take before falling back to the local store
+    TIMEOUT = 0.25
+
+    def __init__(self, url: str, fallback: MemoryRateLimitStore):
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the redis package is not installed")
+        self.client = redis.from_url(url, socket_timeout=self.TIMEOUT, socket_connect_timeout=self.TIMEOUT)
+        self.script = self.client.register_script(TAKE_SCRIPT)
+        self.fallback = fallback
+        self.breaker = CircuitBreaker("redis", 3, 5.0, 60.0)
+
+    async def take(self, key: str, per_minute: int, burst: int) -> float:
+        if self.breaker.allow():
+            try:
+                wait = await self.script(keys=[f"rate_limit:{key}"], args=[max(1, per_minute) / 60, max(1, burst)])
+                self.breaker.record_success()
+                return float(wait)
+            except Exception as e:
+                if self.breaker.record_failure():
+                    logger.error("Rate limit store unavailable, limiting locally for %.0fs: %s", self.breaker.reset_timeout, e)
+        return await self.fallback.take(key, per_minute, burst)
+
+class RateLimiter:
+    def __init__(self):
+        memory = MemoryRateLimitStore(rate_limit_settings.rate_limit_max_clients)
+        if rate_limit_settings.rate_limit_redis_url:
+            self.store = RedisRateLimitStore(rate_limit_settings.rate_limit_redis_url, memory)
+        else:
+            self.store = memory
+
+    async def check(self, route_class: str, identity: str) -> float:
+        """Count a request; returns 0 if allowed, else the seconds to wait before retrying."""
+        per_minute, burst = limits(route_class)
+        return await self.store.take(f"{route_class}:{identity}", per_minute, burst)
+
+rate_limiter = RateLimiter()
+
+class RateLimitMiddleware:
+    """
+    Limits requests per user and route class with token buckets.
+
+    Rejected requests get a 429 with Retry-After before the endpoint runs or
+    the request body is read, so abusive clients cost next to nothing.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not rate_limit_settings.rate_limit_enabled:
+            await self.app(scope, receive, send)
+            return
+        route_class = classify(scope["method"], scope["path"])
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        identity = client_identity(scope)
+        retry_after = await rate_limiter.check(route_class, identity)
+        if retry_after > 0:
+            logger.info("Rate limited %s on %s %s (%s)", identity, scope['method'], scope['path'], route_class)
+            response = JSONResponse(
+                {"detail": "Too many requests, please try again later"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
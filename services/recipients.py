@@ -0,0 +1,29 @@
+import sys
+from typing import Optional
+
+class Recipient:
+    """
+    One campaign recipient, as held between the fetch, render and send stages.
+
+    Uses __slots__ instead of a per-instance dict, and interns the strings that
+    repeat across recipients (company, timezone), so a large audience waiting
+    in queues or the send window heap costs a fraction of the database rows it
+    was built from.
+    """
+
+    __slots__ = ("prospect_id", "email", "name", "company", "timezone")
+
+    def __init__(self, prospect_id: str, email: str, name: str, company: Optional[str], timezone: Optional[str]):
+        self.prospect_id = prospect_id
+        self.email = email
+        self.name = name
+        self.company = sys.intern(company) if company else ""
+        self.timezone = sys.intern(timezone) if timezone else None
+
+    @classmethod
+    def from_row(cls, row: dict) -> "Recipient":
+        """Build from a prospects row selected with RECIPIENT_COLUMNS."""
+        return cls(row['id'], row['email'], row['full_name'], row.get('company'), row.get('timezone'))
+
+# Prospect columns needed to render a message; only the timezone is read out of custom_fields
+RECIPIENT_COLUMNS = "id, email, full_name, company, timezone:custom_fields->>timezone"
@@ -0,0 +1,98 @@
+from config.campaign import campaign_settings
+from services.mime_skeleton import MessageSkeleton
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import logging
+import multiprocessing
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Skeletons kept by each worker process, by key; the least recently used are dropped
+WORKER_CACHE_SIZE = 32
+
+# Worker side: skeletons received from the parent so far
+_skeletons: "OrderedDict[str, MessageSkeleton]" = OrderedDict()
+
+def _render_batch(
+    key: str, skeleton: Optional[MessageSkeleton], batch: List[Tuple[str, str, str, Dict[str, str]]]
+) -> Optional[List[Tuple[str, str, str, bytes]]]:
+    """Render a batch with the cached skeleton for key; returns None if it isn't cached and wasn't sent."""
+    if skeleton is not None:
+        _skeletons[key] = skeleton
+        while len(_skeletons) > WORKER_CACHE_SIZE:
+            _skeletons.popitem(last=False)
+    else:
+        skeleton = _skeletons.get(key)
+        if skeleton is None:
+            return None
+        _skeletons.move_to_end(key)
+    return [
+        (prospect_id, to_email, message_id, skeleton.render(to_email, values, message_id))
+        for prospect_id, to_email, message_id, values in batch
+    ]
+
+class RenderPool:
+    """
+    Renders recipient batches on a pool of worker processes shared by all campaigns.
+
+    The pool lives as long as the process. Tasks carry a skeleton key and the
+    recipients' placeholder values only: a worker that doesn't have the key's
+    skeleton yet answers with a miss, and the batch is resubmitted once with the
+    skeleton, which the worker then keeps. So each skeleton is pickled to each
+    worker about once, not with every batch. Workers are spawned rather than
+    forked so they never inherit the parent's threads or open connections.
+    """
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self.executor = self.create_executor()
+
+    def create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
+
+    def render(
+        self, key: str, skeleton: MessageSkeleton, batch: List[Tuple[str, str, str, Dict[str, str]]]
+    ) -> "asyncio.Future[List[Tuple[str, str, str, bytes]]]":
+        """
+        Render (prospect_id, to_email, message_id, values) items into (prospect_id, to_email, message_id, bytes).
+
+        key identifies the skeleton; different skeletons must never share one.
+        """
+        return asyncio.ensure_future(self.render_batch(key, skeleton, batch))
+
+    async def render_batch(self, key: str, skeleton: MessageSkeleton, batch: List[Tuple[str, str, str, Dict[str, str]]]):
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            rendered = await loop.run_in_executor(executor, _render_batch, key, None, batch)
+            if rendered is None:
+                rendered = await loop.run_in_executor(executor, _render_batch, key, skeleton, batch)
+            return rendered
+        except BrokenProcessPool:
+            # A worker died; later batches get a fresh pool instead of failing as well
+            if self.executor is executor:
+                logger.error("Render pool broken, restarting it")
+                self.executor = self.create_executor()
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+_pool: Optional[RenderPool] = None
+
+def render_pool() -> Optional[RenderPool]:
+    """The process-wide render pool, started on first use; None when rendering on the event loop."""
+    global _pool
+    if _pool is None and campaign_settings.campaign_render_processes > 0:
+        _pool = RenderPool(campaign_settings.campaign_render_processes)
+    return _pool
+
+def close_render_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
@@ -0,0 +1,79 @@
+import random
+import threading
+import time
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for the given (0-based) attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class CircuitBreaker:
+    """
+    Fails fast while a remote host is down.
+
+    After failure_threshold consecutive failures the breaker opens and rejects
+    calls for reset_timeout seconds. It then lets a single trial call through
+    (half-open); success closes it, failure re-opens it with a doubled timeout
+    up to max_reset_timeout. Thread-safe, since SMTP calls run in worker threads.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, max_reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may be attempted now; claims the trial call when half-open."""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        with self.lock:
+            return self.state != self.CLOSED and (
+                self.trial_in_flight or time.monotonic() - self.opened_at < self.reset_timeout
+            )
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker will allow a trial call."""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return 0.0
+            return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.reset_timeout = self.base_reset_timeout
+            self.trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True when this failure opened the breaker."""
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+            elif self.failures < self.failure_threshold or self.state == self.OPEN:
+                return False
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+            return True
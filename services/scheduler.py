@@ -0,0 +1,130 @@
+from config.campaign import campaign_settings
+from config.supabase import supabase
+from models.campaign import CampaignStatus
+from datetime import datetime, timedelta, timezone
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Called with the campaign id, its owner and the claimed campaign row
+Dispatch = Callable[[str, str, dict], Awaitable[None]]
+
+def _utc(when: datetime) -> datetime:
+    if when.tzinfo is None:
+        return when.replace(tzinfo=timezone.utc)
+    return when.astimezone(timezone.utc)
+
+class CampaignScheduler:
+    """
+    In-process scheduler that starts SCHEDULED campaigns when they are due.
+
+    Due times live in a min-heap; cancelled or rescheduled entries are dropped
+    lazily when they reach the top. The run loop sleeps until the earliest due
+    time or until a new entry is pushed.
+
+    Campaigns scheduled through another replica are picked up by polling for
+    SCHEDULED rows that are about to be due. A campaign is only dispatched if
+    its row still has the due time this scheduler knows of, so a stale entry
+    can't start a campaign that was rescheduled elsewhere.
+    """
+
+    def __init__(self):
+        self.heap: List[Tuple[float, int, str]] = []
+        # Campaign id -> the scheduled_at it is due at, in UTC
+        self.due: Dict[str, datetime] = {}
+        self.counter = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.dispatch: Optional[Dispatch] = None
+        self.task: Optional[asyncio.Task] = None
+        self.poll_task: Optional[asyncio.Task] = None
+        self.running: set = set()
+
+    def schedule(self, campaign_id: str, when: datetime):
+        when = _utc(when)
+        if self.due.get(campaign_id) == when:
+            return
+        self.due[campaign_id] = when
+        heapq.heappush(self.heap, (when.timestamp(), next(self.counter), campaign_id))
+        self.wakeup.set()
+
+    def cancel(self, campaign_id: str):
+        self.due.pop(campaign_id, None)
+
+    async def load_pending(self):
+        """Register SCHEDULED campaigns due before the next poll, including ones scheduled elsewhere."""
+        horizon = datetime.now(timezone.utc) + timedelta(seconds=campaign_settings.campaign_schedule_poll_interval)
+        result = await asyncio.to_thread(
+            supabase.table('campaigns').select("id, scheduled_at").eq('status', CampaignStatus.SCHEDULED.value)
+                .lte('scheduled_at', horizon.isoformat()).execute
+        )
+        for row in result.data or []:
+            self.schedule(row['id'], datetime.fromisoformat(row['scheduled_at']))
+        logger.debug("Loaded %s due scheduled campaigns", len(result.data or []))
+
+    async def poll(self):
+        while True:
+            await asyncio.sleep(campaign_settings.campaign_schedule_poll_interval)
+            try:
+                await self.load_pending()
+            except Exception as e:
+                logger.error("Error loading scheduled campaigns: %s", e)
+
+    async def start(self, dispatch: Dispatch):
+        self.dispatch = dispatch
+        await self.load_pending()
+        self.task = asyncio.create_task(self.run())
+        self.poll_task = asyncio.create_task(self.poll())
+
+    async def stop(self):
+        for task in (self.task, self.poll_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self.task = self.poll_task = None
+
+    async def run(self):
+        while True:
+            self.wakeup.clear()
+            now = datetime.now(timezone.utc).timestamp()
+            while self.heap and self.heap[0][0] <= now:
+                ts, _, campaign_id = heapq.heappop(self.heap)
+                when = self.due.get(campaign_id)
+                if when is None or when.timestamp() != ts:
+                    continue  # cancelled or rescheduled
+                del self.due[campaign_id]
+                await self.fire(campaign_id, when)
+
+            timeout = self.heap[0][0] - now if self.heap else None
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def fire(self, campaign_id: str, when: datetime):
+        try:
+            # Conditional update so a campaign is only dispatched once, even with several
+            # replicas, and only for the due time it was scheduled with when this was queued
+            claimed = await asyncio.to_thread(
+                supabase.table('campaigns').update({
+                    "status": CampaignStatus.RUNNING,
+                    "started_at": datetime.utcnow().isoformat()
+                }).eq('id', campaign_id).eq('status', CampaignStatus.SCHEDULED.value).eq('scheduled_at', when.isoformat()).execute
+            )
+            if not claimed.data:
+                logger.info("Scheduled campaign %s was already started, unscheduled or rescheduled", campaign_id)
+                return
+            logger.info("Dispatching scheduled campaign %s", campaign_id)
+            task = asyncio.create_task(self.dispatch(campaign_id, claimed.data[0]['created_by'], claimed.data[0]))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+        except Exception as e:
+            logger.error("Error dispatching scheduled campaign %s: %s", campaign_id, e)
+
+campaign_scheduler = CampaignScheduler()
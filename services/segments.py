@@ -0,0 +1,48 @@
+from config.supabase import supabase
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+def segment_query(segment: dict, columns: str = "*", count: str = None):
+    """Build a prospects query matching the segment's saved filter."""
+    query = supabase.table('prospects').select(columns, count=count)
+    if segment.get('company'):
+        query = query.eq('company', segment['company'])
+    if segment.get('custom_fields'):
+        query = query.contains('custom_fields', segment['custom_fields'])
+    if segment.get('import_batch_id'):
+        query = query.eq('import_batch_id', segment['import_batch_id'])
+    return query
+
+def count_segment_prospects(segment: dict) -> int:
+    """Return the number of prospects currently matching the segment."""
+    result = segment_query(segment, "id", count='exact').limit(1).execute()
+    return result.count or 0
+
+async def fetch_segment_pages(
+    segment: dict,
+    page_size: int,
+    columns: str,
+    after_id: Optional[str] = None,
+    upto_id: Optional[str] = None
+) -> AsyncIterator[List[dict]]:
+    """
+    Yield prospects matching the segment one page at a time.
+
+    Uses keyset pagination on id so each page is an index range scan,
+    regardless of how deep into the segment we are. after_id/upto_id
+    restrict the walk to the id range (after_id, upto_id].
+    """
+    last_id = after_id
+    while True:
+        query = segment_query(segment, columns).order('id').limit(page_size)
+        if last_id is not None:
+            query = query.gt('id', last_id)
+        if upto_id is not None:
+            query = query.lte('id', upto_id)
+        result = await asyncio.to_thread(query.execute)
+        if not result.data:
+            return
+        yield result.data
+        if len(result.data) < page_size:
+            return
+        last_id = result.data[-1]['id']
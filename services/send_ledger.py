@@ -0,0 +1,112 @@
+from config.campaign import campaign_settings
+from config.supabase import supabase
+from collections import Counter
+from datetime import datetime, timezone
+import asyncio
+import hashlib
+import logging
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+def make_message_id(campaign_id: str, prospect_id: str, domain: str) -> str:
+    """Deterministic Message-ID, so a resent message is recognisable as the same one."""
+    digest = hashlib.sha256(f"{campaign_id}:{prospect_id}".encode()).hexdigest()[:32]
+    return f"<{digest}@{domain}>"
+
+class SendLedger:
+    """
+    Append-only record of delivered campaign messages.
+
+    Deliveries are buffered and written with group commits: one insert per
+    flush, triggered by size or interval. An in-memory index of deliveries
+    recorded by this process, plus one lookup per fetched page, lets the
+    pipeline skip delivered recipients without a database round trip each.
+    A crash can lose at most the deliveries of one unflushed group.
+    """
+
+    def __init__(self):
+        self.pending: List[Dict] = []
+        self.index: Dict[str, Set[str]] = {}
+        self.active: Counter = Counter()
+        self.flush_requested = asyncio.Event()
+        self.flush_lock = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+
+    def is_delivered(self, campaign_id: str, prospect_id: str) -> bool:
+        return prospect_id in self.index.get(campaign_id, ())
+
+    def record(self, campaign_id: str, prospect_id: str, message_id: str):
+        self.index.setdefault(campaign_id, set()).add(prospect_id)
+        self.pending.append({
+            "campaign_id": campaign_id,
+            "prospect_id": prospect_id,
+            "message_id": message_id,
+            "sent_at": datetime.now(timezone.utc).isoformat()
+        })
+        if len(self.pending) >= campaign_settings.ledger_flush_size:
+            self.flush_requested.set()
+
+    async def delivered_among(self, campaign_id: str, prospect_ids: List[str]) -> Set[str]:
+        """Return which of a page of prospects already received this campaign."""
+        delivered = {prospect_id for prospect_id in prospect_ids if self.is_delivered(campaign_id, prospect_id)}
+        remaining = [prospect_id for prospect_id in prospect_ids if prospect_id not in delivered]
+        if remaining:
+            result = await asyncio.to_thread(
+                supabase.table('send_ledger').select("prospect_id").eq('campaign_id', campaign_id).in_('prospect_id', remaining).execute
+            )
+            delivered.update(row['prospect_id'] for row in result.data or [])
+        return delivered
+
+    def open(self, campaign_id: str):
+        """Register a pipeline run for a campaign, keeping its index in memory."""
+        self.active[campaign_id] += 1
+
+    def close(self, campaign_id: str):
+        """Release a pipeline run; the campaign's index is dropped when no run needs it."""
+        self.active[campaign_id] -= 1
+        if self.active[campaign_id] <= 0:
+            del self.active[campaign_id]
+            self.index.pop(campaign_id, None)
+
+    async def flush(self) -> bool:
+        """Write buffered deliveries; returns False if they could not be written and are kept for the next flush."""
+        async with self.flush_lock:
+            entries, self.pending = self.pending, []
+            if not entries:
+                return True
+            try:
+                await asyncio.to_thread(
+                    supabase.table('send_ledger').upsert(
+                        entries, on_conflict="campaign_id,prospect_id", ignore_duplicates=True
+                    ).execute
+                )
+            except Exception as e:
+                logger.error("Error writing %s send ledger entries: %s", len(entries), e)
+                self.pending = entries + self.pending
+                return False
+            return True
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_requested.wait(), campaign_settings.ledger_flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_requested.clear()
+            await self.flush()
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
+
+send_ledger = SendLedger()
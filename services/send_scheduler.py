@@ -0,0 +1,104 @@
+from collections import Counter
+from contextlib import asynccontextmanager
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+class FairSendScheduler:
+    """
+    Apportions a transport's send slots across the campaigns sending through it.
+
+    Uses start-time fair queuing: every request for a slot gets a virtual finish
+    tag of start + cost / weight, and waiting requests are granted in tag order.
+    Each user with a sending campaign gets an equal share, split evenly between
+    that user's campaigns. A campaign that was idle starts at the current virtual
+    time rather than banking credit, so a newly started small campaign is served
+    alongside a large one straight away instead of queueing behind it, and no
+    campaign with pending sends can be starved.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.in_use = 0
+        self.virtual_time = 0.0
+        self.waiting: List[Tuple[float, int, float, asyncio.Future]] = []
+        self.seq = itertools.count()
+        # Last finish tag per campaign
+        self.finish: Dict[str, float] = {}
+        self.owners: Dict[str, str] = {}
+        # Pipelines running per campaign (e.g. several shards in one process)
+        self.runs: Counter = Counter()
+        # Sending campaigns per user
+        self.campaigns: Counter = Counter()
+
+    def register(self, campaign_id: str, user_id: str):
+        if self.runs[campaign_id] == 0:
+            self.owners[campaign_id] = user_id
+            self.campaigns[user_id] += 1
+        self.runs[campaign_id] += 1
+
+    def unregister(self, campaign_id: str):
+        self.runs[campaign_id] -= 1
+        if self.runs[campaign_id] > 0:
+            return
+        del self.runs[campaign_id]
+        self.finish.pop(campaign_id, None)
+        user_id = self.owners.pop(campaign_id)
+        self.campaigns[user_id] -= 1
+        if self.campaigns[user_id] <= 0:
+            del self.campaigns[user_id]
+
+    def weight(self, campaign_id: str) -> float:
+        return 1.0 / self.campaigns[self.owners[campaign_id]]
+
+    async def acquire(self, campaign_id: str, cost: int = 1):
+        """Wait for a send slot for cost messages of the campaign."""
+        start = max(self.virtual_time, self.finish.get(campaign_id, 0.0))
+        finish = start + cost / self.weight(campaign_id)
+        self.finish[campaign_id] = finish
+        if self.in_use < self.capacity and not self.waiting:
+            self.in_use += 1
+            self.virtual_time = max(self.virtual_time, start)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiting, (finish, next(self.seq), start, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just before the cancellation; hand the slot on
+                self.release()
+            else:
+                future.cancel()
+            raise
+
+    def release(self):
+        self.in_use -= 1
+        while self.in_use < self.capacity and self.waiting:
+            _, _, start, future = heapq.heappop(self.waiting)
+            if future.done():
+                continue
+            self.in_use += 1
+            self.virtual_time = max(self.virtual_time, start)
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, campaign_id: str, cost: int = 1):
+        await self.acquire(campaign_id, cost)
+        try:
+            yield
+        finally:
+            self.release()
+
+# One scheduler per transport, sized to the transport's concurrent connections
+_schedulers: Dict[str, FairSendScheduler] = {}
+
+def send_scheduler(transport_name: str, capacity: int) -> FairSendScheduler:
+    if transport_name not in _schedulers:
+        _schedulers[transport_name] = FairSendScheduler(capacity)
+    return _schedulers[transport_name]
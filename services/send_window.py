@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from functools import lru_cache
+from weakref import WeakValueDictionary
+import asyncio
+import time
+from typing import Optional
+
+@lru_cache(maxsize=512)
+def resolve_timezone(name: Optional[str]):
+    """Return a tzinfo for an IANA name, or None if it is missing or unknown."""
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+class SendWindow:
+    """
+    A daily window of recipient-local hours in which a campaign may send.
+
+    Windows may wrap past midnight (e.g. 22 to 6). Sends inside the window are
+    paced evenly so the whole audience is spread across one window's length
+    instead of going out in a burst.
+    """
+
+    def __init__(self, start_hour: int, end_hour: int, default_timezone: Optional[str], total_recipients: int, min_interval: float = 0.0):
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self.default_tz = resolve_timezone(default_timezone) or timezone.utc
+        hours = (end_hour - start_hour) % 24 or 24
+        self.interval = max(min_interval, hours * 3600 / max(1, total_recipients))
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    def is_open(self, local: datetime) -> bool:
+        if self.start_hour < self.end_hour:
+            return self.start_hour <= local.hour < self.end_hour
+        return local.hour >= self.start_hour or local.hour < self.end_hour
+
+    def delay_for(self, tz_name: Optional[str] = None, now: Optional[datetime] = None) -> float:
+        """Seconds until the window is open for a recipient in tz_name (0 when open now)."""
+        tz = resolve_timezone(tz_name) or self.default_tz
+        local = (now or datetime.now(timezone.utc)).astimezone(tz)
+        if self.is_open(local):
+            return 0.0
+        opens = local.replace(hour=self.start_hour, minute=0, second=0, microsecond=0)
+        if opens <= local:
+            opens += timedelta(days=1)
+        return (opens - local).total_seconds()
+
+    async def pace(self, max_wait: Optional[float] = None) -> float:
+        """
+        Wait for this campaign's next evenly spaced send slot and return 0.
+
+        If the slot is more than max_wait seconds away, it is left for later and
+        the seconds until it are returned without waiting.
+        """
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            if max_wait is not None and slot - now > max_wait:
+                return slot - now
+            self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        return 0.0
+
+# Windows of the campaigns this process is sending, dropped once no shard uses them
+_windows: "WeakValueDictionary[str, SendWindow]" = WeakValueDictionary()
+
+def campaign_send_window(campaign: dict) -> Optional[SendWindow]:
+    """
+    The campaign's send window, or None if it doesn't have one.
+
+    Pacing is derived from the whole campaign's audience, and the window is
+    shared by all of the campaign's shards running in this process. A shard
+    therefore sends at the campaign's rate and takes its share of the window,
+    rather than spreading its own recipients over the whole window. Worker
+    processes sending shards of the same campaign at once each keep this rate.
+    """
+    if campaign.get('send_window_start') is None or campaign.get('send_window_end') is None:
+        return None
+    window = _windows.get(campaign['id'])
+    if window is None:
+        window = SendWindow(
+            campaign['send_window_start'],
+            campaign['send_window_end'],
+            campaign.get('timezone'),
+            campaign.get('total_prospects') or 1
+        )
+        _windows[campaign['id']] = window
+    return window
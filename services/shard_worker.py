@@ -0,0 +1,201 @@
+from config.campaign import campaign_settings
+from config.supabase import supabase
+from services.campaign_pipeline import CAMPAIGN_COLUMNS, CampaignPipeline
+from services.segments import fetch_segment_pages
+from services.send_ledger import send_ledger
+from datetime import datetime, timezone
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Shard rows inserted per request when splitting a campaign, and the most prospect
+# ids those rows may carry between them
+SHARD_INSERT_BATCH = 500
+SHARD_INSERT_MAX_IDS = 20000
+
+async def create_campaign_shards(campaign: dict) -> int:
+    """
+    Split a campaign's audience into claimable shards and return how many were created.
+
+    Inline prospect_ids campaigns are split by array position, each shard storing
+    its slice of the ids so workers never read the whole array. Segment campaigns
+    are split into prospect id ranges found by walking the segment's ids once;
+    the last range is open-ended so prospects added before it is sent are included.
+    """
+    shard_size = campaign_settings.campaign_shard_size
+    campaign_id = campaign['id']
+    shards: List[dict] = []
+
+    if campaign.get('segment_id'):
+        segment = await asyncio.to_thread(
+            supabase.table('segments').select("*").eq('id', campaign['segment_id']).single().execute
+        )
+        after_id = None
+        async for page in fetch_segment_pages(segment.data, shard_size, "id"):
+            upto_id = page[-1]['id']
+            shards.append({"after_id": after_id, "upto_id": upto_id})
+            after_id = upto_id
+        if shards:
+            shards[-1]["upto_id"] = None
+    else:
+        prospect_ids = campaign.get('prospect_ids') or []
+        for start in range(0, len(prospect_ids), shard_size):
+            end = min(start + shard_size, len(prospect_ids))
+            shards.append({"range_start": start, "range_end": end, "prospect_ids": prospect_ids[start:end]})
+
+    # Shards of a previous run (e.g. a retry) are replaced
+    await asyncio.to_thread(supabase.table('campaign_shards').delete().eq('campaign_id', campaign_id).execute)
+    rows = [{"campaign_id": campaign_id, "shard_index": index, **bounds} for index, bounds in enumerate(shards)]
+    batch_size = SHARD_INSERT_BATCH
+    if not campaign.get('segment_id'):
+        batch_size = max(1, min(batch_size, SHARD_INSERT_MAX_IDS // shard_size))
+    for start in range(0, len(rows), batch_size):
+        await asyncio.to_thread(supabase.table('campaign_shards').insert(rows[start:start + batch_size]).execute)
+
+    logger.info("Campaign %s split into %s shards", campaign_id, len(rows))
+    return len(rows)
+
+class ShardWorker:
+    """
+    Claims campaign shards through expiring leases and sends them.
+
+    Any number of worker processes can run side by side: a shard is leased to
+    one worker at a time, the lease is renewed while the shard is being sent,
+    and a shard whose worker died is re-claimed once its lease expires. A worker
+    that loses its lease stops sending that shard immediately. A shard waiting
+    for its send window is handed back until it can send, freeing the slot.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = campaign_settings.campaign_lease_seconds
+        self.tasks: List[asyncio.Task] = []
+
+    async def claim(self) -> Optional[dict]:
+        result = await asyncio.to_thread(
+            supabase.rpc('claim_campaign_shard', {
+                "p_worker": self.worker_id,
+                "p_lease_seconds": self.lease_seconds,
+                "p_max_attempts": campaign_settings.campaign_shard_max_attempts
+            }).execute
+        )
+        return result.data[0] if result.data else None
+
+    async def keep_lease(self, shard: dict, pipeline_task: asyncio.Task):
+        """Renew the shard's lease until the pipeline finishes; cancel it if the lease is lost."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await asyncio.to_thread(
+                    supabase.rpc('renew_campaign_shard', {
+                        "p_shard": shard['id'],
+                        "p_worker": self.worker_id,
+                        "p_lease_seconds": self.lease_seconds
+                    }).execute
+                )
+            except Exception as e:
+                logger.warning("Could not renew lease on shard %s: %s", shard['id'], e)
+                continue
+            if not renewed.data:
+                logger.error("Lost lease on shard %s, stopping", shard['id'])
+                shard['lease_lost'] = True
+                pipeline_task.cancel()
+                return
+
+    async def process(self, shard: dict):
+        # The campaign and its product in one round trip. Only shards created before
+        # they carried their own ids need the campaign's prospect_ids array
+        columns = f"{CAMPAIGN_COLUMNS}, products(*)"
+        if shard.get('range_end') is not None and shard.get('prospect_ids') is None:
+            columns += ", prospect_ids"
+        result = await asyncio.to_thread(
+            supabase.table('campaigns').select(columns).eq('id', shard['campaign_id']).single().execute
+        )
+        campaign = result.data
+        product = campaign.pop('products', None)
+        if not product:
+            raise ValueError(f"Product {campaign.get('product_id')} of campaign {shard['campaign_id']} not found")
+
+        pipeline = CampaignPipeline(campaign, product, shard)
+        pipeline_task = asyncio.create_task(pipeline.run())
+        lease_task = asyncio.create_task(self.keep_lease(shard, pipeline_task))
+        try:
+            sent_count, failed_count = await pipeline_task
+        except asyncio.CancelledError:
+            if shard.get('lease_lost'):
+                # Another worker owns the shard now and will finish it
+                return
+            raise
+        finally:
+            lease_task.cancel()
+
+        # Deliveries must be durable before the shard is marked complete. If they
+        # aren't, the shard is neither completed nor released: its lease expires
+        # and it is re-claimed later, by when the ledger has had time to catch up
+        if not await send_ledger.flush():
+            logger.error("Send ledger not written, leaving shard %s to be retried once its lease expires", shard['id'])
+            return
+        if pipeline.resume_at is not None:
+            # Waiting for the send window: free this slot until the shard can send again
+            not_before = datetime.fromtimestamp(pipeline.resume_at, timezone.utc)
+            await asyncio.to_thread(
+                supabase.rpc('defer_campaign_shard', {
+                    "p_shard": shard['id'],
+                    "p_worker": self.worker_id,
+                    "p_not_before": not_before.isoformat()
+                }).execute
+            )
+            logger.info("Shard %s of campaign %s handed back until %s", shard['shard_index'], shard['campaign_id'], not_before.isoformat())
+            return
+        await asyncio.to_thread(
+            supabase.rpc('complete_campaign_shard', {
+                "p_shard": shard['id'],
+                "p_worker": self.worker_id,
+                "p_sent": sent_count,
+                "p_failed": failed_count
+            }).execute
+        )
+        logger.info("Shard %s of campaign %s done: %s sent, %s failed", shard['shard_index'], shard['campaign_id'], sent_count, failed_count)
+
+    async def run_slot(self):
+        while True:
+            try:
+                shard = await self.claim()
+            except Exception as e:
+                logger.error("Error claiming campaign shard: %s", e)
+                shard = None
+            if shard is None:
+                await asyncio.sleep(campaign_settings.campaign_worker_poll_interval)
+                continue
+
+            try:
+                await self.process(shard)
+            except Exception as e:
+                logger.error("Error processing shard %s: %s", shard['id'], e)
+                try:
+                    await asyncio.to_thread(
+                        supabase.rpc('release_campaign_shard', {
+                            "p_shard": shard['id'],
+                            "p_worker": self.worker_id,
+                            "p_max_attempts": campaign_settings.campaign_shard_max_attempts
+                        }).execute
+                    )
+                except Exception as release_error:
+                    logger.error("Error releasing shard %s: %s", shard['id'], release_error)
+
+    def start(self):
+        logger.info("Starting shard worker %s", self.worker_id)
+        self.tasks = [asyncio.create_task(self.run_slot()) for _ in range(max(1, campaign_settings.campaign_worker_concurrency))]
+
+    async def stop(self):
+        tasks, self.tasks = self.tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+shard_worker = ShardWorker()
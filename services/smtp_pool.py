@@ -0,0 +1,193 @@
+from config.email import SmtpAccount
+from config.supabase import supabase
+from services.mime_skeleton import encode_header
+from email.utils import formataddr
+from datetime import date
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class AccountState:
+    """Live usage and health of one sender account."""
+
+    def __init__(self, account: SmtpAccount):
+        self.account = account
+        self.from_header = encode_header("From", formataddr((account.from_name, account.from_email), charset="utf-8"))
+        self.quota_day = date.today()
+        self.sent_today = 0
+        self.sent_total = 0
+        self.failed_total = 0
+        self.in_flight = 0
+        self.disabled_until = 0.0
+        self.quota_exhausted = False
+        # Units of the shared daily quota held by this process, used as sends succeed
+        self.reserved = 0
+        self.last_error: Optional[str] = None
+
+    def roll_day(self):
+        today = date.today()
+        if today != self.quota_day:
+            self.quota_day = today
+            self.sent_today = 0
+            self.quota_exhausted = False
+            self.reserved = 0
+
+    def capacity(self, now: float, ignore_cooldown: bool = False) -> float:
+        """Selection weight: configured weight scaled by remaining quota and free connections."""
+        if self.quota_exhausted or (now < self.disabled_until and not ignore_cooldown):
+            return 0.0
+        if self.in_flight >= self.account.max_connections:
+            return 0.0
+        remaining = 1.0
+        if self.account.daily_quota is not None:
+            left = self.account.daily_quota - self.sent_today - self.in_flight
+            if left <= 0:
+                return 0.0
+            remaining = left / self.account.daily_quota
+        return self.account.weight * remaining
+
+class SharedQuota:
+    """
+    Daily account quotas shared by every process that sends through the accounts.
+
+    A process reserves quota from a counter row per account and day
+    (reserve_smtp_quota, migration 017) a block at a time, so the quota holds
+    across replicas at one database call per block. Units a process holds when
+    it stops are lost for the day: fewer than a block per account and process.
+    """
+
+    def __init__(self, block: int):
+        self.block = block
+
+    def reserve(self, state: AccountState) -> int:
+        """Reserve up to a block of the account's quota for today; returns the units granted."""
+        result = supabase.rpc('reserve_smtp_quota', {
+            "p_account": state.account.name,
+            "p_day": state.quota_day.isoformat(),
+            "p_quota": state.account.daily_quota,
+            "p_count": self.block
+        }).execute()
+        return result.data or 0
+
+class SmtpAccountPool:
+    """
+    Spreads sends across sender accounts by available capacity.
+
+    Accounts that error are taken out of rotation for a cooldown period, and
+    accounts that reach their daily quota are skipped until the next day.
+    Safe to use from the worker threads that run blocking smtplib calls.
+
+    With a SharedQuota, an account with a daily quota is only picked while this
+    process holds unused units of it. Everything else, connection limits and
+    in_flight included, is counted per process.
+    """
+
+    def __init__(self, accounts: List[SmtpAccount], cooldown: int, quota: Optional[SharedQuota] = None):
+        self.states = [AccountState(account) for account in accounts]
+        self.cooldown = cooldown
+        self.quota = quota
+        self.lock = threading.Lock()
+        self.slot_released = threading.Condition(self.lock)
+
+    @property
+    def max_connections(self) -> int:
+        return sum(state.account.max_connections for state in self.states)
+
+    def acquire(self, usable: Optional[Callable[[AccountState], bool]] = None) -> Optional[AccountState]:
+        """
+        Reserve a connection slot on an account, or None when none is available.
+
+        Accounts rejected by usable (e.g. because their host is down) are skipped.
+        Blocks while every usable account is busy with other sends.
+        """
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                for state in self.states:
+                    state.roll_day()
+                candidates = [
+                    state for state in self.states if (usable is None or usable(state)) and self.has_quota(state)
+                ]
+                weights = [state.capacity(now) if state in candidates else 0.0 for state in self.states]
+                if not any(weights):
+                    # With every usable account cooling down there is nothing to fail over to,
+                    # so fall back to trying them anyway rather than failing outright
+                    weights = [state.capacity(now, ignore_cooldown=True) if state in candidates else 0.0 for state in self.states]
+                if any(weights):
+                    state = random.choices(self.states, weights=weights)[0]
+                    state.in_flight += 1
+                    return state
+                if not any(state.in_flight for state in candidates):
+                    return None
+                self.slot_released.wait(timeout=1)
+
+    def has_quota(self, state: AccountState) -> bool:
+        """Whether this process may start another send on the account, reserving shared quota when it runs out."""
+        if self.quota is None or state.account.daily_quota is None or state.quota_exhausted:
+            return True
+        if state.reserved > state.in_flight:
+            return True
+        try:
+            # Called with the lock held; other sends wait for this one call per block
+            granted = self.quota.reserve(state)
+        except Exception as e:
+            logger.warning("Could not reserve quota for SMTP account %s: %s", state.account.name, e)
+            return False
+        if not granted:
+            state.quota_exhausted = True
+            logger.warning("SMTP account %s reached its daily quota", state.account.name)
+            return False
+        state.reserved += granted
+        return True
+
+    def release(self, state: AccountState, sent: bool):
+        with self.lock:
+            state.in_flight -= 1
+            self.slot_released.notify()
+            if sent:
+                if self.quota is not None and state.account.daily_quota is not None:
+                    state.reserved -= 1
+                state.sent_today += 1
+                state.sent_total += 1
+                if state.account.daily_quota is not None and state.sent_today >= state.account.daily_quota:
+                    state.quota_exhausted = True
+                    logger.warning("SMTP account %s reached its daily quota", state.account.name)
+            else:
+                state.failed_total += 1
+
+    def mark_failed(self, state: AccountState, error: str):
+        """Take an account out of rotation after a connection or authentication error."""
+        with self.lock:
+            state.disabled_until = time.monotonic() + self.cooldown
+            state.last_error = error
+        logger.warning("SMTP account %s disabled for %ss: %s", state.account.name, self.cooldown, error)
+
+    def mark_quota_exhausted(self, state: AccountState, error: str):
+        """Skip an account until tomorrow after the provider reports a sending limit."""
+        with self.lock:
+            state.quota_exhausted = True
+            state.last_error = error
+        logger.warning("SMTP account %s hit its provider quota: %s", state.account.name, error)
+
+    def usage(self) -> List[Dict]:
+        now = time.monotonic()
+        with self.lock:
+            return [{
+                "name": state.account.name,
+                "from_email": state.account.from_email,
+                "weight": state.account.weight,
+                "daily_quota": state.account.daily_quota,
+                "sent_today": state.sent_today,
+                "sent_total": state.sent_total,
+                "failed_total": state.failed_total,
+                "in_flight": state.in_flight,
+                "quota_reserved": state.reserved,
+                "available": not state.quota_exhausted and now >= state.disabled_until,
+                "quota_exhausted": state.quota_exhausted,
+                "disabled_for": max(0, round(state.disabled_until - now)),
+                "last_error": state.last_error
+            } for state in self.states]
@@ -0,0 +1,125 @@
+from config.email import email_settings
+from config.supabase import supabase
+from datetime import datetime, timedelta, timezone
+import asyncio
+import hashlib
+import logging
+from typing import Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+BOUNCE = "bounce"
+UNSUBSCRIBE = "unsubscribe"
+MANUAL = "manual"
+
+# Rows read per request when loading the list
+LOAD_PAGE_SIZE = 1000
+# Overlap between incremental refreshes, so rows committed late aren't missed
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+def email_key(email: str) -> int:
+    """64-bit hash of a normalized address; collisions are negligible at millions of entries."""
+    return int.from_bytes(hashlib.blake2b(normalize_email(email).encode(), digest_size=8).digest(), "big")
+
+class SuppressionList:
+    """
+    Addresses that must not be emailed, held in memory for O(1) checks.
+
+    Only 64-bit hashes of the addresses are kept, which is several times
+    smaller than a set of strings. Additions by this process are written
+    through immediately; additions by other processes are picked up by a
+    periodic incremental refresh, and removals by a less frequent full reload.
+    """
+
+    def __init__(self):
+        self.keys: Set[int] = set()
+        # Keys added while a full reload is running, merged into its result
+        self.added: Set[int] = set()
+        self.refreshed_at: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def contains(self, email: str) -> bool:
+        return email_key(email) in self.keys
+
+    def add(self, email: str, reason: str, created_by: Optional[str] = None):
+        """Suppress an address. Blocking; safe to call from the SMTP worker threads."""
+        key = email_key(email)
+        self.keys.add(key)
+        self.added.add(key)
+        try:
+            supabase.table('suppressions').upsert({
+                "email": normalize_email(email),
+                "reason": reason,
+                "created_by": created_by
+            }, on_conflict="email", ignore_duplicates=True).execute()
+        except Exception as e:
+            logger.error("Error saving suppression for %s: %s", email, e)
+
+    def discard(self, email: str):
+        self.keys.discard(email_key(email))
+
+    def fetch_emails(self, since: Optional[datetime]) -> Iterable[List[str]]:
+        """Page through suppressed addresses, all or those added since a time, by email keyset."""
+        after = None
+        while True:
+            query = supabase.table('suppressions').select("email")
+            if since is not None:
+                query = query.gt('created_at', since.isoformat())
+            if after is not None:
+                query = query.gt('email', after)
+            rows = query.order('email').limit(LOAD_PAGE_SIZE).execute().data or []
+            if rows:
+                yield [row['email'] for row in rows]
+            if len(rows) < LOAD_PAGE_SIZE:
+                return
+            after = rows[-1]['email']
+
+    def load(self, full: bool):
+        started = datetime.now(timezone.utc)
+        since = None if full or self.refreshed_at is None else self.refreshed_at - REFRESH_OVERLAP
+        keys = set() if since is None else self.keys
+        self.added = set()
+        for emails in self.fetch_emails(since):
+            keys.update(email_key(email) for email in emails)
+        keys.update(self.added)
+        self.keys = keys
+        self.refreshed_at = started
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        reloaded = loop.time()
+        while True:
+            await asyncio.sleep(email_settings.suppression_refresh_interval)
+            full = loop.time() - reloaded >= email_settings.suppression_reload_interval
+            try:
+                await asyncio.to_thread(self.load, full)
+            except Exception as e:
+                logger.error("Error refreshing suppression list: %s", e)
+                continue
+            if full:
+                reloaded = loop.time()
+
+    async def start(self):
+        try:
+            await asyncio.to_thread(self.load, True)
+            logger.info("Loaded %s suppressed addresses", len(self.keys))
+        except Exception as e:
+            logger.error("Error loading suppression list: %s", e)
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+suppression_list = SuppressionList()
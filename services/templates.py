@@ -0,0 +1,89 @@
+from config.supabase import supabase
+from services.mime_skeleton import MessageSkeleton
+from collections import OrderedDict
+import asyncio
+import hashlib
+import logging
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Template columns without the (large) body
+TEMPLATE_SUMMARY_COLUMNS = "id, content_hash, subject, version, parent_id, created_by, created_at"
+
+def template_hash(subject: str, content: str) -> str:
+    """Content address of a subject and body; the subject is length-prefixed so the split is unambiguous."""
+    return hashlib.sha256(f"{len(subject)}:{subject}{content}".encode()).hexdigest()
+
+def store_template(user_id: str, subject: str, content: str, parent_id: Optional[str] = None) -> dict:
+    """
+    Return the user's template with this subject and content, creating it if needed.
+
+    Identical content is stored once per user however many campaigns use it.
+    A new template derived from parent_id becomes the next version of it.
+    Existing content costs one round trip, new content two (three with a parent).
+    """
+    content_hash = template_hash(subject, content)
+    existing = supabase.table('email_templates').select(TEMPLATE_SUMMARY_COLUMNS)\
+        .eq('created_by', user_id).eq('content_hash', content_hash).execute()
+    if existing.data:
+        return existing.data[0]
+
+    version = 1
+    if parent_id:
+        parent = supabase.table('email_templates').select("version")\
+            .eq('id', parent_id).eq('created_by', user_id).execute()
+        if parent.data:
+            version = parent.data[0]['version'] + 1
+        else:
+            parent_id = None
+    inserted = supabase.table('email_templates').upsert({
+        "created_by": user_id,
+        "content_hash": content_hash,
+        "subject": subject,
+        "content": content,
+        "version": version,
+        "parent_id": parent_id
+    }, on_conflict="created_by,content_hash", ignore_duplicates=True).execute()
+    if inserted.data:
+        return inserted.data[0]
+    # A concurrent save of the same content won the unique index; read its row back
+    result = supabase.table('email_templates').select(TEMPLATE_SUMMARY_COLUMNS)\
+        .eq('created_by', user_id).eq('content_hash', content_hash).execute()
+    return result.data[0]
+
+class SkeletonCache:
+    """
+    Compiled message skeletons of templates, kept in process.
+
+    Templates are immutable (a changed body is a new template), so entries never
+    go stale; the cache is only bounded in size. Shards of the same campaign,
+    and campaigns sharing a template, compile it once per process.
+    """
+
+    def __init__(self, size: int = 128):
+        self.size = size
+        self.entries: "OrderedDict[Tuple[str, str], MessageSkeleton]" = OrderedDict()
+
+    async def get(self, template_id: str, variant: str, build: Callable[[str, str], MessageSkeleton]) -> MessageSkeleton:
+        """
+        Return the template's skeleton, compiling it with build(subject, content) on a miss.
+
+        variant distinguishes compilations of the same template, e.g. with and without tracking.
+        """
+        key = (template_id, variant)
+        skeleton = self.entries.get(key)
+        if skeleton is not None:
+            self.entries.move_to_end(key)
+            return skeleton
+
+        template = await asyncio.to_thread(
+            supabase.table('email_templates').select("subject, content").eq('id', template_id).single().execute
+        )
+        skeleton = build(template.data['subject'], template.data['content'])
+        self.entries[key] = skeleton
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return skeleton
+
+skeleton_cache = SkeletonCache()
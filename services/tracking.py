@@ -0,0 +1,171 @@
+from config.auth import auth_settings
+from config.supabase import supabase
+from config.tracking import tracking_settings
+from collections import OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import quote
+import asyncio
+import base64
+import hashlib
+import hmac
+import html
+import logging
+import re
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Filled per recipient by the message skeleton
+TRACKING_PLACEHOLDER = "{{tracking_token}}"
+OPEN = "open"
+CLICK = "click"
+
+# Events written per record_tracking_events call
+FLUSH_CHUNK_SIZE = 5000
+
+_SECRET = auth_settings.jwt_secret.encode()
+_HREF_PATTERN = re.compile(r"""href\s*=\s*(["'])(https?://[^"']+)\1""", re.IGNORECASE)
+_BODY_CLOSE_PATTERN = re.compile(r"</body\s*>", re.IGNORECASE)
+
+def _mac(data: bytes, size: int) -> bytes:
+    return hmac.new(_SECRET, data, hashlib.sha256).digest()[:size]
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def make_token(campaign_id: str, prospect_id: str) -> str:
+    """Signed, URL-safe token identifying one recipient of one campaign."""
+    payload = uuid.UUID(campaign_id).bytes + uuid.UUID(prospect_id).bytes
+    return _b64(payload + _mac(payload, 10))
+
+def parse_token(token: str) -> Optional[Tuple[str, str]]:
+    """Return (campaign_id, prospect_id) for a valid token, otherwise None."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (ValueError, TypeError):
+        return None
+    payload, mac = raw[:32], raw[32:]
+    if len(payload) != 32 or not hmac.compare_digest(mac, _mac(payload, 10)):
+        return None
+    return str(uuid.UUID(bytes=payload[:16])), str(uuid.UUID(bytes=payload[16:]))
+
+def sign_url(url: str) -> str:
+    return _b64(_mac(url.encode(), 12))
+
+def verify_url(url: str, signature: str) -> bool:
+    return hmac.compare_digest(sign_url(url), signature)
+
+def add_tracking(content: str, base_url: str) -> str:
+    """
+    Rewrite a campaign's links through the click endpoint and add an open pixel.
+
+    Done once per campaign on the template; the recipient-specific token is a
+    placeholder filled in by the message skeleton.
+    """
+    base_url = base_url.rstrip("/")
+
+    def rewrite(match: re.Match) -> str:
+        url = html.unescape(match.group(2))
+        if "{{" in url:
+            # Personalized links can't be signed ahead of time
+            return match.group(0)
+        tracked = f"{base_url}/t/c/{TRACKING_PLACEHOLDER}?u={quote(url, safe='')}&amp;s={sign_url(url)}"
+        return f'href="{tracked}"'
+
+    content = _HREF_PATTERN.sub(rewrite, content)
+    pixel = f'<img src="{base_url}/t/o/{TRACKING_PLACEHOLDER}.gif" width="1" height="1" alt="" style="display:none">'
+    closing = list(_BODY_CLOSE_PATTERN.finditer(content))
+    if closing:
+        position = closing[-1].start()
+        return content[:position] + pixel + content[position:]
+    return content + "\n" + pixel
+
+class TrackingBuffer:
+    """
+    Write-behind buffer for open and click events.
+
+    Events are kept in memory, deduplicated per recipient (the first open and
+    first click win), and flushed to the database in bulk on an interval or when
+    the buffer fills up. Recently flushed events are remembered so repeat opens
+    from the same recipient cost nothing.
+    """
+
+    def __init__(self):
+        self.pending: Dict[Tuple[str, str], List[Optional[str]]] = {}
+        self.recent: "OrderedDict[Tuple[str, str, str], None]" = OrderedDict()
+        self.flush_requested = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def record(self, campaign_id: str, prospect_id: str, kind: str):
+        if (campaign_id, prospect_id, kind) in self.recent:
+            return
+        entry = self.pending.get((campaign_id, prospect_id))
+        if entry is None:
+            entry = self.pending[(campaign_id, prospect_id)] = [None, None]
+        index = 0 if kind == OPEN else 1
+        if entry[index] is None:
+            entry[index] = datetime.now(timezone.utc).isoformat()
+        if len(self.pending) >= tracking_settings.tracking_flush_size:
+            self.flush_requested.set()
+
+    def remember(self, key: Tuple[str, str, str]):
+        self.recent[key] = None
+        self.recent.move_to_end(key)
+        while len(self.recent) > tracking_settings.tracking_dedupe_size:
+            self.recent.popitem(last=False)
+
+    async def flush(self):
+        pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        events = [{
+            "campaign_id": campaign_id,
+            "prospect_id": prospect_id,
+            "opened_at": opened_at,
+            "clicked_at": clicked_at
+        } for (campaign_id, prospect_id), (opened_at, clicked_at) in pending.items()]
+
+        for start in range(0, len(events), FLUSH_CHUNK_SIZE):
+            chunk = events[start:start + FLUSH_CHUNK_SIZE]
+            try:
+                await asyncio.to_thread(supabase.rpc('record_tracking_events', {"events": chunk}).execute)
+            except Exception as e:
+                logger.error("Error flushing %s tracking events: %s", len(chunk), e)
+                # Keep the events for the next flush, without overwriting newer ones
+                for event in chunk:
+                    key = (event["campaign_id"], event["prospect_id"])
+                    entry = self.pending.setdefault(key, [None, None])
+                    entry[0] = entry[0] or event["opened_at"]
+                    entry[1] = entry[1] or event["clicked_at"]
+                continue
+            for event in chunk:
+                if event["opened_at"] or event["clicked_at"]:
+                    # A click implies an open, as in record_tracking_events
+                    self.remember((event["campaign_id"], event["prospect_id"], OPEN))
+                if event["clicked_at"]:
+                    self.remember((event["campaign_id"], event["prospect_id"], CLICK))
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_requested.wait(), tracking_settings.tracking_flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_requested.clear()
+            await self.flush()
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
+
+tracking_buffer = TrackingBuffer()
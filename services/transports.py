@@ -0,0 +1,298 @@
+from config.email import SmtpAccount
+from services.mime_skeleton import encode_header
+from services.retry import CircuitBreaker
+from services.smtp_pool import AccountState, SharedQuota, SmtpAccountPool
+from email.utils import formataddr
+from enum import Enum
+from pathlib import Path
+import base64
+import httpx
+import logging
+import smtplib
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+# Per-recipient records, sampled separately (see LOG_SAMPLE_RATES)
+recipient_logger = logging.getLogger(f"{__name__}.recipients")
+
+# Provider replies that mean the account hit a sending limit rather than a transient error
+QUOTA_ERROR_CODES = {421, 450, 451, 452, 454, 550, 554}
+QUOTA_ERROR_MARKERS = ("quota", "limit", "rate", "too many")
+
+def is_quota_error(code: int, message: bytes) -> bool:
+    text = (message or b"").decode(errors="ignore").lower()
+    return code in QUOTA_ERROR_CODES and any(marker in text for marker in QUOTA_ERROR_MARKERS)
+
+class SendResult(str, Enum):
+    """Outcome of a single delivery attempt."""
+    SENT = "sent"
+    # Transient error; the message may be retried later
+    RETRY = "retry"
+    # The transport's hosts are all down; retry once a circuit breaker lets calls through
+    UNAVAILABLE = "unavailable"
+    # The recipient address was refused
+    BOUNCED = "bounced"
+    # Permanent error; retrying won't help
+    FAILED = "failed"
+
+class EmailTransport:
+    """
+    Delivers rendered messages.
+
+    Messages are complete except for the From header, which the transport
+    adds for the sender it delivers through. Methods block and are called from
+    worker threads.
+    """
+
+    name = "base"
+    # Messages accepted per send_batch call
+    batch_size = 1
+    # Concurrent send/send_batch calls the transport can usefully serve
+    max_connections = 1
+
+    def send(self, to_email: str, message: bytes) -> SendResult:
+        raise NotImplementedError
+
+    def send_batch(self, messages: List[Tuple[str, bytes]]) -> List[SendResult]:
+        """Deliver (to_email, message) pairs, returning one result per message in order."""
+        return [self.send(to_email, message) for to_email, message in messages]
+
+    def retry_after(self) -> float:
+        """Seconds until an UNAVAILABLE transport is worth trying again."""
+        return 0.0
+
+class SmtpTransport(EmailTransport):
+    """
+    Sends one message per SMTP transaction through a pool of sender accounts.
+
+    Each SMTP host has a circuit breaker shared by the accounts on it; while
+    it is open the pool doesn't pick those accounts.
+    """
+
+    name = "smtp"
+
+    def __init__(self, accounts: List[SmtpAccount], cooldown: int, breaker_threshold: int,
+                 breaker_reset_timeout: float, breaker_max_reset_timeout: float, quota: Optional[SharedQuota] = None):
+        self.pool = SmtpAccountPool(accounts, cooldown, quota)
+        self.breakers: Dict[Tuple[str, int], CircuitBreaker] = {}
+        for state in self.pool.states:
+            key = (state.account.host, state.account.port)
+            if key not in self.breakers:
+                self.breakers[key] = CircuitBreaker(
+                    f"{key[0]}:{key[1]}", breaker_threshold, breaker_reset_timeout, breaker_max_reset_timeout
+                )
+
+    @property
+    def max_connections(self) -> int:
+        return self.pool.max_connections
+
+    def breaker_for(self, state: AccountState) -> CircuitBreaker:
+        return self.breakers[(state.account.host, state.account.port)]
+
+    def host_available(self, state: AccountState) -> bool:
+        return not self.breaker_for(state).is_open()
+
+    def retry_after(self) -> float:
+        return min((breaker.retry_after() for breaker in self.breakers.values()), default=0.0)
+
+    def test_connection(self) -> bool:
+        """Test the SMTP connection and credentials of every sender account."""
+        if not self.pool.states:
+            logger.error("No SMTP accounts configured")
+            return False
+        success = True
+        for state in self.pool.states:
+            account = state.account
+            try:
+                logger.info("Testing SMTP connection for account %s...", account.name)
+                with smtplib.SMTP(account.host, account.port) as server:
+                    server.starttls()
+                    server.login(account.username, account.password)
+                    logger.info("SMTP connection test successful for account %s", account.name)
+            except smtplib.SMTPAuthenticationError:
+                logger.error("SMTP authentication failed for account %s. Please check your credentials.", account.name)
+                success = False
+            except Exception as e:
+                logger.error("SMTP connection test failed for account %s: %s", account.name, e)
+                success = False
+        return success
+
+    def usage(self) -> List[Dict]:
+        usage = self.pool.usage()
+        for state, entry in zip(self.pool.states, usage):
+            breaker = self.breaker_for(state)
+            entry["host_state"] = breaker.state
+            entry["host_retry_after"] = round(breaker.retry_after())
+        return usage
+
+    def send(self, to_email: str, message: bytes) -> SendResult:
+        """Make one delivery attempt through the next available account."""
+        state = self.pool.acquire(usable=self.host_available)
+        if state is None:
+            if any(breaker.is_open() for breaker in self.breakers.values()):
+                return SendResult.UNAVAILABLE
+            recipient_logger.error("Failed to send email to %s: no SMTP account available", to_email)
+            return SendResult.RETRY if self.pool.states else SendResult.FAILED
+        if not self.breaker_for(state).allow():
+            # Another thread took the half-open trial call first
+            self.pool.release(state, False)
+            return SendResult.UNAVAILABLE
+        return self._deliver(state, to_email, message)
+
+    def _deliver(self, state: AccountState, to_email: str, message: bytes) -> SendResult:
+        """Send through one account."""
+        account = state.account
+        breaker = self.breaker_for(state)
+        sent = False
+        try:
+            with smtplib.SMTP(account.host, account.port) as server:
+                server.starttls()
+                server.login(account.username, account.password)
+                server.sendmail(account.from_email, [to_email], state.from_header + message)
+
+            sent = True
+            breaker.record_success()
+            recipient_logger.info("Email sent successfully to %s via %s", to_email, account.name)
+            return SendResult.SENT
+
+        except smtplib.SMTPAuthenticationError as e:
+            # The host is up; only this account is at fault
+            breaker.record_success()
+            self.pool.mark_failed(state, str(e))
+            return SendResult.RETRY
+
+        except smtplib.SMTPRecipientsRefused as e:
+            breaker.record_success()
+            code, reply = e.recipients.get(to_email) or next(iter(e.recipients.values()), (550, b""))
+            if 400 <= code < 500:
+                # Greylisting, a full mailbox and the like; the address itself is fine
+                recipient_logger.warning("Recipient %s temporarily refused: %s %s", to_email, code, reply)
+                return SendResult.RETRY
+            recipient_logger.error("Invalid recipient: %s (%s %s)", to_email, code, reply)
+            return SendResult.BOUNCED
+
+        except (smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+            breaker.record_success()
+            if is_quota_error(e.smtp_code, e.smtp_error):
+                self.pool.mark_quota_exhausted(state, str(e))
+                return SendResult.RETRY
+            recipient_logger.error("Failed to send email to %s: %s", to_email, e)
+            # 4xx replies are transient by definition
+            return SendResult.RETRY if 400 <= e.smtp_code < 500 else SendResult.FAILED
+
+        # SMTP reply errors are OSErrors too, so this has to come after them
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError) as e:
+            if breaker.record_failure():
+                logger.error("SMTP host %s is failing, pausing sends for %.0fs: %s", breaker.name, breaker.reset_timeout, e)
+            else:
+                logger.warning("Connection to SMTP host %s failed: %s", breaker.name, e)
+            return SendResult.RETRY
+
+        except Exception as e:
+            recipient_logger.error("Failed to send email to %s: %s", to_email, e)
+            return SendResult.FAILED
+
+        finally:
+            self.pool.release(state, sent)
+
+class HttpBatchTransport(EmailTransport):
+    """
+    Sends many messages per request to a transactional email HTTP API.
+
+    The request body is {"messages": [{"from", "to", "raw"}]} with raw being the
+    base64 encoded MIME message; the response is {"results": [{"status", "error"}]}
+    in the same order, where status is sent, bounced, retry or failed. Provider
+    specific APIs can be adapted by overriding payload and parse_results.
+    """
+
+    name = "http"
+
+    def __init__(self, url: str, api_key: Optional[str], from_email: str, from_name: str, batch_size: int,
+                 concurrency: int, timeout: float, breaker: CircuitBreaker):
+        self.url = url
+        self.from_email = from_email
+        self.from_header = encode_header("From", formataddr((from_name, from_email), charset="utf-8"))
+        self.batch_size = max(1, batch_size)
+        self.max_connections = max(1, concurrency)
+        self.breaker = breaker
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.Client(
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        )
+
+    def retry_after(self) -> float:
+        return self.breaker.retry_after()
+
+    def send(self, to_email: str, message: bytes) -> SendResult:
+        return self.send_batch([(to_email, message)])[0]
+
+    def payload(self, messages: List[Tuple[str, bytes]]) -> dict:
+        return {"messages": [{
+            "from": self.from_email,
+            "to": to_email,
+            "raw": base64.b64encode(self.from_header + message).decode("ascii")
+        } for to_email, message in messages]}
+
+    def parse_results(self, body: dict, count: int) -> List[SendResult]:
+        results = []
+        for entry in body.get("results", [])[:count]:
+            try:
+                results.append(SendResult(entry.get("status")))
+            except ValueError:
+                results.append(SendResult.FAILED)
+            if results[-1] != SendResult.SENT and entry.get("error"):
+                recipient_logger.error("Email API rejected a message: %s", entry['error'])
+        # Messages the API didn't report on are retried rather than assumed sent
+        return results + [SendResult.RETRY] * (count - len(results))
+
+    def send_batch(self, messages: List[Tuple[str, bytes]]) -> List[SendResult]:
+        if not self.breaker.allow():
+            return [SendResult.UNAVAILABLE] * len(messages)
+        try:
+            response = self.client.post(self.url, json=self.payload(messages))
+        except httpx.HTTPError as e:
+            if self.breaker.record_failure():
+                logger.error("Email API %s is failing, pausing sends for %.0fs: %s", self.url, self.breaker.reset_timeout, e)
+            else:
+                logger.warning("Request to email API %s failed: %s", self.url, e)
+            return [SendResult.RETRY] * len(messages)
+
+        if response.status_code == 429 or response.status_code >= 500:
+            self.breaker.record_failure()
+            logger.warning("Email API returned %s for a batch of %s", response.status_code, len(messages))
+            return [SendResult.RETRY] * len(messages)
+        self.breaker.record_success()
+        if response.status_code >= 400:
+            logger.error("Email API rejected a batch of %s: %s %s", len(messages), response.status_code, response.text)
+            return [SendResult.FAILED] * len(messages)
+        try:
+            return self.parse_results(response.json(), len(messages))
+        except ValueError as e:
+            logger.error("Invalid email API response: %s", e)
+            return [SendResult.RETRY] * len(messages)
+
+class SinkTransport(EmailTransport):
+    """
+    Accepts every message without delivering it, for capacity testing.
+
+    With a directory, each message is written there as an .eml file.
+    """
+
+    name = "sink"
+
+    def __init__(self, from_email: str, from_name: str, directory: Optional[str] = None, batch_size: int = 1,
+                 concurrency: int = 1):
+        self.from_header = encode_header("From", formataddr((from_name, from_email), charset="utf-8"))
+        self.directory = Path(directory) if directory else None
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.batch_size = max(1, batch_size)
+        self.max_connections = max(1, concurrency)
+
+    def send(self, to_email: str, message: bytes) -> SendResult:
+        if self.directory:
+            (self.directory / f"{uuid.uuid4().hex}.eml").write_bytes(self.from_header + message)
+        return SendResult.SENT
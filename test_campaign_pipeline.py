@@ -0,0 +1,78 @@
+"""Campaigns with a send window stop early instead of sleeping while they hold a shard."""
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+import services.campaign_pipeline as campaign_pipeline
+from config.campaign import campaign_settings
+from services.email_service import email_service
+from services.send_ledger import send_ledger
+from services.transports import SendResult
+
+PROSPECT_IDS = [str(uuid.UUID(int=i + 1)) for i in range(100)]
+
+@pytest.fixture
+def sent(monkeypatch):
+    delivered = []
+
+    async def prospect_pages(prospect_ids, page_size):
+        for start in range(0, len(prospect_ids), page_size):
+            yield [
+                {"id": prospect_id, "email": f"{prospect_id}@example.com", "full_name": "Ada", "company": None}
+                for prospect_id in prospect_ids[start:start + page_size]
+            ]
+
+    async def delivered_among(campaign_id, prospect_ids):
+        return set()
+
+    def deliver_batch(messages, transport=None):
+        delivered.extend(to_email for to_email, _ in messages)
+        return [SendResult.SENT] * len(messages)
+
+    monkeypatch.setattr(campaign_pipeline, "fetch_prospect_pages", prospect_pages)
+    monkeypatch.setattr(send_ledger, "delivered_among", delivered_among)
+    monkeypatch.setattr(send_ledger, "record", lambda campaign_id, prospect_id, message_id: None)
+    monkeypatch.setattr(email_service, "deliver_batch", deliver_batch)
+    monkeypatch.setattr(campaign_settings, "campaign_send_delay", 0)
+    monkeypatch.setattr(campaign_settings, "campaign_shard_time_slice", 1.0)
+    return delivered
+
+def windowed_campaign(hours_from_now: int) -> dict:
+    start = (datetime.now(timezone.utc).hour + hours_from_now) % 24
+    return {
+        "id": str(uuid.uuid4()),
+        "created_by": "u1",
+        "subject": "Hello {{prospect_name}}",
+        "content": "<p>Hello {{prospect_name}}</p>",
+        "total_prospects": len(PROSPECT_IDS),
+        "send_window_start": start,
+        "send_window_end": (start + 8) % 24,
+        "timezone": "UTC",
+    }
+
+def run(campaign: dict) -> campaign_pipeline.CampaignPipeline:
+    shard = {"range_start": 0, "range_end": len(PROSPECT_IDS), "prospect_ids": PROSPECT_IDS}
+    pipeline = campaign_pipeline.CampaignPipeline(campaign, {"name": "Product"}, shard)
+    asyncio.run(asyncio.wait_for(pipeline.run(), 10))
+    return pipeline
+
+def test_paced_campaign_stops_at_its_next_slot(sent):
+    pipeline = run(windowed_campaign(hours_from_now=0))
+    # 100 recipients over 8 hours: one send now, the next one 288s later
+    assert len(sent) == 1
+    assert pipeline.resume_at == pytest.approx(time.time() + 8 * 3600 / 100, abs=5)
+
+def test_closed_window_stops_until_it_opens(sent):
+    pipeline = run(windowed_campaign(hours_from_now=2))
+    assert sent == []
+    opens_in = pipeline.resume_at - time.time()
+    assert 3600 < opens_in <= 2 * 3600
+
+def test_campaign_without_window_runs_to_completion(sent):
+    campaign = {**windowed_campaign(hours_from_now=0), "send_window_start": None, "send_window_end": None}
+    pipeline = run(campaign)
+    assert len(sent) == len(PROSPECT_IDS)
+    assert pipeline.resume_at is None
@@ -0,0 +1,118 @@
+"""
+Filters of the conditional writes, as sent to PostgREST.
+
+The round trip tests stub the query builder away; these run the real one
+against a mock transport, so the encoded filter values are checked too.
+"""
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from urllib.parse import unquote
+
+import httpx
+import pytest
+from fastapi import BackgroundTasks
+from postgrest import SyncPostgrestClient
+
+import routers.campaigns as campaigns
+import services.scheduler as scheduler
+import services.shard_worker as shard_worker
+import services.templates as templates
+from models.campaign import CampaignCreate, CampaignSchedule
+from services.send_ledger import send_ledger
+from services.templates import template_hash
+
+ROW = {
+    "id": "c1",
+    "status": "draft",
+    "product_id": "p1",
+    "template_id": "t1",
+    "created_by": "u1",
+    "email_templates": {"content_hash": template_hash("Subject", "Content")},
+    "scheduled_at": "2030-01-01T09:00:00+00:00",
+}
+
+@pytest.fixture
+def queries(monkeypatch):
+    """Query strings of the requests made, with the mock answering every request with ROW."""
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(unquote(request.url.query.decode()))
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            return httpx.Response(200, json={**ROW, "products": {"id": "p1"}})
+        return httpx.Response(200, json=[ROW])
+
+    client = SyncPostgrestClient("http://postgrest.test")
+    client.session = httpx.Client(
+        base_url="http://postgrest.test", headers=client.session.headers, transport=httpx.MockTransport(handler)
+    )
+    stub = SimpleNamespace(table=client.from_, rpc=client.rpc)
+    for module in (campaigns, scheduler, shard_worker, templates):
+        monkeypatch.setattr(module, "supabase", stub)
+    return sent
+
+def test_start_campaign(queries):
+    asyncio.run(campaigns.start_campaign("c1", BackgroundTasks(), "u1"))
+    assert "status=in.(draft,failed,scheduled)" in queries[-1]
+
+def test_retry_campaign(queries):
+    asyncio.run(campaigns.retry_campaign("c1", BackgroundTasks(), "u1"))
+    assert "status=eq.completed" in queries[-1]
+
+def test_update_campaign(queries):
+    campaign = CampaignCreate(name="Campaign", subject="Subject", content="Content", product_id="p1", prospect_ids=["a"])
+    asyncio.run(campaigns.update_campaign("c1", campaign, "u1"))
+    assert "status=eq.draft" in queries[-1]
+
+def test_schedule_campaign(queries, monkeypatch):
+    monkeypatch.setattr(campaigns.campaign_scheduler, "schedule", lambda campaign_id, when: None)
+    schedule = CampaignSchedule(scheduled_at="2030-01-01T09:00:00+00:00")
+    asyncio.run(campaigns.schedule_campaign("c1", schedule, "u1"))
+    assert "status=in.(draft,scheduled)" in queries[-1]
+
+def test_unschedule_campaign(queries, monkeypatch):
+    monkeypatch.setattr(campaigns.campaign_scheduler, "cancel", lambda campaign_id: None)
+    asyncio.run(campaigns.unschedule_campaign("c1", "u1"))
+    assert "status=eq.scheduled" in queries[-1]
+
+def test_scheduler_load_pending(queries):
+    asyncio.run(scheduler.CampaignScheduler().load_pending())
+    assert "status=eq.scheduled" in queries[-1]
+
+def test_scheduler_fire(queries):
+    async def dispatch(campaign_id, created_by, row):
+        pass
+
+    campaign_scheduler = scheduler.CampaignScheduler()
+    campaign_scheduler.dispatch = dispatch
+    when = datetime(2030, 1, 1, 9, tzinfo=timezone.utc)
+    asyncio.run(campaign_scheduler.fire("c1", when))
+    assert "status=eq.scheduled" in queries[-1]
+    assert f"scheduled_at=eq.{when.isoformat()}" in queries[-1]
+
+@pytest.mark.parametrize("shard, reads_prospect_ids", [
+    ({"range_start": 0, "range_end": 2, "prospect_ids": ["a", "b"]}, False),
+    # Created before shards stored their ids
+    ({"range_start": 0, "range_end": 2, "prospect_ids": None}, True),
+])
+def test_shard_worker_campaign_columns(queries, monkeypatch, shard, reads_prospect_ids):
+    class Pipeline:
+        resume_at = None
+
+        def __init__(self, campaign, product, shard):
+            pass
+
+        async def run(self):
+            return 2, 0
+
+    async def flush():
+        return True
+
+    monkeypatch.setattr(shard_worker, "CampaignPipeline", Pipeline)
+    monkeypatch.setattr(send_ledger, "flush", flush)
+    shard = {**shard, "id": "s1", "campaign_id": "c1", "shard_index": 0}
+    asyncio.run(shard_worker.ShardWorker("w1").process(shard))
+    select = next(query for query in queries if query.startswith("select="))
+    assert "*," not in select
+    assert ("prospect_ids" in select) == reads_prospect_ids
@@ -0,0 +1,141 @@
+"""Database round trips made by the write endpoints, counted with a stub Supabase client."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import BackgroundTasks
+
+import routers.campaigns as campaigns
+import routers.products as products
+import routers.prospects as prospects
+import services.shard_worker as shard_worker
+import services.templates as templates
+from models.campaign import CampaignCreate, CampaignSchedule
+from services.send_ledger import send_ledger
+from services.templates import template_hash
+
+class StubQuery:
+    """A chained query builder; each execute() is one round trip."""
+
+    def __init__(self, client, name: str):
+        self.client = client
+        self.name = name
+
+    def __getattr__(self, method):
+        def chain(*args, **kwargs):
+            return self
+        return chain
+
+    def execute(self):
+        self.client.executed.append(self.name)
+        return SimpleNamespace(data=self.client.responses.get(self.name, []))
+
+class StubClient:
+    def __init__(self, responses: dict):
+        self.responses = responses
+        self.executed = []
+
+    def table(self, name: str) -> StubQuery:
+        return StubQuery(self, name)
+
+    def rpc(self, name: str, params: dict) -> StubQuery:
+        return StubQuery(self, name)
+
+CAMPAIGN = {
+    "id": "c1",
+    "status": "draft",
+    "product_id": "p1",
+    "template_id": "t1",
+    "prospect_ids": ["a"],
+    "segment_id": None,
+    "created_by": "u1",
+    "total_prospects": 1,
+    "email_templates": {"content_hash": template_hash("Subject", "Content")},
+}
+
+@pytest.fixture
+def client(monkeypatch):
+    stub = StubClient({
+        "campaigns": [dict(CAMPAIGN)],
+        "products": [{"id": "p1", "name": "Product", "created_by": "u1"}],
+        "prospects": [{"id": "a", "email": "a@example.com", "full_name": "A"}],
+    })
+    for module in (campaigns, products, prospects, shard_worker, templates):
+        monkeypatch.setattr(module, "supabase", stub)
+    return stub
+
+def campaign_update(**changes) -> CampaignCreate:
+    fields = {"name": "Campaign", "subject": "Subject", "content": "Content", "product_id": "p1", "prospect_ids": ["a"]}
+    return CampaignCreate(**{**fields, **changes})
+
+def test_update_product(client):
+    asyncio.run(products.update_product("p1", products.ProductCreate(name="Renamed"), "u1"))
+    assert client.executed == ["products"]
+
+def test_delete_product(client):
+    asyncio.run(products.delete_product("p1", "u1"))
+    assert client.executed == ["products"]
+
+def test_update_prospect(client):
+    asyncio.run(prospects.update_prospect("a", prospects.ProspectCreate(email="a@example.com", full_name="A")))
+    assert client.executed == ["prospects"]
+
+def test_delete_prospect(client):
+    asyncio.run(prospects.delete_prospect("a"))
+    assert client.executed == ["prospects"]
+
+def test_start_campaign(client):
+    asyncio.run(campaigns.start_campaign("c1", BackgroundTasks(), "u1"))
+    assert client.executed == ["campaigns"]
+
+def test_retry_campaign(client):
+    asyncio.run(campaigns.retry_campaign("c1", BackgroundTasks(), "u1"))
+    assert client.executed == ["campaigns"]
+
+def test_schedule_campaign(client, monkeypatch):
+    monkeypatch.setattr(campaigns.campaign_scheduler, "schedule", lambda campaign_id, when: None)
+    schedule = CampaignSchedule(scheduled_at="2030-01-01T09:00:00+00:00")
+    asyncio.run(campaigns.schedule_campaign("c1", schedule, "u1"))
+    assert client.executed == ["campaigns"]
+
+def test_update_campaign_unchanged_content(client):
+    asyncio.run(campaigns.update_campaign("c1", campaign_update(), "u1"))
+    # Read with the template hash, count the targets, conditional update
+    assert client.executed == ["campaigns", "prospects", "campaigns"]
+
+def test_update_campaign_new_product(client):
+    asyncio.run(campaigns.update_campaign("c1", campaign_update(product_id="p2"), "u1"))
+    assert client.executed == ["campaigns", "products", "prospects", "campaigns"]
+
+def test_shard_worker_process(client, monkeypatch):
+    client.responses["campaigns"] = {**CAMPAIGN, "products": {"id": "p1"}}
+
+    class Pipeline:
+        resume_at = None
+
+        def __init__(self, campaign, product, shard):
+            assert product == {"id": "p1"} and "products" not in campaign
+
+        async def run(self):
+            return 1, 0
+
+    async def flush():
+        return True
+
+    monkeypatch.setattr(shard_worker, "CampaignPipeline", Pipeline)
+    monkeypatch.setattr(send_ledger, "flush", flush)
+    shard = {"id": "s1", "campaign_id": "c1", "shard_index": 0}
+    asyncio.run(shard_worker.ShardWorker("w1").process(shard))
+    # The campaign with its product embedded, then completing the shard
+    assert client.executed == ["campaigns", "complete_campaign_shard"]
+
+def test_bulk_upsert_prospects(client):
+    existing, missing = "9b2f1c4e-5d6a-4b7c-8d9e-0f1a2b3c4d5e", "1c2d3e4f-5a6b-4c7d-8e9f-a0b1c2d3e4f5"
+    client.responses["update_prospects"] = [{"id": existing}]
+    results = asyncio.run(prospects.bulk_upsert_prospects(prospects.ProspectBulkUpsert(prospects=[
+        {"id": existing, "email": "a@example.com", "full_name": "A"},
+        {"id": missing, "email": "b@example.com", "full_name": "B"},
+        {"email": "c@example.com", "full_name": "C"},
+    ])))
+    assert client.executed == ["update_prospects", "prospects"]
+    assert [result.status for result in results] == ["updated", "not_found", "created"]
@@ -0,0 +1,38 @@
+"""Send window pacing is per campaign and shared by the campaign's shards."""
+import gc
+from datetime import datetime, timezone
+
+from services.send_window import SendWindow, campaign_send_window
+
+CAMPAIGN = {
+    "id": "00000000-0000-0000-0000-000000000001",
+    "send_window_start": 9,
+    "send_window_end": 17,
+    "timezone": "Europe/Amsterdam",
+    "total_prospects": 10000,
+}
+
+def test_paced_for_the_whole_campaign():
+    window = campaign_send_window(CAMPAIGN)
+    # 10k recipients over an 8 hour window, whatever the shard size
+    assert window.interval == 8 * 3600 / 10000
+
+def test_shared_by_shards_of_a_campaign():
+    window = campaign_send_window(CAMPAIGN)
+    assert campaign_send_window(dict(CAMPAIGN)) is window
+    assert campaign_send_window({**CAMPAIGN, "id": "00000000-0000-0000-0000-000000000002"}) is not window
+
+def test_dropped_once_unused():
+    window = campaign_send_window(CAMPAIGN)
+    del window
+    gc.collect()
+    # A later run of the campaign gets a new window, paced for its audience then
+    assert campaign_send_window({**CAMPAIGN, "total_prospects": 100}).interval == 8 * 3600 / 100
+
+def test_no_window():
+    assert campaign_send_window({"id": CAMPAIGN["id"], "send_window_start": None, "send_window_end": None}) is None
+
+def test_wrapping_window_delay():
+    window = SendWindow(22, 6, "UTC", 1)
+    assert window.delay_for(now=datetime(2030, 1, 1, 23, tzinfo=timezone.utc)) == 0
+    assert window.delay_for(now=datetime(2030, 1, 1, 21, tzinfo=timezone.utc)) == 3600
@@ -0,0 +1,227 @@
+"""
+The shard lease SQL of migrations 003, 009 and 013 to 015, run against PostgreSQL.
+
+Skipped unless TEST_DATABASE_URL points at a database the tests may create
+schemas in; each test runs in its own schema. The functions rely on plpgsql and
+FOR UPDATE SKIP LOCKED, so there is no SQLite variant.
+"""
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+from psycopg.rows import dict_row
+
+DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+MIGRATIONS = Path(__file__).parent / "migrations"
+SHARD_MIGRATIONS = (
+    "003_campaign_shards.sql", "009_fair_shard_claims.sql", "013_shard_attempt_limit.sql",
+    "014_shard_not_before.sql", "015_shard_prospect_ids.sql"
+)
+MAX_ATTEMPTS = 3
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+# The columns of campaigns the shard functions use
+CAMPAIGNS_TABLE = """
+create table campaigns (
+    id uuid primary key default gen_random_uuid(),
+    created_by uuid not null,
+    status text not null default 'running',
+    sent_count integer not null default 0,
+    failed_count integer not null default 0,
+    completed_at timestamptz
+)
+"""
+
+@pytest.fixture
+def schema():
+    name = f"test_shards_{uuid.uuid4().hex[:12]}"
+    with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+        conn.execute(f"create schema {name}")
+        conn.execute(f"set search_path to {name}, public")
+        conn.execute(CAMPAIGNS_TABLE)
+        for migration in SHARD_MIGRATIONS:
+            conn.execute((MIGRATIONS / migration).read_text())
+        try:
+            yield name
+        finally:
+            conn.execute(f"drop schema {name} cascade")
+
+@pytest.fixture
+def connect(schema):
+    connections = []
+
+    def open_connection(autocommit: bool = True):
+        conn = psycopg.connect(
+            DATABASE_URL, autocommit=autocommit, row_factory=dict_row,
+            options=f"-c search_path={schema},public -c lock_timeout=2s"
+        )
+        connections.append(conn)
+        return conn
+
+    yield open_connection
+    for conn in connections:
+        conn.close()
+
+def add_campaign(conn, shards: int, user: str = None, age: str = "1 hour") -> str:
+    campaign_id = conn.execute(
+        "insert into campaigns (created_by) values (%s) returning id", (user or str(uuid.uuid4()),)
+    ).fetchone()["id"]
+    for index in range(shards):
+        conn.execute(
+            "insert into campaign_shards (campaign_id, shard_index, created_at) values (%s, %s, now() - %s::interval)",
+            (campaign_id, index, age)
+        )
+    return campaign_id
+
+def claim(conn, worker: str, lease_seconds: int = 60):
+    return conn.execute(
+        "select * from claim_campaign_shard(%s, %s, %s)", (worker, lease_seconds, MAX_ATTEMPTS)
+    ).fetchone()
+
+def renew(conn, shard, worker: str) -> bool:
+    return conn.execute("select renew_campaign_shard(%s, %s, 60) as renewed", (shard["id"], worker)).fetchone()["renewed"]
+
+def complete(conn, shard, worker: str, sent: int, failed: int = 0) -> bool:
+    return conn.execute(
+        "select complete_campaign_shard(%s, %s, %s, %s) as completed", (shard["id"], worker, sent, failed)
+    ).fetchone()["completed"]
+
+def release(conn, shard, worker: str, max_attempts: int):
+    conn.execute("select release_campaign_shard(%s, %s, %s)", (shard["id"], worker, max_attempts))
+
+def defer(conn, shard, worker: str, delay: str) -> bool:
+    return conn.execute(
+        "select defer_campaign_shard(%s, %s, now() + %s::interval) as deferred", (shard["id"], worker, delay)
+    ).fetchone()["deferred"]
+
+def campaign(conn, campaign_id: str) -> dict:
+    return conn.execute("select * from campaigns where id = %s", (campaign_id,)).fetchone()
+
+def test_claim_skips_shards_locked_by_another_claim(connect):
+    setup = connect()
+    add_campaign(setup, shards=2)
+
+    first = connect(autocommit=False)
+    claimed_first = claim(first, "a")
+    # While the first claim's transaction is open, its row is locked; the second
+    # claim must skip it rather than wait for it (lock_timeout would fail the test)
+    claimed_second = claim(connect(), "b")
+    first.commit()
+
+    assert {claimed_first["shard_index"], claimed_second["shard_index"]} == {0, 1}
+    assert claim(connect(), "c") is None
+
+def test_claim_sets_lease(connect):
+    conn = connect()
+    add_campaign(conn, shards=1)
+
+    shard = claim(conn, "a", lease_seconds=60)
+
+    assert shard["status"] == "running"
+    assert shard["lease_owner"] == "a"
+    assert shard["attempts"] == 1
+    assert conn.execute("select %s::timestamptz > now() + interval '50 seconds' as ok", (shard["lease_expires_at"],)).fetchone()["ok"]
+
+def test_live_lease_is_not_reclaimed(connect):
+    conn = connect()
+    add_campaign(conn, shards=1)
+    shard = claim(conn, "a")
+
+    assert claim(conn, "b") is None
+    assert renew(conn, shard, "a")
+    assert not renew(conn, shard, "b")
+
+def test_expired_lease_is_reclaimed(connect):
+    conn = connect()
+    campaign_id = add_campaign(conn, shards=1)
+    shard = claim(conn, "a")
+    conn.execute("update campaign_shards set lease_expires_at = now() - interval '1 second' where id = %s", (shard["id"],))
+
+    reclaimed = claim(conn, "b")
+
+    assert reclaimed["id"] == shard["id"]
+    assert reclaimed["lease_owner"] == "b"
+    assert reclaimed["attempts"] == 2
+    # The worker that lost the lease can neither keep nor complete the shard
+    assert not renew(conn, shard, "a")
+    assert not complete(conn, shard, "a", sent=10)
+    assert complete(conn, reclaimed, "b", sent=10)
+    assert campaign(conn, campaign_id)["status"] == "completed"
+
+def test_campaign_finalized_when_last_shard_completes(connect):
+    conn = connect()
+    campaign_id = add_campaign(conn, shards=2)
+    first, second = claim(conn, "a"), claim(conn, "b")
+
+    assert complete(conn, first, "a", sent=5)
+    assert campaign(conn, campaign_id)["status"] == "running"
+
+    assert complete(conn, second, "b", sent=3, failed=1)
+    finished = campaign(conn, campaign_id)
+    assert finished["status"] == "failed"
+    assert (finished["sent_count"], finished["failed_count"]) == (8, 1)
+    assert finished["completed_at"] is not None
+
+def test_release_retries_until_max_attempts(connect):
+    conn = connect()
+    campaign_id = add_campaign(conn, shards=1)
+
+    release(conn, claim(conn, "a"), "a", max_attempts=2)
+    retried = claim(conn, "b")
+    assert retried["attempts"] == 2
+
+    release(conn, retried, "b", max_attempts=2)
+    assert claim(conn, "c") is None
+    assert conn.execute("select status from campaign_shards where id = %s", (retried["id"],)).fetchone()["status"] == "failed"
+    assert campaign(conn, campaign_id)["status"] == "failed"
+
+def test_claim_prefers_users_with_fewer_running_shards(connect):
+    conn = connect()
+    busy_user = str(uuid.uuid4())
+    older = add_campaign(conn, shards=2, user=busy_user, age="2 hours")
+    newer = add_campaign(conn, shards=1, age="1 hour")
+
+    assert claim(conn, "a")["campaign_id"] == older
+    # The older campaign's user already has a shard running
+    assert claim(conn, "b")["campaign_id"] == newer
+    assert claim(conn, "c")["campaign_id"] == older
+
+def test_expired_shard_out_of_attempts_fails(connect):
+    conn = connect()
+    campaign_id = add_campaign(conn, shards=1)
+    # Each worker dies holding the shard, so its lease just expires
+    for attempt in range(MAX_ATTEMPTS):
+        shard = claim(conn, f"worker-{attempt}")
+        assert shard["attempts"] == attempt + 1
+        conn.execute("update campaign_shards set lease_expires_at = now() - interval '1 second' where id = %s", (shard["id"],))
+
+    assert claim(conn, "another") is None
+    assert conn.execute("select status from campaign_shards where id = %s", (shard["id"],)).fetchone()["status"] == "failed"
+    assert campaign(conn, campaign_id)["status"] == "failed"
+
+def test_deferred_shard_waits_for_not_before(connect):
+    conn = connect()
+    add_campaign(conn, shards=1)
+    shard = claim(conn, "a")
+
+    assert defer(conn, shard, "a", "1 hour")
+    assert claim(conn, "b") is None
+
+    conn.execute("update campaign_shards set not_before = now() - interval '1 second' where id = %s", (shard["id"],))
+    resumed = claim(conn, "b")
+    assert resumed["id"] == shard["id"]
+    assert resumed["not_before"] is None
+    # Handing a shard back isn't a failed attempt
+    assert resumed["attempts"] == 1
+
+def test_defer_needs_the_lease(connect):
+    conn = connect()
+    add_campaign(conn, shards=1)
+    shard = claim(conn, "a")
+
+    assert not defer(conn, shard, "b", "1 hour")
+    assert renew(conn, shard, "a")
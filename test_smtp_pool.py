@@ -0,0 +1,44 @@
+"""Daily quotas shared between processes: a process only sends on quota it has reserved."""
+from config.email import SmtpAccount
+from services.smtp_pool import SharedQuota, SmtpAccountPool
+
+class CounterQuota(SharedQuota):
+    """The reserve_smtp_quota counter, kept in memory and shared by the pools given it."""
+
+    def __init__(self, block: int, quota: int):
+        super().__init__(block)
+        self.left = quota
+
+    def reserve(self, state) -> int:
+        granted = min(self.block, self.left)
+        self.left -= granted
+        return granted
+
+def account() -> SmtpAccount:
+    return SmtpAccount(
+        name="test", username="u", password="p", from_email="campaigns@example.com",
+        from_name="Campaigns", daily_quota=5, max_connections=10
+    )
+
+def send_all(pool: SmtpAccountPool) -> int:
+    sent = 0
+    while (state := pool.acquire()) is not None:
+        pool.release(state, True)
+        sent += 1
+    return sent
+
+def test_processes_share_the_daily_quota():
+    quota = CounterQuota(block=2, quota=5)
+    first, second = SmtpAccountPool([account()], 60, quota), SmtpAccountPool([account()], 60, quota)
+    first.release(first.acquire(), True)
+    second.release(second.acquire(), True)
+    assert send_all(first) + send_all(second) == 3
+    assert quota.left == 0
+
+def test_unsent_attempts_keep_their_quota():
+    quota = CounterQuota(block=2, quota=5)
+    pool = SmtpAccountPool([account()], 60, quota)
+    for _ in range(3):
+        pool.release(pool.acquire(), False)
+    assert quota.left == 3
+    assert send_all(pool) == 5
@@ -0,0 +1,48 @@
+"""SMTP replies to refused recipients: only permanent (5xx) refusals are bounces."""
+import smtplib
+
+import pytest
+
+import services.transports as transports
+from config.email import SmtpAccount
+from services.transports import SendResult, SmtpTransport
+
+RECIPIENT = "ada@example.com"
+
+def refusing_server(code: int, reply: bytes):
+    class Server:
+        def __init__(self, host, port):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def starttls(self):
+            pass
+
+        def login(self, username, password):
+            pass
+
+        def sendmail(self, from_email, to_emails, message):
+            raise smtplib.SMTPRecipientsRefused({RECIPIENT: (code, reply)})
+
+    return Server
+
+@pytest.fixture
+def transport():
+    account = SmtpAccount(name="test", username="u", password="p", from_email="campaigns@example.com", from_name="Campaigns")
+    return SmtpTransport([account], 60, 5, 30.0, 300.0)
+
+@pytest.mark.parametrize("code, reply, result", [
+    (450, b"Greylisted, try again later", SendResult.RETRY),
+    (451, b"Temporary local problem", SendResult.RETRY),
+    (452, b"Mailbox full", SendResult.RETRY),
+    (550, b"No such user", SendResult.BOUNCED),
+    (553, b"Mailbox name not allowed", SendResult.BOUNCED),
+])
+def test_refused_recipient(transport, monkeypatch, code, reply, result):
+    monkeypatch.setattr(transports.smtplib, "SMTP", refusing_server(code, reply))
+    assert transport.send(RECIPIENT, b"Subject: Hi\r\n\r\nHi\r\n") == result
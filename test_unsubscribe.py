@@ -0,0 +1,62 @@
+"""Unsubscribe links: GET only confirms, POST (form or RFC 8058 one-click) unsubscribes."""
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routers.tracking as tracking
+from services.mime_skeleton import MessageSkeleton
+from services.tracking import make_token
+
+CAMPAIGN_ID = "00000000-0000-0000-0000-000000000001"
+PROSPECT_ID = "00000000-0000-0000-0000-000000000002"
+
+class StubQuery:
+    def __getattr__(self, method):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        return SimpleNamespace(data=[{"email": "ada@example.com"}])
+
+@pytest.fixture
+def suppressed(monkeypatch):
+    added = []
+    monkeypatch.setattr(tracking, "supabase", SimpleNamespace(table=lambda name: StubQuery()))
+    monkeypatch.setattr(tracking.suppression_list, "add", lambda email, reason: added.append(email))
+    return added
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(tracking.router, prefix="/t")
+    return TestClient(app)
+
+def test_get_only_confirms(client, suppressed):
+    response = client.get(f"/t/u/{make_token(CAMPAIGN_ID, PROSPECT_ID)}")
+    assert response.status_code == 200
+    assert '<form method="post">' in response.text
+    assert suppressed == []
+
+def test_one_click_post_unsubscribes(client, suppressed):
+    response = client.post(
+        f"/t/u/{make_token(CAMPAIGN_ID, PROSPECT_ID)}",
+        data={"List-Unsubscribe": "One-Click"}
+    )
+    assert response.status_code == 200
+    assert suppressed == ["ada@example.com"]
+
+def test_invalid_token(client, suppressed):
+    assert client.post("/t/u/invalid").status_code == 400
+    assert suppressed == []
+
+def test_list_unsubscribe_headers():
+    skeleton = MessageSkeleton("Hello", "<p>Hello</p>", "example.com")
+    url = f"https://track.example.com/t/u/{make_token(CAMPAIGN_ID, PROSPECT_ID)}"
+    headers = skeleton.render("ada@example.com", {"unsubscribe_url": url}).split(b"\r\n\r\n", 1)[0]
+    # Long values are folded onto a continuation line
+    assert f"List-Unsubscribe: <{url}>".encode() in headers.replace(b"\r\n ", b"")
+    assert b"List-Unsubscribe-Post: List-Unsubscribe=One-Click" in headers
+
+    plain = skeleton.render("ada@example.com", {}).split(b"\r\n\r\n", 1)[0]
+    assert b"List-Unsubscribe" not in plain
@@ -0,0 +1,27 @@
+from config.logging import configure_logging
+
+# Before the other imports, some of which log while initializing
+configure_logging()
+
+import asyncio
+from services.shard_worker import shard_worker
+from services.analytics import campaign_stats
+from services.send_ledger import send_ledger
+from services.suppressions import suppression_list
+from services.render_pool import close_render_pool
+
+async def main():
+    await suppression_list.start()
+    campaign_stats.start()
+    send_ledger.start()
+    shard_worker.start()
+    try:
+        await asyncio.gather(*shard_worker.tasks)
+    finally:
+        close_render_pool()
+        await send_ledger.stop()
+        await campaign_stats.stop()
+        await suppression_list.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())